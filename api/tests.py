@@ -1,3 +1,42 @@
-from django.test import TestCase
+from datetime import time
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from habits.models import Habit
+from users.models import UserProfile
+
+User = get_user_model()
+
+
+class ReminderLoadViewTest(APITestCase):
+    """Тесты для гистограммы нагрузки напоминаний"""
+
+    def setUp(self):
+        self.url = reverse('reminder-load')
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        UserProfile.objects.filter(user=self.user).update(telegram_chat_id=123456789)
+        Habit.objects.create(user=self.user, place='Дом', time=time(7, 0), action='Пить воду')
+        Habit.objects.create(user=self.user, place='Дом', time=time(7, 0), action='Зарядка', frequency=2)
+
+    def test_admin_gets_histogram(self):
+        """Тест: администратор получает нагрузку по минутам"""
+        admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['histogram']), 24 * 60)
+        peak = response.data['summary']['peak']
+        self.assertEqual((peak['time'], peak['habits'], peak['expected']), ('06:55', 2, 1.5))
+
+    def test_regular_user_forbidden(self):
+        """Тест: обычному пользователю нагрузка недоступна"""
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,6 +1,9 @@
 from django.urls import path, include
+from .views import QueueStatsView, ReminderLoadView
 
 urlpatterns = [
     path('habits/', include('habits.urls')),
     path('users/', include('users.urls')),
-]
\ No newline at end of file
+    path('reminders/load/', ReminderLoadView.as_view(), name='reminder-load'),
+    path('queues/', QueueStatsView.as_view(), name='queue-stats'),
+]
@@ -1,3 +1,30 @@
-from django.shortcuts import render
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from telegram_bot.planner import plan_summary, reminder_histogram
+from telegram_bot.queues import queue_stats
+
+
+class ReminderLoadView(APIView):
+    """Ожидаемая нагрузка напоминаний по минутам суток (только для администраторов)"""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        """Гистограмма на сутки и сводка: пик, бюджет отправки, пиковые минуты"""
+        histogram = reminder_histogram()
+        return Response({
+            'summary': plan_summary(histogram),
+            'histogram': histogram,
+        })
+
+
+class QueueStatsView(APIView):
+    """Глубина очередей Celery и возраст самой старой задачи (только для администраторов)"""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        """Очереди reminders, bulk и analytics"""
+        return Response({'queues': queue_stats()})
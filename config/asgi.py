@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.DEBUG:
+    # Как runserver: в разработке статику (Swagger, админка) отдает сам Django
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler  # noqa: E402
+
+    django_application = ASGIStaticFilesHandler(django_application)
+
+# Обновления Telegram (вебхук) принимаются здесь же, остальное обслуживает Django
+from telegram_bot.webhook import TelegramWebhook  # noqa: E402
+
+application = TelegramWebhook(django_application)
@@ -1,5 +1,8 @@
 import os
+import time
+
 from celery import Celery
+from celery.signals import before_task_publish
 
 
 # переменное окружение для Django settings
@@ -13,6 +16,14 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Автоматически нахождение задачи в приложениях
 app.autodiscover_tasks()
 
+
+@before_task_publish.connect
+def add_published_at(headers=None, **kwargs):
+    """Время постановки в очередь — по нему считаем возраст самой старой задачи"""
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -136,6 +136,41 @@ REST_FRAMEWORK = {
 # Валидаторы
 HABIT_MAX_DURATION = 120  # ТЗ: не больше 120 секунд
 
+# Напоминания
+HABIT_REMINDER_LEAD_MINUTES = 5  # За сколько минут до привычки отправлять напоминание
+REMINDER_MAX_CATCHUP_MINUTES = 60  # Сколько пропущенных минут догоняем после простоя
+REMINDER_LEDGER_RETENTION_DAYS = 2  # Сколько дней храним журнал отправленных напоминаний
+REMINDER_MAX_HABITS_PER_MESSAGE = 5  # Сколько привычек одного чата объединяем в одно сообщение
+REMINDER_SNOOZE_MINUTES = 10  # На сколько откладывает кнопка «Отложить»
+# Сглаживание пиков: если в минуту больше REMINDER_SMOOTHING_THRESHOLD напоминаний
+# (по умолчанию — бюджет отправки Telegram), растягиваем отправку на окно (меньше упреждения)
+REMINDER_SMOOTHING_ENABLED = config('REMINDER_SMOOTHING_ENABLED', default=False, cast=bool)
+REMINDER_SMOOTHING_WINDOW_SECONDS = 180
+REMINDER_SMOOTHING_THRESHOLD = None
+# Демон напоминаний (run_reminders): канал изменений привычек и полная перезагрузка расписания
+HABIT_SCHEDULE_CHANNEL_BACKEND = config('HABIT_SCHEDULE_CHANNEL_BACKEND', default='redis')  # redis | local
+HABIT_SCHEDULE_CHANNEL_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+REMINDER_DAEMON_RELOAD_SECONDS = 3600
+# Готовые тексты напоминаний в кеше: неделя — чтобы дожили и привычки с периодичностью 7 дней
+REMINDER_TEXT_CACHE_SECONDS = 8 * 24 * 3600
+# Повестка на сегодня (бот и /api/habits/my/agenda/) живет до конца местных суток, но не дольше
+AGENDA_CACHE_SECONDS = 24 * 3600
+# Нажатия «Выполнено» в Telegram копятся в буфере и пишутся в БД пачкой раз в COMPLETION_FLUSH_SECONDS
+COMPLETION_BUFFER_BACKEND = config('COMPLETION_BUFFER_BACKEND', default='redis')  # redis | local
+COMPLETION_BUFFER_REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+COMPLETION_FLUSH_SECONDS = 5
+# Пачку упавшего сброса (воркер умер между чтением и записью в БД) дописывает следующий сброс через столько секунд
+COMPLETION_FLUSH_LEASE_SECONDS = 300
+
+# Кеш (тексты напоминаний, повестки на сегодня)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://localhost:6379/0'),
+        'KEY_PREFIX': 'habits',
+    }
+}
+
 # JWT настройки
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -164,7 +199,68 @@ SIMPLE_JWT = {
 # Настройки Telegram-бота
 TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
 TELEGRAM_BOT_USERNAME = config('TELEGRAM_BOT_USERNAME', default='')
+# Адрес вебхука: пусто — вебхук выключен (бот работает через polling, ASGI не запускает бота)
 TELEGRAM_WEBHOOK_URL = config('TELEGRAM_WEBHOOK_URL', default='')
+# Секрет, который Telegram присылает в заголовке вебхука; обязателен, если задан TELEGRAM_WEBHOOK_URL
+TELEGRAM_WEBHOOK_SECRET = config('TELEGRAM_WEBHOOK_SECRET', default='')
+# Адрес Bot API (пусто — api.telegram.org); для нагрузочных тестов: http://127.0.0.1:8081/bot
+TELEGRAM_API_BASE_URL = config('TELEGRAM_API_BASE_URL', default='')
+# Сколько сообщений одновременно отправляет один воркер (и размер пула HTTP-соединений)
+TELEGRAM_SEND_CONCURRENCY = config('TELEGRAM_SEND_CONCURRENCY', default=20, cast=int)
+# Сколько обновлений бот обрабатывает одновременно (обновления одного чата — всегда по порядку); 1 — по одному
+TELEGRAM_BOT_CONCURRENCY = config('TELEGRAM_BOT_CONCURRENCY', default=16, cast=int)
+# Состояния /connect и user_data бота: redis — общие для реплик, local — файл SQLite для одного процесса
+TELEGRAM_PERSISTENCE_BACKEND = config('TELEGRAM_PERSISTENCE_BACKEND', default='redis')  # redis | local
+TELEGRAM_PERSISTENCE_REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+TELEGRAM_PERSISTENCE_PATH = BASE_DIR / 'telegram_state.sqlite3'
+# Как часто изменения состояний уходят в хранилище (одной пачкой), секунд
+TELEGRAM_PERSISTENCE_INTERVAL = 1
+
+# Лимиты Telegram: общий на бота и на один чат (сообщений в секунду)
+TELEGRAM_RATE_LIMIT_BACKEND = config('TELEGRAM_RATE_LIMIT_BACKEND', default='redis')  # redis | local
+TELEGRAM_RATE_LIMIT_REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+TELEGRAM_GLOBAL_RATE_LIMIT = config('TELEGRAM_GLOBAL_RATE_LIMIT', default=30, cast=float)
+TELEGRAM_CHAT_RATE_LIMIT = config('TELEGRAM_CHAT_RATE_LIMIT', default=1, cast=float)
+TELEGRAM_RATE_LIMIT_MAX_RETRIES = 3
+
+# Защита бота от флуда: корзины токенов на чат и на бота (обновлений в секунду и запас на всплеск).
+# Лишнее ждет не дольше TELEGRAM_FLOOD_MAX_DELAY секунд (если чат простаивает), потом отбрасывается;
+# в очереди одного чата — не больше TELEGRAM_FLOOD_MAX_QUEUED обновлений
+TELEGRAM_FLOOD_BACKEND = config('TELEGRAM_FLOOD_BACKEND', default='local')  # local | redis (общие для реплик)
+TELEGRAM_FLOOD_REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+TELEGRAM_FLOOD_CHAT_RATE = config('TELEGRAM_FLOOD_CHAT_RATE', default=1, cast=float)
+TELEGRAM_FLOOD_CHAT_BURST = config('TELEGRAM_FLOOD_CHAT_BURST', default=5, cast=int)
+TELEGRAM_FLOOD_GLOBAL_RATE = config('TELEGRAM_FLOOD_GLOBAL_RATE', default=100, cast=float)
+TELEGRAM_FLOOD_GLOBAL_BURST = config('TELEGRAM_FLOOD_GLOBAL_BURST', default=200, cast=int)
+TELEGRAM_FLOOD_MAX_DELAY = 1.0
+TELEGRAM_FLOOD_MAX_QUEUED = 3
+
+# Повторы и предохранитель при ошибках отправки
+TELEGRAM_RETRY_MAX_ATTEMPTS = 5
+TELEGRAM_RETRY_BASE_DELAY = 30  # секунд, дальше удваивается
+TELEGRAM_CIRCUIT_BREAKER_THRESHOLD = 20  # ошибок подряд до остановки отправки
+TELEGRAM_CIRCUIT_BREAKER_COOLDOWN = 60  # секунд паузы
+
+# Очередь уведомлений (outbox): планировщик пишет, воркеры параллельно разбирают
+OUTBOX_BATCH_SIZE = 100  # строк за одну выборку воркера
+OUTBOX_MAX_BATCHES_PER_DRAIN = 50  # порций за один запуск задачи
+OUTBOX_MAX_PARALLEL_DRAINS = config('OUTBOX_MAX_PARALLEL_DRAINS', default=8, cast=int)
+OUTBOX_LEASE_SECONDS = 300  # через сколько строку упавшего воркера заберет другой
+OUTBOX_RETENTION_DAYS = 2
+
+# Каналы уведомлений, кроме Telegram: почта (SMTP) и исходящий вебхук
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='habits@localhost')
+NOTIFICATION_WEBHOOK_TIMEOUT = 10  # секунд на запрос
+NOTIFICATION_WEBHOOK_CONCURRENCY = 10  # одновременных запросов (и открытых соединений) на воркер
+# Разрешить вебхуки по http и на локальные адреса — только для проверки с notification_sinks
+NOTIFICATION_WEBHOOK_ALLOW_LOCAL = config('NOTIFICATION_WEBHOOK_ALLOW_LOCAL', default=False, cast=bool)
 
 # Конфигурация Celery
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
@@ -175,6 +271,28 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_ENABLE_UTC = False  # Отключаем UTC для Celery
 
+# Очереди: срочные напоминания не ждут за тяжелыми рассылками и аналитикой
+CELERY_TASK_DEFAULT_QUEUE = 'bulk'
+CELERY_TASK_ROUTES = {
+    'telegram_bot.tasks.send_habit_reminders': {'queue': 'reminders'},
+    'telegram_bot.tasks.send_snoozed_reminders': {'queue': 'reminders'},
+    'telegram_bot.tasks.drain_notification_outbox': {'queue': 'reminders'},
+    'telegram_bot.tasks.retry_deliveries': {'queue': 'reminders'},
+    'telegram_bot.tasks.send_daily_digests': {'queue': 'bulk'},
+    'telegram_bot.tasks.prune_reminder_dispatches': {'queue': 'bulk'},
+    'telegram_bot.tasks.recompute_habit_fire_times': {'queue': 'bulk'},
+    'telegram_bot.tasks.flush_completion_buffer': {'queue': 'bulk'},
+    'telegram_bot.tasks.report_reminder_load': {'queue': 'analytics'},
+}
+# Свой пул и параллельность для каждой очереди (run_celery --queues ...)
+CELERY_WORKER_POOLS = {
+    'reminders': {'pool': 'prefork', 'concurrency': config('CELERY_REMINDERS_CONCURRENCY', default=4, cast=int)},
+    'bulk': {'pool': 'prefork', 'concurrency': config('CELERY_BULK_CONCURRENCY', default=2, cast=int)},
+    'analytics': {'pool': 'solo', 'concurrency': 1},
+}
+# Срочным воркерам не раздаем задачи впрок — свободный процесс берет следующую сразу
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
 # Конфигурация бита Celery
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_BEAT_SCHEDULE = {
@@ -183,6 +301,51 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': 60.0,  # Каждые 60 секунд (для теста)
         'args': (),
     },
+    'send-daily-digests-every-minute': {
+        'task': 'telegram_bot.tasks.send_daily_digests',
+        'schedule': 60.0,
+        'args': (),
+    },
+    # Страховка: повторы с задержкой и строки, оставшиеся после упавших воркеров
+    'drain-notification-outbox': {
+        'task': 'telegram_bot.tasks.drain_notification_outbox',
+        'schedule': 10.0,
+        'args': (),
+    },
+    # То же для сводок — на воркерах bulk
+    'drain-digest-outbox': {
+        'task': 'telegram_bot.tasks.drain_notification_outbox',
+        'schedule': 10.0,
+        'kwargs': {'kind': 'digest'},
+        'options': {'queue': 'bulk'},
+    },
+    # Отложенные напоминания разбирает демон напоминаний, задача — на случай, если он не запущен
+    'send-snoozed-reminders-every-minute': {
+        'task': 'telegram_bot.tasks.send_snoozed_reminders',
+        'schedule': 60.0,
+        'args': (),
+    },
+    'flush-completion-buffer': {
+        'task': 'telegram_bot.tasks.flush_completion_buffer',
+        'schedule': float(COMPLETION_FLUSH_SECONDS),
+        'args': (),
+    },
+    # Переходы на летнее время случаются на границе часа или получаса — проверки раз в 15 минут хватает
+    'recompute-habit-fire-times': {
+        'task': 'telegram_bot.tasks.recompute_habit_fire_times',
+        'schedule': 15 * 60.0,
+        'args': (),
+    },
+    'report-reminder-load-daily': {
+        'task': 'telegram_bot.tasks.report_reminder_load',
+        'schedule': 24 * 60 * 60.0,
+        'args': (),
+    },
+    'prune-reminder-dispatches-daily': {
+        'task': 'telegram_bot.tasks.prune_reminder_dispatches',
+        'schedule': 24 * 60 * 60.0,
+        'args': (),
+    },
 }
 
 # Настройки Swagger
@@ -219,6 +382,13 @@ if 'test' in sys.argv or 'test_coverage' in sys.argv:
             'NAME': ':memory:',  # Используем in-memory базу данных (быстрее!)
         }
     }
+    # Лимиты Telegram считаем в памяти процесса
+    TELEGRAM_RATE_LIMIT_BACKEND = 'local'
+    HABIT_SCHEDULE_CHANNEL_BACKEND = 'local'
+    COMPLETION_BUFFER_BACKEND = 'local'
+    TELEGRAM_PERSISTENCE_BACKEND = 'local'
+    TELEGRAM_PERSISTENCE_PATH = ':memory:'
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
 
 # Отключаем миграции для ускорения тестов
 class DisableMigrations:
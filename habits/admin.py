@@ -1,41 +1,19 @@
 from django.contrib import admin
 from django import forms
-from django.utils import timezone
 from .models import Habit, HabitCompletion
-import pytz
 
 
 class HabitAdminForm(forms.ModelForm):
-    """Кастомная форма для админки с конвертацией времени"""
+    """Форма для админки: время вводится в часовом поясе владельца, UTC считает модель"""
 
     class Meta:
         model = Habit
         fields = '__all__'
 
-    def clean_time(self):
-        """Принудительная конвертация MSK → UTC при сохранении"""
-        time_value = self.cleaned_data.get('time')
-
-        if time_value:
-            # Получаем текущую дату в MSK
-            moscow_tz = pytz.timezone('Europe/Moscow')
-            now_moscow = timezone.now().astimezone(moscow_tz)
-
-            # Создаем datetime с введенным временем в MSK
-            moscow_dt = now_moscow.replace(
-                hour=time_value.hour,
-                minute=time_value.minute,
-                second=0,
-                microsecond=0
-            )
-
-            # Конвертируем в UTC
-            utc_dt = moscow_dt.astimezone(pytz.UTC)
-
-            # Возвращаем время в UTC для сохранения в БД
-            return utc_dt.time()
-
-        return time_value
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'local_time' in self.fields:
+            self.fields['local_time'].required = True
 
 
 @admin.register(Habit)
@@ -50,7 +28,7 @@ class HabitAdmin(admin.ModelAdmin):
 
     fieldsets = (
         ('Основная информация', {
-            'fields': ('user', 'action', 'place', 'time', 'utc_time_display')
+            'fields': ('user', 'action', 'place', 'local_time', 'utc_time_display')
         }),
         ('Тип и связи', {
             'fields': ('is_pleasant', 'related_habit', 'reward')
@@ -65,24 +43,10 @@ class HabitAdmin(admin.ModelAdmin):
     )
 
     def display_time(self, obj):
-        """Отображение времени в MSK в списке"""
-        from django.utils import timezone
-        import pytz
-
-        if obj.time:
-            moscow_tz = pytz.timezone('Europe/Moscow')
-            # Конвертируем UTC из БД в MSK для отображения
-            utc_time = timezone.now().replace(
-                hour=obj.time.hour,
-                minute=obj.time.minute,
-                second=0,
-                microsecond=0
-            )
-            moscow_time = utc_time.astimezone(moscow_tz)
-            return f"{moscow_time.hour}:{moscow_time.minute:02d}"
-        return "-"
+        """Отображение времени в часовом поясе владельца в списке"""
+        return obj.get_local_time_str() or "-"
 
-    display_time.short_description = "Время (MSK)"
+    display_time.short_description = "Время (местное)"
 
     def utc_time_display(self, obj):
         """Отображение UTC времени в БД (для информации)"""
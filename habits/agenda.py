@@ -0,0 +1,200 @@
+import logging
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import clock
+from .models import Habit
+from .schedule import local_day_bounds
+
+logger = logging.getLogger(__name__)
+
+# Общее поколение повесток: меняется при массовых сдвигах расписания, которые идут мимо сигналов
+AGENDA_GENERATION_KEY = 'agenda:generation'
+
+
+def agenda_key(user_id):
+    """Ключ повестки пользователя на сегодня в кеше"""
+    return f'agenda:user:{user_id}'
+
+
+def agenda_version_key(user_id):
+    """Ключ версии повестки: новая при каждом изменении привычек и выполнений пользователя"""
+    return f'agenda:version:{user_id}'
+
+
+def chat_key(chat_id):
+    """Ключ соответствия чата Telegram пользователю"""
+    return f'agenda:chat:{chat_id}'
+
+
+def cache_seconds():
+    return getattr(settings, 'AGENDA_CACHE_SECONDS', 24 * 3600)
+
+
+def agenda_queryset(user_id, tz, now=None):
+    """Привычки пользователя, которые по периодичности нужно выполнить сегодня (в его поясе)"""
+    today_start, today_end = local_day_bounds(now, tz)
+    return Habit.objects.filter(
+        user_id=user_id,
+        is_pleasant=False,
+        next_due_at__gte=today_start,
+        next_due_at__lt=today_end
+    ).order_by('next_due_at').only('id', 'action', 'time', 'local_time', 'place', 'duration', 'next_due_at')
+
+
+def agenda_item(habit):
+    """Привычка в повестке — только то, что показывают бот и клиент"""
+    return {
+        'id': habit.id,
+        'action': habit.action,
+        'time': habit.get_local_time_str(),
+        'place': habit.place,
+        'duration': habit.duration,
+        'next_due_at': habit.next_due_at.isoformat(),
+    }
+
+
+def local_date(tz, now=None):
+    return local_day_bounds(now, tz)[0].date().isoformat()
+
+
+def make_entry(user_id, tz, habits, version, generation, now=None):
+    return {
+        'user_id': user_id,
+        'timezone': tz,
+        'date': local_date(tz, now),
+        'version': version,
+        'generation': generation,
+        'habits': [agenda_item(habit) for habit in habits],
+    }
+
+
+def is_fresh(entry, version, generation, now=None):
+    """Запись годится, пока не изменились привычки, не было массового сдвига и не сменились сутки"""
+    return (
+        entry is not None
+        and entry['version'] == version
+        and entry['generation'] == generation
+        and entry['date'] == local_date(entry['timezone'], now)
+    )
+
+
+def entry_timeout(tz, now=None):
+    """До конца местных суток, но не дольше AGENDA_CACHE_SECONDS"""
+    now = now or clock.now()
+    _, today_end = local_day_bounds(now, tz)
+    return max(1, min(cache_seconds(), int((today_end - now).total_seconds()) + 1))
+
+
+def profile_timezone(user_id):
+    from users.models import UserProfile
+
+    tz = UserProfile.objects.filter(user_id=user_id).values_list('timezone', flat=True).first()
+    return tz or settings.TIME_ZONE
+
+
+def get_agenda(user_id, tz=None, now=None):
+    """
+    Повестка пользователя на сегодня: из кеша без запросов к БД, иначе запрос привычек
+    (и пояса, если он не передан). Версию читаем до запроса — изменение, пришедшее
+    во время расчета, сделает запись устаревшей.
+    """
+    keys = [agenda_key(user_id), agenda_version_key(user_id), AGENDA_GENERATION_KEY]
+    try:
+        cached = cache.get_many(keys)
+    except Exception as e:
+        logger.warning(f"⚠️ Кеш повесток недоступен: {e}")
+        tz = tz or profile_timezone(user_id)
+        return [agenda_item(habit) for habit in agenda_queryset(user_id, tz, now)]
+
+    entry, version, generation = (cached.get(key) for key in keys)
+    if is_fresh(entry, version, generation, now) and entry['timezone'] == (tz or entry['timezone']):
+        return entry['habits']
+
+    tz = tz or profile_timezone(user_id)
+    entry = make_entry(user_id, tz, agenda_queryset(user_id, tz, now), version, generation, now)
+    try:
+        cache.set(keys[0], entry, timeout=entry_timeout(tz, now))
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сохранить повестку {user_id} в кеш: {e}")
+    return entry['habits']
+
+
+async def aget_chat_agenda(chat_id, now=None):
+    """
+    Повестка на сегодня для чата Telegram: на попадании — два обращения к кешу и ни одного к БД.
+    None — чат не привязан ни к одному профилю.
+    """
+    from users.models import UserProfile
+
+    cached_user_id, version, generation = None, None, None
+    try:
+        cached = await cache.aget_many([chat_key(chat_id), AGENDA_GENERATION_KEY])
+        cached_user_id, generation = cached.get(chat_key(chat_id)), cached.get(AGENDA_GENERATION_KEY)
+        if cached_user_id is not None:
+            keys = [agenda_key(cached_user_id), agenda_version_key(cached_user_id)]
+            entries = await cache.aget_many(keys)
+            entry, version = (entries.get(key) for key in keys)
+            if is_fresh(entry, version, generation, now):
+                return entry['habits']
+        cache_available = True
+    except Exception as e:
+        logger.warning(f"⚠️ Кеш повесток недоступен: {e}")
+        cache_available = False
+
+    try:
+        user_id, tz = await UserProfile.objects.values_list('user_id', 'timezone').aget(telegram_chat_id=chat_id)
+    except UserProfile.DoesNotExist:
+        return None
+
+    if cache_available and user_id != cached_user_id:
+        # Версию — до запроса привычек, как и на пути через кеш: изменение во время расчета сделает запись устаревшей
+        try:
+            version = await cache.aget(agenda_version_key(user_id))
+        except Exception as e:
+            logger.warning(f"⚠️ Кеш повесток недоступен: {e}")
+            cache_available = False
+
+    habits = [habit async for habit in agenda_queryset(user_id, tz, now)]
+    if not cache_available:
+        return [agenda_item(habit) for habit in habits]
+
+    try:
+        entry = make_entry(user_id, tz, habits, version, generation, now)
+        await cache.aset_many(
+            {chat_key(chat_id): user_id, agenda_key(user_id): entry}, timeout=entry_timeout(tz, now)
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сохранить повестку чата {chat_id} в кеш: {e}")
+        entry = make_entry(user_id, tz, habits, version, generation, now)
+    return entry['habits']
+
+
+def invalidate_agenda(user_id):
+    """Изменились привычки или выполнения пользователя — его повестка устарела"""
+    try:
+        # Новая версия, а не удаление: запись, посчитанная до изменения, уже не совпадет с ней
+        cache.set(agenda_version_key(user_id), secrets.token_hex(8), timeout=cache_seconds() + 3600)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сбросить повестку {user_id}: {e}")
+
+
+def invalidate_chat(*chat_ids):
+    """Чат привязан к другому профилю или отвязан"""
+    keys = [chat_key(chat_id) for chat_id in chat_ids if chat_id]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сбросить привязку чатов: {e}")
+
+
+def invalidate_all_agendas():
+    """Массовый сдвиг расписания (без сигналов) — устаревают все повестки"""
+    try:
+        cache.set(AGENDA_GENERATION_KEY, secrets.token_hex(8), timeout=None)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сбросить повестки: {e}")
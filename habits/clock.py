@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+
+class SystemClock:
+    """Обычные часы: текущее время сервера"""
+
+    def now(self):
+        return timezone.now()
+
+
+class SimulatedClock:
+    """Подменяемые часы для симуляции: время двигается только вручную"""
+
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+    def set(self, value):
+        self.current = value
+        return self.current
+
+    def advance(self, delta):
+        self.current += delta
+        return self.current
+
+
+_clock = SystemClock()
+
+
+def now():
+    """Текущее время по активным часам — все планирование берет время отсюда"""
+    return _clock.now()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """Подменить часы, возвращает предыдущие"""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+@contextmanager
+def use_clock(clock):
+    """Временно подменить часы (симулятор, тесты)"""
+    previous = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
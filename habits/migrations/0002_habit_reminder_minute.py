@@ -0,0 +1,44 @@
+# Generated by Django 6.0.2 on 2026-10-17 08:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_reminder_minute(apps, schema_editor):
+    """Заполняем минуту напоминания для уже существующих привычек"""
+    Habit = apps.get_model("habits", "Habit")
+    lead = getattr(settings, "HABIT_REMINDER_LEAD_MINUTES", 5)
+
+    habits = []
+    for habit in Habit.objects.only("id", "time").iterator(chunk_size=2000):
+        habit.reminder_minute = (habit.time.hour * 60 + habit.time.minute - lead) % 1440
+        habits.append(habit)
+        if len(habits) >= 2000:
+            Habit.objects.bulk_update(habits, ["reminder_minute"])
+            habits = []
+
+    if habits:
+        Habit.objects.bulk_update(habits, ["reminder_minute"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="reminder_minute",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Минута суток в UTC с учетом упреждения напоминания, пересчитывается при сохранении",
+                null=True,
+                verbose_name="Минута напоминания (UTC)",
+            ),
+        ),
+        migrations.RunPython(fill_reminder_minute, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:01
+
+from datetime import datetime, timedelta, timezone
+
+from django.db import migrations, models
+from django.db.models import Max, Q
+from django.utils import timezone as django_timezone
+
+# Копии habits.schedule на момент миграции: дальнейшие изменения кода не должны менять ее результат
+
+
+def local_day_bounds():
+    """Начало и конец текущих суток в поясе проекта"""
+    start = django_timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
+
+def next_occurrence(habit_time, frequency, anchor_date, not_before):
+    """Первое выполнение из ряда anchor_date, anchor_date + frequency, ... не раньше not_before"""
+    occurrence = datetime.combine(anchor_date, habit_time, tzinfo=timezone.utc)
+    if occurrence < not_before:
+        period = timedelta(days=frequency)
+        periods = -(-(not_before - occurrence) // period)  # округление вверх
+        occurrence += period * periods
+    return occurrence
+
+
+def fill_next_due_at(apps, schema_editor):
+    """Рассчитываем следующее выполнение для уже существующих привычек"""
+    Habit = apps.get_model("habits", "Habit")
+    today_start, _ = local_day_bounds()
+
+    habits = []
+    queryset = Habit.objects.annotate(
+        last_completed=Max("completions__completion_date", filter=Q(completions__is_completed=True))
+    ).only("id", "time", "frequency", "created_at")
+
+    for habit in queryset.iterator(chunk_size=2000):
+        if habit.last_completed:
+            anchor = habit.last_completed + timedelta(days=habit.frequency)
+        else:
+            anchor = habit.created_at.astimezone(timezone.utc).date()
+        habit.next_due_at = next_occurrence(habit.time, habit.frequency, anchor, today_start)
+        habits.append(habit)
+        if len(habits) >= 2000:
+            Habit.objects.bulk_update(habits, ["next_due_at"])
+            habits = []
+
+    if habits:
+        Habit.objects.bulk_update(habits, ["next_due_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0002_habit_reminder_minute"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="next_due_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Ближайший момент выполнения привычки с учетом периодичности",
+                null=True,
+                verbose_name="Следующее выполнение",
+            ),
+        ),
+        migrations.RunPython(fill_next_due_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:39
+
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# Копии habits.schedule на момент миграции: дальнейшие изменения кода не должны менять ее результат
+
+
+def utc_offset_minutes():
+    """Текущее смещение пояса проекта от UTC в минутах"""
+    now = timezone.now().astimezone(ZoneInfo(settings.TIME_ZONE))
+    return int(now.utcoffset().total_seconds() // 60)
+
+
+def shift_time(value, minutes):
+    """Время суток, сдвинутое на minutes минут (по кругу)"""
+    total = (value.hour * 60 + value.minute + minutes) % (24 * 60)
+    return value.replace(hour=total // 60, minute=total % 60)
+
+
+def fill_local_time(apps, schema_editor):
+    """Местное время существующих привычек — из UTC по текущему смещению пояса проекта"""
+    Habit = apps.get_model("habits", "Habit")
+    offset = utc_offset_minutes()
+
+    habits = []
+    for habit in Habit.objects.only("id", "time").iterator(chunk_size=2000):
+        habit.local_time = shift_time(habit.time, offset)
+        habit.utc_offset = offset
+        habits.append(habit)
+
+    Habit.objects.bulk_update(habits, ["local_time", "utc_offset"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0003_habit_next_due_at"),
+        ("users", "0004_profile_timezone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="local_time",
+            field=models.TimeField(
+                blank=True,
+                help_text="Время в часовом поясе пользователя; UTC-время считается из него",
+                null=True,
+                verbose_name="Местное время выполнения",
+            ),
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="utc_offset",
+            field=models.SmallIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Смещение от UTC (мин)",
+            ),
+        ),
+        migrations.RunPython(fill_local_time, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0004_habit_local_time"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="habit",
+            name="utc_offset",
+            field=models.SmallIntegerField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="Смещение от UTC (мин)",
+            ),
+        ),
+    ]
@@ -1,9 +1,12 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.core.exceptions import ValidationError
-from django.utils import timezone  # Добавляем импорт
-import pytz  # Добавляем импорт для работы с часовыми поясами
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.conf import settings
+from datetime import timedelta, timezone as dt_timezone
+
+from . import clock
+from .schedule import MINUTES_PER_DAY, local_day_bounds, next_occurrence, shift_time, utc_offset_minutes
 
 User = get_user_model()
 
@@ -27,11 +30,29 @@ class Habit(models.Model):
     )
 
     # Время — время, когда необходимо выполнять привычку.
+    # Хранится в UTC и пересчитывается из местного времени при сохранении привычки или профиля
     time = models.TimeField(
         verbose_name='Время выполнения',
         help_text='Время, когда необходимо выполнять привычку'
     )
 
+    # Время в часовом поясе владельца — то, что выбрал пользователь
+    local_time = models.TimeField(
+        null=True,
+        blank=True,
+        verbose_name='Местное время выполнения',
+        help_text='Время в часовом поясе пользователя; UTC-время считается из него'
+    )
+
+    # Смещение пояса (минуты), по которому посчитано time — по нему находим строки после перехода на летнее время
+    utc_offset = models.SmallIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Смещение от UTC (мин)'
+    )
+
     # Действие — действие, которое представляет собой привычка.
     action = models.CharField(
         max_length=255,
@@ -89,6 +110,26 @@ class Habit(models.Model):
         help_text='Привычки можно публиковать в общий доступ'
     )
 
+    # Минута суток (UTC), в которую уходит напоминание — денормализовано для поиска по индексу
+    reminder_minute = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Минута напоминания (UTC)',
+        help_text='Минута суток в UTC с учетом упреждения напоминания, пересчитывается при сохранении'
+    )
+
+    # Ближайшее выполнение с учетом периодичности — пересчитывается при сохранении и выполнении
+    next_due_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Следующее выполнение',
+        help_text='Ближайший момент выполнения привычки с учетом периодичности'
+    )
+
     # Дата создания
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
@@ -101,24 +142,23 @@ class Habit(models.Model):
     def __str__(self):  # Исправлено: __str__ вместо str
         return f"{self.action} в {self.time} ({self.place})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем согласованную пару времени, чтобы понять, какое из них потом изменили
+        instance._synced_times = (instance.__dict__.get('time'), instance.__dict__.get('local_time'))
+        return instance
+
     def get_local_time(self):
-        """Получить время привычки в локальном часовом поясе (MSK)"""
+        """Получить время привычки в часовом поясе владельца — уже посчитано при сохранении"""
+        if self.local_time:
+            return self.local_time
         if self.time:
-            moscow_tz = pytz.timezone('Europe/Moscow')
-            # Создаем datetime с временем привычки (UTC из БД)
-            utc_time = timezone.now().replace(
-                hour=self.time.hour,
-                minute=self.time.minute,
-                second=0,
-                microsecond=0
-            )
-            # Конвертируем в MSK
-            moscow_time = utc_time.astimezone(moscow_tz)
-            return moscow_time.time()
+            return shift_time(self.time, utc_offset_minutes())
         return None
 
     def get_local_time_str(self):
-        """Получить время привычки в формате ЧЧ:ММ (MSK)"""
+        """Получить время привычки в формате ЧЧ:ММ (в часовом поясе владельца)"""
         local = self.get_local_time()
         if local:
             return f"{local.hour:02d}:{local.minute:02d}"
@@ -130,6 +170,87 @@ class Habit(models.Model):
             return f"{self.time.hour:02d}:{self.time.minute:02d}"
         return ""
 
+    def owner_timezone(self):
+        """Часовой пояс владельца привычки"""
+        try:
+            return self.user.profile.timezone
+        except ObjectDoesNotExist:
+            return settings.TIME_ZONE
+
+    def sync_fire_time(self, now=None):
+        """
+        Согласовать местное время и UTC по текущему смещению пояса владельца.
+        Если изменили только UTC-время (старый API, скрипты) — местное выводим из него,
+        иначе UTC считаем из местного.
+        """
+        offset = utc_offset_minutes(self.owner_timezone(), now)
+        synced = getattr(self, '_synced_times', None)
+        time_changed_alone = synced is not None and self.time != synced[0] and self.local_time == synced[1]
+
+        if self.local_time is None or time_changed_alone:
+            self.local_time = shift_time(self.time, offset) if self.time else None
+        else:
+            self.time = shift_time(self.local_time, -offset)
+        self.utc_offset = offset
+        self._synced_times = (self.time, self.local_time)
+
+    def apply_utc_offset(self, offset):
+        """
+        Новое смещение пояса (переход на летнее время): UTC-время считаем из местного,
+        минуту напоминания и next_due_at сдвигаем на ту же разницу — без запросов к БД.
+        """
+        old_minutes = self.time.hour * 60 + self.time.minute
+        self.time = shift_time(self.local_time or shift_time(self.time, self.utc_offset or 0), -offset)
+        shift = (self.time.hour * 60 + self.time.minute - old_minutes + MINUTES_PER_DAY // 2) % MINUTES_PER_DAY \
+            - MINUTES_PER_DAY // 2
+        self.utc_offset = offset
+        self.reminder_minute = self.calculate_reminder_minute()
+        if self.next_due_at:
+            self.next_due_at += timedelta(minutes=shift)
+        self._synced_times = (self.time, self.local_time)
+
+    def calculate_reminder_minute(self):
+        """Минута суток (UTC), когда нужно отправить напоминание о привычке"""
+        if not self.time:
+            return None
+        lead = getattr(settings, 'HABIT_REMINDER_LEAD_MINUTES', 5)
+        return (self.time.hour * 60 + self.time.minute - lead) % MINUTES_PER_DAY
+
+    def calculate_next_due_at(self, now=None):
+        """
+        Ближайшее выполнение привычки не раньше начала текущих суток.
+        Отсчет периодичности — от последнего выполнения, а если его нет — от даты создания.
+        """
+        if not self.time:
+            return None
+
+        last_completed = None
+        if self.pk:
+            last_completed = self.completions.filter(is_completed=True).order_by('-completion_date').values_list(
+                'completion_date', flat=True
+            ).first()
+        return self.next_due_after(last_completed, now)
+
+    def next_due_after(self, last_completed, now=None):
+        """Ближайшее выполнение при известной дате последнего выполнения (None — не выполнялась)"""
+        if not self.time:
+            return None
+
+        now = now or clock.now()
+        today_start, _ = local_day_bounds(now, self.owner_timezone())
+
+        if last_completed:
+            anchor = last_completed + timedelta(days=self.frequency)
+        else:
+            anchor = (self.created_at or now).astimezone(dt_timezone.utc).date()
+
+        return next_occurrence(self.time, self.frequency, anchor, today_start)
+
+    def refresh_next_due_at(self):
+        """Пересчитать next_due_at без полного сохранения привычки"""
+        self.next_due_at = self.calculate_next_due_at()
+        Habit.objects.filter(pk=self.pk).update(next_due_at=self.next_due_at)
+
     def clean(self):
         """Валидация на уровне модели"""
         # Валидация 1: Исключить одновременный выбор связанной привычки и указания вознаграждения
@@ -163,8 +284,18 @@ class Habit(models.Model):
         super().clean()
 
     def save(self, *args, **kwargs):
-        """Переопределяем save для вызова clean"""
+        """Переопределяем save для вызова clean и синхронизации расписания"""
+        self.sync_fire_time()
         self.full_clean()
+        self.reminder_minute = self.calculate_reminder_minute()
+        self.next_due_at = self.calculate_next_due_at()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'time', 'local_time', 'frequency'} & set(update_fields):
+            kwargs['update_fields'] = {
+                *update_fields, 'time', 'local_time', 'utc_offset', 'reminder_minute', 'next_due_at'
+            }
+
         super().save(*args, **kwargs)
 
 
@@ -208,9 +339,11 @@ class HabitCompletion(models.Model):
     def save(self, *args, **kwargs):
         # Если отмечаем как выполненную, устанавливаем время выполнения
         if self.is_completed and not self.completed_at:
-            from django.utils import timezone
-            self.completed_at = timezone.now()
+            self.completed_at = clock.now()
         elif not self.is_completed:
             self.completed_at = None
 
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+        # Следующее выполнение отсчитывается от последнего выполнения
+        self.habit.refresh_next_due_at()
\ No newline at end of file
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from . import clock
+
+MINUTES_PER_DAY = 24 * 60
+
+
+@lru_cache(maxsize=None)
+def get_zone(name=None):
+    """Часовой пояс по имени (по умолчанию — TIME_ZONE проекта)"""
+    return ZoneInfo(name or settings.TIME_ZONE)
+
+
+def local_day_bounds(now=None, tz=None):
+    """Начало и конец текущих суток в часовом поясе tz (по умолчанию — поясе проекта)"""
+    now = now or clock.now()
+    start = timezone.localtime(now, get_zone(tz)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
+
+def utc_offset_minutes(tz=None, now=None):
+    """Текущее смещение пояса от UTC в минутах"""
+    now = now or clock.now()
+    return int(now.astimezone(get_zone(tz)).utcoffset().total_seconds() // 60)
+
+
+def shift_time(value, minutes):
+    """Время суток, сдвинутое на minutes минут (по кругу)"""
+    total = (value.hour * 60 + value.minute + minutes) % MINUTES_PER_DAY
+    return value.replace(hour=total // 60, minute=total % 60)
+
+
+def active_timezones():
+    """Часовые пояса, которые выбраны хотя бы у одного пользователя"""
+    from users.models import UserProfile
+
+    return set(UserProfile.objects.order_by().values_list('timezone', flat=True).distinct())
+
+
+def occurrence_at(day, habit_time):
+    """Момент выполнения привычки в указанный день (время привычки хранится в UTC)"""
+    return datetime.combine(day, habit_time, tzinfo=dt_timezone.utc)
+
+
+def next_occurrence(habit_time, frequency, anchor_date, not_before):
+    """
+    Первое выполнение из ряда anchor_date, anchor_date + frequency, ...
+    не раньше not_before.
+    """
+    occurrence = occurrence_at(anchor_date, habit_time)
+    if occurrence < not_before:
+        period = timedelta(days=frequency)
+        periods = -(-(not_before - occurrence) // period)  # округление вверх
+        occurrence += period * periods
+    return occurrence
+
+
+def advance_overdue_habits(now=None, max_rounds=31, not_after=None):
+    """
+    Сдвинуть на следующий период привычки, чей срок прошел до начала текущих суток
+    в часовом поясе владельца (но не позже not_after, если он задан).
+    Возвращает число обновленных строк.
+    """
+    from .agenda import invalidate_all_agendas
+    from .models import Habit
+
+    overdue_condition = Q()
+    for tz in active_timezones():
+        day_start, _ = local_day_bounds(now, tz)
+        if not_after is not None:
+            day_start = min(day_start, not_after)
+        overdue_condition |= Q(user__profile__timezone=tz, next_due_at__lt=day_start)
+    if not overdue_condition:
+        return 0
+
+    overdue = Habit.objects.filter(overdue_condition)
+    if not overdue.exists():
+        return 0
+
+    updated = 0
+    # Каждый проход сдвигает на один период; после долгого простоя нужно несколько проходов
+    for _ in range(max_rounds):
+        round_updated = 0
+        for frequency in range(1, 8):
+            round_updated += overdue.filter(frequency=frequency).update(
+                next_due_at=F('next_due_at') + timedelta(days=frequency)
+            )
+        updated += round_updated
+        if not round_updated:
+            break
+
+    # Массовый update идет мимо сигналов — повестки на сегодня сбрасываем разом
+    if updated:
+        transaction.on_commit(invalidate_all_agendas)
+    return updated
+
+
+def refresh_next_due(habit_ids, now=None):
+    """
+    Пересчитать next_due_at после массовой записи выполнений: последнее выполнение каждой
+    привычки берем одним запросом, обновляем тоже одним. Возвращает id пользователей привычек.
+    """
+    from .models import Habit
+
+    habits = list(
+        Habit.objects.filter(pk__in=habit_ids)
+        .select_related('user__profile')
+        .annotate(last_completed=Max('completions__completion_date', filter=Q(completions__is_completed=True)))
+    )
+    for habit in habits:
+        habit.next_due_at = habit.next_due_after(habit.last_completed, now)
+    Habit.objects.bulk_update(habits, ['next_due_at'])
+    return {habit.user_id for habit in habits}
+
+
+def recompute_fire_times(now=None, batch_size=1000):
+    """
+    Пересчитать UTC-время привычек и сводок, у которых сменилось смещение пояса
+    (переход на летнее время или новые правила tzdata). Смещение считается один раз на пояс,
+    строки сдвигаются на разницу без преобразования поясов для каждой строки.
+    Возвращает список (id привычки, минута напоминания) измененных привычек.
+    """
+    from users.models import UserProfile
+    from .agenda import invalidate_all_agendas
+    from .models import Habit
+
+    now = now or clock.now()
+    changed = []
+
+    for tz in active_timezones():
+        offset = utc_offset_minutes(tz, now)
+
+        stale = Habit.objects.filter(user__profile__timezone=tz).exclude(utc_offset=offset).order_by('pk')
+        # Порциями по первичному ключу: строки после обновления из выборки выпадают
+        while True:
+            batch = list(stale[:batch_size])
+            if not batch:
+                break
+            for habit in batch:
+                habit.apply_utc_offset(offset)
+                habit.updated_at = now
+            Habit.objects.bulk_update(batch, ['time', 'utc_offset', 'reminder_minute', 'next_due_at', 'updated_at'])
+            changed += [(habit.id, None if habit.is_pleasant else habit.reminder_minute) for habit in batch]
+
+        profiles = list(UserProfile.objects.filter(timezone=tz).exclude(utc_offset=offset))
+        for profile in profiles:
+            profile.apply_utc_offset(offset)
+        UserProfile.objects.bulk_update(profiles, ['utc_offset', 'digest_minute'], batch_size=batch_size)
+
+    if changed:
+        transaction.on_commit(invalidate_all_agendas)
+    return changed
@@ -5,7 +5,8 @@ from .models import Habit, HabitCompletion
 class HabitSerializer(serializers.ModelSerializer):
     """Сериализатор для привычек с локальным временем"""
 
-    local_time = serializers.SerializerMethodField()
+    # Время в часовом поясе владельца; UTC-время (time) модель считает сама
+    local_time = serializers.TimeField(format='%H:%M', required=False)
     time_display = serializers.SerializerMethodField()
 
     class Meta:
@@ -13,20 +14,18 @@ class HabitSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'place', 'time', 'local_time', 'time_display', 'action', 'is_pleasant',
             'related_habit', 'frequency', 'reward', 'duration',
-            'is_public', 'created_at', 'updated_at'
+            'is_public', 'next_due_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'local_time', 'time_display']
-
-    def get_local_time(self, obj):
-        """Возвращает время в локальном часовом поясе (MSK)"""
-        return obj.get_local_time_str()
+        read_only_fields = ['next_due_at', 'created_at', 'updated_at', 'time_display']
+        extra_kwargs = {'time': {'required': False}}
 
     def get_time_display(self, obj):
         """Возвращает время в формате для отображения"""
         local = obj.get_local_time()
         if local:
             return {
-                'msk': f"{local.hour:02d}:{local.minute:02d}",
+                'local': f"{local.hour:02d}:{local.minute:02d}",
+                'timezone': obj.owner_timezone(),
                 'utc': f"{obj.time.hour:02d}:{obj.time.minute:02d}",
                 'raw': obj.time
             }
@@ -34,6 +33,9 @@ class HabitSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """Валидация привычки"""
+        if self.instance is None and not (data.get('time') or data.get('local_time')):
+            raise serializers.ValidationError({'local_time': 'Укажите время выполнения привычки'})
+
         # ТЗ: нельзя одновременно указывать связанную привычку и вознаграждение
         if data.get('related_habit') and data.get('reward'):
             raise serializers.ValidationError(
@@ -68,7 +70,7 @@ class PublicHabitSerializer(serializers.ModelSerializer):
         read_only_fields = ['__all__']
 
     def get_local_time(self, obj):
-        """Возвращает время в локальном часовом поясе (MSK)"""
+        """Возвращает время в часовом поясе владельца"""
         return obj.get_local_time_str()
 
 
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import UserProfile
+from .agenda import invalidate_agenda, invalidate_chat
+from .models import Habit, HabitCompletion
+
+
+@receiver(post_save, sender=Habit)
+@receiver(post_delete, sender=Habit)
+def habit_changed(sender, instance, **kwargs):
+    """Изменение или удаление привычки — повестка владельца на сегодня устарела"""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_agenda(user_id))
+
+
+@receiver(post_save, sender=HabitCompletion)
+@receiver(post_delete, sender=HabitCompletion)
+def completion_changed(sender, instance, **kwargs):
+    """Выполнение сдвигает срок привычки (через update, без сигнала привычки) — повестка устарела"""
+    if HabitCompletion.habit.is_cached(instance):
+        user_id = instance.habit.user_id
+    else:
+        # При каскадном удалении привычки ее строки может уже не быть — тогда сработает сигнал привычки
+        user_id = Habit.objects.filter(pk=instance.habit_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        transaction.on_commit(lambda: invalidate_agenda(user_id))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    """Сменились пояс или привязка чата — сбрасываем повестку и соответствие чатов"""
+    user_id = instance.user_id
+    chat_ids = {instance.telegram_chat_id, getattr(instance, '_loaded_chat_id', None)}
+    transaction.on_commit(lambda: invalidate_chat(*chat_ids))
+    transaction.on_commit(lambda: invalidate_agenda(user_id))
@@ -4,8 +4,16 @@ from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from asgiref.sync import async_to_sync
+from habits.agenda import get_agenda
+from habits.clock import SimulatedClock, use_clock
 from habits.models import Habit, HabitCompletion
-from datetime import time
+from habits.schedule import advance_overdue_habits, recompute_fire_times
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from unittest.mock import patch
 
 User = get_user_model()
 
@@ -46,6 +54,220 @@ class HabitModelTest(TestCase):
         local_time = self.habit.get_local_time()
         self.assertIsNotNone(local_time)
 
+    def test_reminder_minute_with_lead_time(self):
+        """Тест: минута напоминания — за 5 минут до времени привычки (UTC)"""
+        self.assertEqual(self.habit.reminder_minute, 6 * 60 + 55)
+
+    def test_reminder_minute_wraps_midnight(self):
+        """Тест: напоминание для 00:02 уходит в 23:57 предыдущих суток"""
+        self.habit.time = time(0, 2)
+        self.habit.save(update_fields=['time'])
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.reminder_minute, 23 * 60 + 57)
+
+
+class HabitScheduleTest(TestCase):
+    """Тесты для расчета следующего выполнения с учетом периодичности"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.habit = Habit.objects.create(
+            user=self.user,
+            place='Парк',
+            time=time(8, 0),
+            action='Пробежка',
+            frequency=3,
+            duration=60
+        )
+
+    def test_next_due_at_on_save(self):
+        """Тест: следующее выполнение рассчитывается при сохранении"""
+        self.assertIsNotNone(self.habit.next_due_at)
+        self.assertEqual(self.habit.next_due_at.time(), time(8, 0))
+
+    def test_completion_moves_next_due_at_by_frequency(self):
+        """Тест: после выполнения следующий срок — через frequency дней"""
+        today = timezone.now().date()
+        HabitCompletion.objects.create(habit=self.habit, completion_date=today, is_completed=True)
+
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.next_due_at.date(), today + timedelta(days=3))
+
+    def test_advance_overdue_habits(self):
+        """Тест: просроченная привычка сдвигается на целое число периодов"""
+        overdue = self.habit.next_due_at - timedelta(days=7)
+        Habit.objects.filter(pk=self.habit.pk).update(next_due_at=overdue)
+
+        advance_overdue_habits()
+
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.next_due_at, overdue + timedelta(days=9))
+
+    def test_today_endpoint_returns_only_due_habits(self):
+        """Тест: /today/ возвращает только привычки со сроком сегодня"""
+        Habit.objects.create(user=self.user, place='Дом', time=time(9, 0), action='Сегодня')
+        Habit.objects.filter(pk=self.habit.pk).update(next_due_at=timezone.now() + timedelta(days=2))
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(reverse('my-habits-today'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([h['action'] for h in response.data['results']], ['Сегодня'])
+
+
+class HabitTimezoneTest(TestCase):
+    """Тесты для часового пояса пользователя и пересчета после перехода на летнее время"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='berliner', password='testpass123')
+        self.profile = self.user.profile
+        self.profile.timezone = 'Europe/Berlin'
+        self.profile.daily_notification_time = time(9, 0)
+        with use_clock(SimulatedClock(datetime(2026, 1, 15, 12, 0, tzinfo=dt_timezone.utc))):
+            self.profile.save()
+
+    def create_habit(self):
+        return Habit.objects.create(user=self.user, place='Дом', local_time=time(8, 0), action='Зарядка')
+
+    def test_utc_time_from_local_time(self):
+        """Тест: UTC-время и минута напоминания считаются из местного времени пояса пользователя"""
+        with use_clock(SimulatedClock(datetime(2026, 1, 15, 12, 0, tzinfo=dt_timezone.utc))):
+            habit = self.create_habit()
+
+        self.assertEqual(habit.time, time(7, 0))
+        self.assertEqual(habit.utc_offset, 60)
+        self.assertEqual(habit.reminder_minute, 6 * 60 + 55)
+        self.assertEqual(habit.get_local_time_str(), '08:00')
+
+    def test_recompute_after_dst_switch(self):
+        """Тест: после перехода на летнее время задача пересчета сдвигает UTC-время, местное не меняется"""
+        simulated = SimulatedClock(datetime(2026, 3, 29, 0, 30, tzinfo=dt_timezone.utc))
+        with use_clock(simulated):
+            habit = self.create_habit()
+            self.profile.refresh_from_db()
+            self.assertEqual(self.profile.digest_minute, 8 * 60)
+            self.assertEqual(habit.next_due_at, datetime(2026, 3, 29, 7, 0, tzinfo=dt_timezone.utc))
+
+            # Переход на летнее время в Берлине — 01:00 UTC
+            simulated.set(datetime(2026, 3, 29, 1, 30, tzinfo=dt_timezone.utc))
+            self.assertEqual(recompute_fire_times(), [(habit.id, 5 * 60 + 55)])
+            self.assertEqual(recompute_fire_times(), [])
+
+        habit.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.assertEqual(habit.time, time(6, 0))
+        self.assertEqual(habit.local_time, time(8, 0))
+        self.assertEqual(habit.utc_offset, 120)
+        self.assertEqual(habit.next_due_at, datetime(2026, 3, 29, 6, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.profile.digest_minute, 7 * 60)
+
+    def test_recompute_tick_uses_indexes(self):
+        """Тест: тик пересчета без изменений — постоянное число запросов, и ни один не читает таблицу целиком"""
+        now = datetime(2026, 1, 15, 12, 0, tzinfo=dt_timezone.utc)
+        with use_clock(SimulatedClock(now)):
+            self.create_habit()
+
+        # Пояса пользователей, затем на каждый пояс — привычки и профили со старым смещением
+        with CaptureQueriesContext(connection) as queries, self.assertNumQueries(3):
+            self.assertEqual(recompute_fire_times(now), [])
+
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            for query in queries:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = ' | '.join(row[-1] for row in cursor.fetchall())
+                self.assertNotRegex(plan, r'SCAN (users_userprofile|habits_habit)\b(?! USING)', plan)
+
+    def test_timezone_change_keeps_local_time(self):
+        """Тест: при смене пояса сохраняется местное время привычек, UTC-время пересчитывается"""
+        with use_clock(SimulatedClock(datetime(2026, 1, 15, 12, 0, tzinfo=dt_timezone.utc))):
+            habit = self.create_habit()
+            self.profile.timezone = 'Asia/Yekaterinburg'
+            self.profile.save()
+
+        habit.refresh_from_db()
+        self.assertEqual(habit.local_time, time(8, 0))
+        self.assertEqual(habit.time, time(3, 0))
+        self.assertEqual(habit.utc_offset, 300)
+
+
+class HabitAgendaTest(TestCase):
+    """Тесты для общей повестки на сегодня: кеш, сброс по сигналам и по смене суток"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='agenda', password='testpass123')
+        self.profile = self.user.profile
+        self.profile.telegram_chat_id = 777
+        self.profile.save()
+        self.now = datetime(2026, 5, 20, 3, 0, tzinfo=dt_timezone.utc)
+        with use_clock(SimulatedClock(self.now)), self.captureOnCommitCallbacks(execute=True):
+            self.habit = Habit.objects.create(user=self.user, place='Дом', local_time=time(9, 0), action='Зарядка')
+
+    def agenda(self):
+        return [item['action'] for item in get_agenda(self.user.id, now=self.now)]
+
+    def test_cached_and_invalidated_by_signals(self):
+        """Тест: повторное чтение — без запросов; привычка и выполнение сбрасывают повестку"""
+        self.assertEqual(self.agenda(), ['Зарядка'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.agenda(), ['Зарядка'])
+
+        with use_clock(SimulatedClock(self.now)), self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.create(user=self.user, place='Дом', local_time=time(7, 0), action='Вода')
+        self.assertEqual(self.agenda(), ['Вода', 'Зарядка'])
+
+        with use_clock(SimulatedClock(self.now)), self.captureOnCommitCallbacks(execute=True):
+            HabitCompletion.objects.create(habit=self.habit, completion_date=self.now.date(), is_completed=True)
+        self.assertEqual(self.agenda(), ['Вода'])
+
+    def test_recomputed_when_date_changes(self):
+        """Тест: на следующие сутки повестка считается заново, массовый сдвиг сроков тоже ее сбрасывает"""
+        self.agenda()
+        self.now += timedelta(days=1)
+        with self.assertNumQueries(2):
+            # Вчерашний срок еще не сдвинут — сегодня привычки нет
+            self.assertEqual(self.agenda(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            advance_overdue_habits(now=self.now)
+        self.assertEqual(self.agenda(), ['Зарядка'])
+
+    def test_bot_and_api_read_same_agenda(self):
+        """Тест: бот читает повестку по чату без запросов при попадании, API — ту же повестку"""
+        from telegram_bot.services import get_today_habits
+
+        with use_clock(SimulatedClock(self.now)):
+            habits = async_to_sync(get_today_habits)(777)
+            with self.assertNumQueries(0):
+                self.assertEqual(async_to_sync(get_today_habits)(777), habits)
+
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            response = client.get(reverse('my-habits-agenda'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], habits)
+        self.assertEqual(habits[0]['time'], '09:00')
+
+
+    def test_chat_agenda_changed_during_query_is_stale(self):
+        """Тест: изменение, пришедшее во время расчета повестки чата, делает запись устаревшей"""
+        from habits import agenda
+
+        def changed_during_query(user_id, tz, now=None):
+            agenda.invalidate_agenda(user_id)
+            return Habit.objects.filter(user_id=user_id)
+
+        with patch('habits.agenda.agenda_queryset', side_effect=changed_during_query):
+            async_to_sync(agenda.aget_chat_agenda)(777, now=self.now)
+
+        entry = cache.get(agenda.agenda_key(self.user.id))
+        self.assertFalse(agenda.is_fresh(
+            entry, cache.get(agenda.agenda_version_key(self.user.id)), None, self.now
+        ))
 
 class HabitCompletionModelTest(TestCase):
     """Тесты для модели HabitCompletion"""
@@ -1,9 +1,11 @@
 from rest_framework import viewsets, generics, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.utils import timezone
 
+from . import clock
+from .agenda import get_agenda
 from .models import Habit, HabitCompletion
+from .schedule import local_day_bounds
 from .serializers import (
     HabitSerializer,
     PublicHabitSerializer,
@@ -49,6 +51,29 @@ class HabitViewSet(viewsets.ModelViewSet):
         serializer = PublicHabitSerializer(public_habits, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def today(self, request):
+        """Привычки, которые по периодичности нужно выполнить сегодня"""
+        today_start, today_end = local_day_bounds(tz=request.user.profile.timezone)
+        due_habits = self.get_queryset().filter(
+            next_due_at__gte=today_start,
+            next_due_at__lt=today_end
+        ).order_by('next_due_at')
+
+        page = self.paginate_queryset(due_habits)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(due_habits, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def agenda(self, request):
+        """Повестка на сегодня — та же, что показывает бот; на попадании в кеш без запросов привычек"""
+        habits = get_agenda(request.user.id)
+        return Response({'count': len(habits), 'results': habits})
+
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
         """Отметить привычку как выполненную"""
@@ -61,7 +86,7 @@ class HabitViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        today = timezone.now().date()
+        today = clock.now().date()
         completion, created = HabitCompletion.objects.get_or_create(
             habit=habit,
             completion_date=today,
@@ -1,3 +1,38 @@
 from django.contrib import admin
+from .models import DeadLetter, NotificationOutbox, ReminderWatermark, SnoozedReminder
 
-# Register your models here.
+
+@admin.register(ReminderWatermark)
+class ReminderWatermarkAdmin(admin.ModelAdmin):
+    """Отметки обработки рассылок (можно сдвинуть вручную)"""
+
+    list_display = ('name', 'last_minute', 'updated_at')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(DeadLetter)
+class DeadLetterAdmin(admin.ModelAdmin):
+    """Недоставленные сообщения"""
+
+    list_display = ('chat_id', 'error', 'attempts', 'created_at')
+    list_filter = ('created_at',)
+    search_fields = ('chat_id', 'error')
+    readonly_fields = ('chat_id', 'text', 'error', 'attempts', 'created_at')
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    """Очередь исходящих уведомлений"""
+
+    list_display = ('chat_id', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('chat_id', 'error')
+    readonly_fields = ('chat_id', 'text', 'parse_mode', 'attempts', 'sent_at', 'error', 'created_at')
+
+
+@admin.register(SnoozedReminder)
+class SnoozedReminderAdmin(admin.ModelAdmin):
+    """Отложенные напоминания"""
+
+    list_display = ('chat_id', 'habit_id', 'habit_at', 'due_at')
+    search_fields = ('chat_id',)
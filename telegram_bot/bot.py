@@ -1,10 +1,21 @@
 import asyncio
+from datetime import datetime
 from django.conf import settings
-from telegram import Bot, Update
-from telegram.ext import Application, CommandHandler, ConversationHandler, MessageHandler, filters
+from django.utils import timezone
+from telegram import Bot, InlineKeyboardMarkup, Update
+from telegram.ext import (
+    Application, CallbackQueryHandler, CommandHandler, ConversationHandler, MessageHandler, TypeHandler, filters
+)
 from telegram.ext import ContextTypes
 import logging
 
+from .delivery import api_base_url, build_reply_markup
+from .flood import build_flood_guard
+from .persistence import build_persistence
+from .ratelimit import build_rate_limiter
+from .reminders import DONE_ACTION, markdown_text
+from .updates import configure_concurrency
+
 # Состояния для ConversationHandler
 SELECTING_ACTION, AWAITING_TOKEN = range(2)
 
@@ -14,7 +25,7 @@ logger = logging.getLogger(__name__)
 class HabitBot:
     """Telegram бот для трекера привычек"""
 
-    def __init__(self, token=None):
+    def __init__(self, token=None, concurrency=None):
         self.token = token or getattr(settings, 'TELEGRAM_BOT_TOKEN', None)
         if not self.token:
             raise ValueError(
@@ -22,6 +33,10 @@ class HabitBot:
                 "Добавь его в .env файл и настройки Django."
             )
         self.application = None
+        self.conversation = None
+        self.flood_guard = build_flood_guard()
+        # Сколько обновлений обрабатывать одновременно; по умолчанию TELEGRAM_BOT_CONCURRENCY
+        self.concurrency = concurrency
         self.setup_handlers()
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -101,10 +116,50 @@ class HabitBot:
 
         message = "📋 **Твои привычки на сегодня:**\n\n"
         for i, habit in enumerate(habits, 1):
-            message += f"{i}. {habit['action']} в {habit['time']}\n"
-            message += f"   📍 {habit['place']}\n\n"
+            message += f"{i}. {markdown_text(habit['action'])} в {habit['time']}\n"
+            message += f"   📍 {markdown_text(habit['place'])}\n\n"
 
-        await update.message.reply_text(message, parse_mode='Markdown')
+        # Кнопки «Выполнено» — те же, что под напоминаниями: дата — день срока в UTC
+        buttons = [
+            [(f"✅ {habit['action'][:24]}",
+              f"{DONE_ACTION}:{habit['id']}:{datetime.fromisoformat(habit['next_due_at']):%Y%m%d}")]
+            for habit in habits
+        ]
+        await update.message.reply_text(message, parse_mode='Markdown', reply_markup=build_reply_markup(buttons))
+
+    async def reminder_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Кнопки под напоминанием и списком /habits: «Выполнено» и «Отложить»"""
+        query = update.callback_query
+        chat_id = update.effective_chat.id
+
+        try:
+            action, habit_id, habit_date = query.data.split(':')
+            habit_id = int(habit_id)
+            habit_date = datetime.strptime(habit_date, '%Y%m%d').date()
+        except ValueError:
+            await query.answer("❌ Кнопка устарела")
+            return
+
+        from .services import complete_habit, snooze_habit
+
+        if action == DONE_ACTION:
+            # Ответ сразу: в базу нажатие запишет сброс буфера
+            await complete_habit(chat_id, habit_id, habit_date)
+            await query.answer("✅ Отмечено! Так держать!")
+        else:
+            due_at = await snooze_habit(chat_id, habit_id, habit_date)
+            if due_at is None:
+                await query.answer("❌ Привычка не найдена")
+                return
+            await query.answer(f"⏰ Напомню в {timezone.localtime(due_at).strftime('%H:%M')}")
+
+        # Убираем кнопки этой привычки, остальные оставляем
+        keyboard = query.message.reply_markup.inline_keyboard if query.message.reply_markup else ()
+        rows = [
+            row for row in keyboard
+            if not any(button.callback_data.split(':')[1] == str(habit_id) for button in row)
+        ]
+        await query.edit_message_reply_markup(InlineKeyboardMarkup(rows) if rows else None)
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Помощь"""
@@ -130,13 +185,31 @@ class HabitBot:
         )
         return ConversationHandler.END
 
+    async def refresh_conversation(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Состояние /connect и user_data из общего хранилища: начать разговор могла другая реплика бота"""
+        if update.message and update.effective_chat and update.effective_user:
+            await context.application.persistence.refresh(
+                self.conversation, (update.effective_chat.id, update.effective_user.id), context.user_data
+            )
+
     def setup_handlers(self):
         """Настройка обработчиков команд"""
-        self.application = Application.builder().token(self.token).build()
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .base_url(api_base_url())
+            .rate_limiter(build_rate_limiter())
+            # Разговоры (/connect) и user_data — во внешнем хранилище: переживают перезапуск и видны всем репликам
+            .persistence(build_persistence())
+        )
+        # Разные чаты — параллельно, один чат — по порядку (на этом держится ConversationHandler)
+        # Флуд отбрасывается по приходе обновления — до очереди чата, разбора токенов и запросов к БД
+        self.application = configure_concurrency(builder, self.concurrency, self.flood_guard).build()
 
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("habits", self.habits_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
+        self.application.add_handler(CallbackQueryHandler(self.reminder_button, pattern=r'^(done|snooze):'))
 
         conv_handler = ConversationHandler(
             entry_points=[CommandHandler("connect", self.connect_command)],
@@ -144,10 +217,40 @@ class HabitBot:
                 AWAITING_TOKEN: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_token)],
             },
             fallbacks=[CommandHandler("cancel", self.cancel)],
+            name='connect',
+            persistent=True,
         )
         self.application.add_handler(conv_handler)
+        self.conversation = conv_handler
+
+        if self.application.persistence.shared:
+            # Раньше всех обработчиков: ConversationHandler должен увидеть свежее состояние
+            self.application.add_handler(TypeHandler(Update, self.refresh_conversation), group=-1)
 
     def run(self):
         """Запуск бота в режиме polling"""
         print("🤖 Telegram бот запущен...")
         self.application.run_polling()
+
+    async def set_webhook(self, url=None):
+        """
+        Переключить бота на вебхук: обновления будет принимать ASGI-приложение (config/asgi.py).
+        Polling после этого не нужен — run_polling при запуске сам снимает вебхук.
+        Одно соединение: следующее обновление Telegram присылает после ответа на предыдущее,
+        поэтому в очередь бота они попадают в своем порядке.
+        """
+        from .webhook import webhook_secret
+
+        url = url or getattr(settings, 'TELEGRAM_WEBHOOK_URL', '')
+        if not url:
+            raise ValueError("TELEGRAM_WEBHOOK_URL не задан")
+        secret = webhook_secret()
+        if not secret:
+            raise ValueError("TELEGRAM_WEBHOOK_SECRET не задан")
+        async with self.application.bot:
+            return await self.application.bot.set_webhook(
+                url=url,
+                secret_token=secret,
+                max_connections=1,
+                allowed_updates=Update.ALL_TYPES,
+            )
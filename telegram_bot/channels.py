@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import os
+import re
+import smtplib
+import socket
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from users.models import UserProfile, webhook_ip_error, webhook_url_error
+from .delivery import DeliveryResult, get_sender
+
+logger = logging.getLogger(__name__)
+
+
+def profile_recipient(channel, chat_id, email, webhook_url):
+    """Поля сообщения (канал, chat_id, адрес) для профиля с выбранным каналом"""
+    if channel == UserProfile.CHANNEL_EMAIL:
+        return {'channel': channel, 'chat_id': None, 'address': email}
+    if channel == UserProfile.CHANNEL_WEBHOOK:
+        return {'channel': channel, 'chat_id': None, 'address': webhook_url}
+    return {'channel': UserProfile.CHANNEL_TELEGRAM, 'chat_id': chat_id, 'address': ''}
+
+
+# Экранированный символ (остается как есть) или символ разметки Telegram (убираем)
+MARKDOWN_TOKEN = re.compile(r'\\([_*`\[])|[*`]')
+
+
+def plain_text(text):
+    """Текст без разметки Telegram — для писем"""
+    return MARKDOWN_TOKEN.sub(lambda match: match.group(1) or '', text)
+
+
+def email_subject(text):
+    """Тема письма — первая непустая строка уведомления"""
+    for line in plain_text(text).splitlines():
+        if line.strip():
+            return line.strip()[:78]
+    return 'Уведомление о привычках'
+
+
+class EmailChannel:
+    """
+    Уведомления по почте. На пакет — одно SMTP-соединение:
+    письма идут одно за другим, результат у каждого свой.
+    """
+
+    name = UserProfile.CHANNEL_EMAIL
+
+    def __init__(self, backend=None, from_email=None, **options):
+        self.backend = backend
+        self.from_email = from_email
+        self.options = options
+
+    def send_batch(self, messages):
+        messages = list(messages)
+        if not messages:
+            return []
+
+        connection = get_connection(self.backend, fail_silently=False, **self.options)
+        try:
+            connection.open()
+        except Exception as e:
+            logger.error(f"❌ Почтовый сервер недоступен: {e}")
+            return [DeliveryResult(message=message, ok=False, error=str(e)) for message in messages]
+
+        try:
+            return [self._send(connection, message) for message in messages]
+        finally:
+            connection.close()
+
+    def _send(self, connection, message):
+        email = EmailMessage(
+            subject=email_subject(message.text),
+            body=plain_text(message.text),
+            from_email=self.from_email,
+            to=[message.address],
+            connection=connection,
+        )
+        try:
+            email.send()
+        except smtplib.SMTPRecipientsRefused as e:
+            # Адрес отвергнут сервером — повтор не поможет
+            return DeliveryResult(message=message, ok=False, error=str(e), permanent=True)
+        except Exception as e:
+            logger.error(f"❌ Ошибка отправки письма {message.address}: {e}")
+            return DeliveryResult(message=message, ok=False, error=str(e))
+        return DeliveryResult(message=message, ok=True)
+
+    async def asend_batch(self, messages):
+        return await sync_to_async(self.send_batch, thread_sensitive=False)(messages)
+
+
+class BlockedWebhook(Exception):
+    """Адрес вебхука ведет туда, куда слать нельзя"""
+
+
+class PinnedTransport(httpx.HTTPTransport):
+    """
+    Транспорт вебхуков: хост резолвится один раз, все его адреса проверяются, и соединение
+    идет на проверенный IP (с Host и SNI исходного хоста). Между проверкой и соединением
+    DNS уже не спрашивается — подменить адрес на внутренний (DNS rebinding) не выйдет.
+    """
+
+    def handle_request(self, request):
+        if getattr(settings, 'NOTIFICATION_WEBHOOK_ALLOW_LOCAL', False):
+            return super().handle_request(request)
+        host = request.url.host
+        error = webhook_url_error(str(request.url))
+        if error:
+            raise BlockedWebhook(error)
+        try:
+            infos = socket.getaddrinfo(host, request.url.port or 443, type=socket.SOCK_STREAM)
+        except (OSError, UnicodeError) as e:
+            raise httpx.ConnectError(f'Хост вебхука не найден: {host} ({e})', request=request)
+        addresses = [info[4][0] for info in infos]
+        for address in addresses:
+            error = webhook_ip_error(host, address)
+            if error:
+                raise BlockedWebhook(error)
+        request.url = request.url.copy_with(host=addresses[0].split('%')[0])
+        request.extensions = {**request.extensions, 'sni_hostname': host}
+        return super().handle_request(request)
+
+
+class WebhookChannel:
+    """
+    Уведомления во внешний вебхук: POST с JSON.
+    Один httpx.Client на процесс — соединения с получателями остаются открытыми между пакетами.
+    Куда ведет адрес, проверяется при каждой отправке (PinnedTransport), по редиректам не переходим.
+    """
+
+    name = UserProfile.CHANNEL_WEBHOOK
+
+    def __init__(self, timeout=None, concurrency=None):
+        self.timeout = timeout or getattr(settings, 'NOTIFICATION_WEBHOOK_TIMEOUT', 10)
+        self.concurrency = concurrency or getattr(settings, 'NOTIFICATION_WEBHOOK_CONCURRENCY', 10)
+        self._client = None
+        self._pid = None
+
+    @property
+    def client(self):
+        """После fork воркера — свой пул соединений"""
+        if self._client is None or self._pid != os.getpid():
+            self._client = httpx.Client(
+                timeout=self.timeout,
+                # Редирект мог бы увести запрос во внутреннюю сеть в обход проверки адреса
+                follow_redirects=False,
+                transport=PinnedTransport(limits=httpx.Limits(
+                    max_connections=self.concurrency, max_keepalive_connections=self.concurrency,
+                )),
+            )
+            self._pid = os.getpid()
+        return self._client
+
+    def send_batch(self, messages):
+        messages = list(messages)
+        if not messages:
+            return []
+        if len(messages) == 1 or self.concurrency == 1:
+            return [self._send(message) for message in messages]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(messages))) as pool:
+            return list(pool.map(self._send, messages))
+
+    def _send(self, message):
+        payload = {'text': message.text, 'parse_mode': message.parse_mode, 'buttons': message.buttons}
+        try:
+            response = self.client.post(message.address, json=payload)
+        except BlockedWebhook as e:
+            logger.warning(f"🚫 Вебхук {message.address} отклонен: {e}")
+            return DeliveryResult(message=message, ok=False, error=str(e), permanent=True)
+        except httpx.HTTPError as e:
+            logger.error(f"❌ Вебхук {message.address} недоступен: {e}")
+            return DeliveryResult(message=message, ok=False, error=str(e))
+
+        if response.is_success:
+            return DeliveryResult(message=message, ok=True)
+        error = f"HTTP {response.status_code}"
+        # 4xx, кроме таймаута и лимита, — ошибка получателя, повтор не поможет
+        permanent = response.is_client_error and response.status_code not in (408, 429)
+        return DeliveryResult(message=message, ok=False, error=error, permanent=permanent)
+
+    async def asend_batch(self, messages):
+        return await sync_to_async(self.send_batch, thread_sensitive=False)(messages)
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class ChannelDispatcher:
+    """
+    Отправка пакета из очереди уведомлений: сообщения делятся по каналам,
+    каждый канал получает свою часть одним пакетом. Результаты — в исходном порядке.
+    """
+
+    def __init__(self, channels=None):
+        self.channels = dict(channels or {})
+
+    def channel(self, name):
+        if name not in self.channels:
+            factory = CHANNEL_FACTORIES.get(name)
+            self.channels[name] = factory() if factory else None
+        return self.channels[name]
+
+    def paused_channels(self):
+        """Каналы с открытым предохранителем — их строки не забираем из очереди, пока он не закроется"""
+        return {
+            name for name, channel in self.channels.items()
+            if channel is not None and hasattr(channel, 'paused_channels') and channel.paused_channels()
+        }
+
+    def _split(self, messages):
+        groups = defaultdict(list)
+        for index, message in enumerate(messages):
+            groups[message.channel or UserProfile.CHANNEL_TELEGRAM].append((index, message))
+        return groups
+
+    @staticmethod
+    def _unknown(name, items, results):
+        logger.error(f"❌ Неизвестный канал уведомлений: {name}")
+        for index, message in items:
+            results[index] = DeliveryResult(
+                message=message, ok=False, error=f'Неизвестный канал: {name}', permanent=True
+            )
+
+    def send_batch(self, messages):
+        messages = list(messages)
+        results = [None] * len(messages)
+        for name, items in self._split(messages).items():
+            channel = self.channel(name)
+            if channel is None:
+                self._unknown(name, items, results)
+                continue
+            for (index, _), result in zip(items, channel.send_batch([message for _, message in items])):
+                results[index] = result
+        return results
+
+    async def asend_batch(self, messages):
+        messages = list(messages)
+        results = [None] * len(messages)
+        groups = []
+        for name, items in self._split(messages).items():
+            channel = self.channel(name)
+            if channel is None:
+                self._unknown(name, items, results)
+            else:
+                groups.append((channel, items))
+        # Каналы независимы: медленный вебхук не должен задерживать Telegram и почту
+        batches = await asyncio.gather(
+            *(channel.asend_batch([message for _, message in items]) for channel, items in groups)
+        )
+        for (_, items), batch in zip(groups, batches):
+            for (index, _), result in zip(items, batch):
+                results[index] = result
+        return results
+
+
+# Каналы создаются лениво, при первом сообщении в них
+CHANNEL_FACTORIES = {
+    UserProfile.CHANNEL_TELEGRAM: get_sender,
+    UserProfile.CHANNEL_EMAIL: EmailChannel,
+    UserProfile.CHANNEL_WEBHOOK: WebhookChannel,
+}
+
+_dispatcher = None
+
+
+def get_dispatcher():
+    """Общий диспетчер каналов для текущего процесса"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = ChannelDispatcher()
+    return _dispatcher
@@ -0,0 +1,216 @@
+import logging
+import threading
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+
+from habits import clock
+from habits.agenda import invalidate_agenda
+from habits.models import Habit, HabitCompletion
+from habits.schedule import refresh_next_due
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'habits:completions:pending'
+# Пачки, которые сейчас пишут сбросы: у каждого сброса свой ключ, в наборе — время его аренды
+FLUSHING_PREFIX = 'habits:completions:flushing:'
+BATCHES_KEY = 'habits:completions:batches'
+# Сколько выполнений обновлять одним запросом
+UPDATE_CHUNK = 500
+
+# Забираем накопленные нажатия под новым ключом и заодно пачки упавших сбросов с истекшей арендой.
+# Все в одном скрипте: два сброса не получат одну пачку, и пачка не потеряется между RENAME и ZADD.
+TAKE_SCRIPT = """
+local now = tonumber(redis.call('TIME')[1])
+local batches = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[1]))
+for _, key in ipairs(batches) do
+    redis.call('ZADD', KEYS[2], now, key)
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[3])
+    redis.call('ZADD', KEYS[2], now, KEYS[3])
+    table.insert(batches, KEYS[3])
+end
+return batches
+"""
+
+
+def completion_field(chat_id, habit_id, completion_date):
+    """Одно нажатие «Выполнено»: повторные нажатия той же кнопки совпадают и не множатся"""
+    return f'{chat_id}:{habit_id}:{completion_date:%Y%m%d}'
+
+
+def parse_field(field, completed_at):
+    chat_id, habit_id, day = field.split(':')
+    return int(chat_id), int(habit_id), datetime.strptime(day, '%Y%m%d').date(), datetime.fromisoformat(completed_at)
+
+
+class LocalCompletionBuffer:
+    """Буфер нажатий внутри одного процесса (для тестов и локального запуска)"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    async def add(self, chat_id, habit_id, completion_date, completed_at):
+        with self._lock:
+            self._pending.setdefault(completion_field(chat_id, habit_id, completion_date), completed_at.isoformat())
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return None, [parse_field(field, completed_at) for field, completed_at in pending.items()]
+
+    def done(self, batch):
+        pass
+
+
+class RedisCompletionBuffer:
+    """
+    Буфер нажатий в хеше Redis — общий для всех процессов бота. Добавление — один HSETNX,
+    сброс забирает весь хеш разом (RENAME под своим ключом), а удаляет пачку только после записи в БД.
+    """
+
+    def __init__(self, url, lease=None):
+        self.url = url
+        self.lease = lease or getattr(settings, 'COMPLETION_FLUSH_LEASE_SECONDS', 300)
+        self._client = None
+        self._async_client = None
+        self._take = None
+
+    @property
+    def client(self):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url, decode_responses=True)
+            self._take = self._client.register_script(TAKE_SCRIPT)
+        return self._client
+
+    async def add(self, chat_id, habit_id, completion_date, completed_at):
+        import redis.asyncio as redis
+
+        if self._async_client is None:
+            self._async_client = redis.from_url(self.url, decode_responses=True)
+        await self._async_client.hsetnx(
+            PENDING_KEY, completion_field(chat_id, habit_id, completion_date), completed_at.isoformat()
+        )
+
+    def take(self):
+        """Забрать пачку нажатий: возвращает (ключи пачки для done, нажатия)"""
+        client = self.client
+        batch = self._take(keys=[PENDING_KEY, BATCHES_KEY, f'{FLUSHING_PREFIX}{uuid.uuid4().hex}'], args=[self.lease])
+        items = []
+        for key in batch:
+            items += [parse_field(field, completed_at) for field, completed_at in client.hgetall(key).items()]
+        return batch, items
+
+    def done(self, batch):
+        """Удалить записанную пачку — только свои ключи, чужие сбросы не трогаем"""
+        if not batch:
+            return
+        with self.client.pipeline() as pipe:
+            pipe.delete(*batch)
+            pipe.zrem(BATCHES_KEY, *batch)
+            pipe.execute()
+
+
+_buffer = None
+
+
+def get_completion_buffer():
+    """Буфер нажатий «Выполнено» для текущего процесса"""
+    global _buffer
+    if _buffer is None:
+        if getattr(settings, 'COMPLETION_BUFFER_BACKEND', 'redis') == 'local':
+            _buffer = LocalCompletionBuffer()
+        else:
+            _buffer = RedisCompletionBuffer(settings.COMPLETION_BUFFER_REDIS_URL)
+    return _buffer
+
+
+async def buffer_completion(chat_id, habit_id, completion_date, buffer=None):
+    """Запомнить нажатие «Выполнено» — без запросов к БД, в базу его запишет сброс буфера"""
+    await (buffer or get_completion_buffer()).add(chat_id, habit_id, completion_date, clock.now())
+
+
+def write_completions(items):
+    """
+    Записать нажатия одной пачкой: проверка владельца — один запрос, выполнения — одна вставка
+    и одно обновление, сроки привычек — один запрос на чтение и один на обновление.
+    У уже отмеченного выполнения остается самое раннее время нажатия. Возвращает число записанных выполнений.
+    """
+    owners = dict(
+        Habit.objects.filter(pk__in={habit_id for _, habit_id, _, _ in items})
+        .values_list('pk', 'user__profile__telegram_chat_id')
+    )
+    completions = {}
+    for chat_id, habit_id, completion_date, completed_at in items:
+        if owners.get(habit_id) != chat_id:
+            logger.warning(f"⚠️ Нажатие «Выполнено» чужой или удаленной привычки {habit_id} из чата {chat_id}")
+            continue
+        key = (habit_id, completion_date)
+        completions[key] = min(completions.get(key, completed_at), completed_at)
+    if not completions:
+        return 0
+
+    with transaction.atomic():
+        HabitCompletion.objects.bulk_create(
+            [
+                HabitCompletion(habit_id=habit_id, completion_date=completion_date, is_completed=True,
+                                completed_at=completed_at)
+                for (habit_id, completion_date), completed_at in completions.items()
+            ],
+            batch_size=UPDATE_CHUNK,
+            ignore_conflicts=True,
+        )
+        keep_earliest(completions)
+        # Массовая запись идет мимо save() и сигналов — сроки и повестки обновляем сами
+        user_ids = refresh_next_due({habit_id for habit_id, _ in completions})
+        transaction.on_commit(lambda: invalidate_agendas(user_ids))
+    return len(completions)
+
+
+def keep_earliest(completions):
+    """
+    Отметить выполнения, которые уже были в базе (отметка с сайта, пачка другого сброса):
+    время меняем, только если наше нажатие раньше. Порциями, чтобы не упереться в лимит параметров запроса.
+    """
+    items = list(completions.items())
+    for start in range(0, len(items), UPDATE_CHUNK):
+        chunk = items[start:start + UPDATE_CHUNK]
+        HabitCompletion.objects.filter(
+            Q(*[Q(habit_id=habit_id, completion_date=day) for (habit_id, day), _ in chunk], _connector=Q.OR)
+        ).update(
+            is_completed=True,
+            completed_at=Case(
+                *[
+                    When(Q(completed_at__isnull=True) | Q(completed_at__gt=completed_at),
+                         habit_id=habit_id, completion_date=day, then=Value(completed_at))
+                    for (habit_id, day), completed_at in chunk
+                ],
+                default=F('completed_at'),
+            ),
+        )
+
+
+def invalidate_agendas(user_ids):
+    for user_id in user_ids:
+        invalidate_agenda(user_id)
+
+
+def flush_completions(buffer=None):
+    """Сбросить накопленные нажатия в HabitCompletion. Возвращает число записанных выполнений."""
+    buffer = buffer or get_completion_buffer()
+    batch, items = buffer.take()
+    if not items:
+        buffer.done(batch)
+        return 0
+    written = write_completions(items)
+    buffer.done(batch)
+    logger.info(f"✅ Записано выполнений из Telegram: {written} (нажатий {len(items)})")
+    return written
+
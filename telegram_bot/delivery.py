@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden
+from telegram.ext import ExtBot
+from telegram.request import HTTPXRequest
+
+from .ratelimit import build_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutgoingMessage:
+    """Сообщение, которое нужно отправить (по умолчанию — в Telegram)"""
+
+    chat_id: Optional[int]
+    text: str
+    parse_mode: Optional[str] = 'Markdown'
+    # Кнопки под сообщением: список рядов, в ряду — пары (текст, callback_data)
+    buttons: Optional[list] = None
+    # Канал доставки и адрес для каналов без chat_id (email, URL вебхука)
+    channel: str = 'telegram'
+    address: str = ''
+
+
+@dataclass
+class DeliveryResult:
+    """Результат отправки одного сообщения"""
+
+    message: OutgoingMessage
+    ok: bool
+    message_id: Optional[int] = None
+    error: str = ''
+    # Повтор не поможет (бот заблокирован, чат удален, ошибка в запросе)
+    permanent: bool = False
+    # Чат больше недоступен — уведомления нужно отключить
+    chat_gone: bool = False
+    # Сообщение не отправляли из-за сбоя канала (открыт предохранитель): попытка не считается,
+    # повтор — через retry_after секунд, когда предохранитель закроется
+    deferred: bool = False
+    retry_after: float = 0
+
+
+# Ответы Telegram, после которых писать в чат бессмысленно
+CHAT_GONE_ERRORS = ('chat not found', 'user is deactivated', 'bot was blocked', 'bot was kicked')
+
+
+def api_base_url():
+    """Адрес Bot API: по умолчанию api.telegram.org, для нагрузочных тестов — локальная замена"""
+    return getattr(settings, 'TELEGRAM_API_BASE_URL', '') or 'https://api.telegram.org/bot'
+
+
+def build_reply_markup(buttons):
+    """Inline-клавиатура из рядов пар (текст, callback_data)"""
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text, callback_data=data) for text, data in row]
+        for row in buttons
+    ])
+
+
+def classify_error(message, error):
+    """Превращаем исключение в результат отправки"""
+    text = str(error)
+    if isinstance(error, Forbidden):
+        return DeliveryResult(message=message, ok=False, error=text, permanent=True, chat_gone=True)
+    if isinstance(error, BadRequest):
+        chat_gone = any(reason in text.lower() for reason in CHAT_GONE_ERRORS)
+        return DeliveryResult(message=message, ok=False, error=text, permanent=True, chat_gone=chat_gone)
+    return DeliveryResult(message=message, ok=False, error=text)
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после серии подряд идущих временных ошибок перестаем
+    обращаться к Telegram на cooldown секунд, чтобы не тратить время воркера.
+    После паузы пропускаем один пробный запрос: успех закрывает предохранитель, ошибка — снова открывает.
+    """
+
+    def __init__(self, threshold=20, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def remaining(self):
+        """Сколько секунд осталось до пробного запроса (0 — можно отправлять)"""
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    @property
+    def is_open(self):
+        if self.opened_at is None:
+            return False
+        if self.probing or self.remaining() > 0:
+            return True
+        # Полуоткрытое состояние: пропускаем один запрос, остальные ждут его результата
+        self.probing = True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        """Учесть ошибку, возвращает True, если из-за нее предохранитель открылся"""
+        self.failures += 1
+        if self.probing or (self.failures >= self.threshold and self.opened_at is None):
+            self.probing = False
+            self.opened_at = time.monotonic()
+            logger.error(f"🔌 Telegram недоступен: отправка приостановлена на {self.cooldown} с")
+            return True
+        return False
+
+
+class TelegramSender:
+    """
+    Пакетная отправка сообщений в Telegram.
+    На процесс воркера держим один event loop и один Bot с пулом HTTP-соединений,
+    поэтому TLS-соединения переиспользуются между пакетами.
+    """
+
+    def __init__(self, token=None, concurrency=None):
+        self.token = token or settings.TELEGRAM_BOT_TOKEN
+        self.concurrency = concurrency or getattr(settings, 'TELEGRAM_SEND_CONCURRENCY', 20)
+        self._bot = None
+        self._loop = None
+        self._pid = None
+        self.breaker = CircuitBreaker(
+            threshold=getattr(settings, 'TELEGRAM_CIRCUIT_BREAKER_THRESHOLD', 20),
+            cooldown=getattr(settings, 'TELEGRAM_CIRCUIT_BREAKER_COOLDOWN', 60),
+        )
+
+    def paused_channels(self):
+        """Каналы, строки которых сейчас не нужно забирать из очереди"""
+        return {'telegram'} if self.breaker.remaining() > 0 else set()
+
+    def deferred(self, message, error):
+        """Результат для сообщения, отложенного до закрытия предохранителя"""
+        return DeliveryResult(
+            message=message, ok=False, error=error, deferred=True, retry_after=self.breaker.remaining(),
+        )
+
+    @property
+    def bot(self):
+        """Bot создается лениво, чтобы пул соединений привязался к нужному event loop"""
+        if self._bot is None:
+            self._bot = ExtBot(
+                token=self.token,
+                base_url=api_base_url(),
+                request=HTTPXRequest(connection_pool_size=self.concurrency),
+                rate_limiter=build_rate_limiter(),
+            )
+        return self._bot
+
+    def _ensure_loop(self):
+        """После fork воркера создаем свой event loop и своего бота"""
+        if self._pid != os.getpid() or self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+            self._bot = None
+            self._pid = os.getpid()
+        return self._loop
+
+    def send_batch(self, messages):
+        """Синхронная отправка пакета сообщений (для Celery задач)"""
+        messages = list(messages)
+        if not messages:
+            return []
+        loop = self._ensure_loop()
+        return loop.run_until_complete(self.asend_batch(messages))
+
+    async def asend_batch(self, messages):
+        """Отправка пакета с ограничением числа одновременных запросов"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_one(message):
+            async with semaphore:
+                return await self._send(message)
+
+        return await asyncio.gather(*(send_one(message) for message in messages))
+
+    async def _send(self, message):
+        """Отправка одного сообщения, ошибки превращаются в результат"""
+        if self.breaker.is_open:
+            return self.deferred(message, 'Отправка приостановлена предохранителем')
+
+        try:
+            sent = await self.bot.send_message(
+                chat_id=message.chat_id,
+                text=message.text,
+                parse_mode=message.parse_mode,
+                reply_markup=build_reply_markup(message.buttons),
+            )
+        except Exception as e:
+            logger.error(f"❌ Ошибка отправки в чат {message.chat_id}: {e}")
+            result = classify_error(message, e)
+            if result.permanent:
+                # Telegram ответил — значит он доступен
+                self.breaker.record_success()
+            elif self.breaker.record_failure():
+                # Ошибка открыла предохранитель — это сбой Telegram, а не сообщения
+                return self.deferred(message, result.error)
+            return result
+
+        self.breaker.record_success()
+        return DeliveryResult(message=message, ok=True, message_id=sent.message_id)
+
+
+_sender = None
+
+
+def get_sender():
+    """Общий отправщик для текущего процесса"""
+    global _sender
+    if _sender is None:
+        _sender = TelegramSender()
+    return _sender
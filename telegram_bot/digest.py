@@ -0,0 +1,129 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from habits import clock
+from habits.models import Habit, HabitCompletion
+from habits.schedule import local_day_bounds
+from users.models import UserProfile, reachable_profiles
+from .channels import profile_recipient
+from .delivery import OutgoingMessage
+from .models import NotificationOutbox
+from .outbox import enqueue_messages
+from .reminders import claim_minutes, markdown_text, minute_of_day
+
+logger = logging.getLogger(__name__)
+
+DIGEST_WATERMARK = 'daily_digest'
+
+# Сколько профилей обрабатываем за раз: на порцию — фиксированное число запросов
+DIGEST_CHUNK_SIZE = 1000
+
+
+def get_digest_profiles(minutes):
+    """Профили, которым сводка положена в указанные минуты (UTC) — по заранее посчитанной минуте сводки"""
+    return UserProfile.objects.filter(
+        reachable_profiles(),
+        digest_minute__in={minute_of_day(minute) for minute in minutes},
+        notifications_enabled=True,
+    ).order_by().values_list(
+        'user_id', 'timezone', 'notification_channel', 'telegram_chat_id', 'user__email', 'webhook_url'
+    )
+
+
+def load_digest_data(user_ids, now, tz=None):
+    """
+    Привычки на сегодня и выполнения за вчера для порции пользователей одного часового пояса —
+    два запроса. Местное время привычек уже посчитано при сохранении.
+    """
+    today_start, today_end = local_day_bounds(now, tz)
+    yesterday = today_start.date() - timedelta(days=1)
+
+    habits = defaultdict(list)
+    for user_id, action, place, local_time in Habit.objects.filter(
+        user_id__in=user_ids,
+        is_pleasant=False,
+        next_due_at__gte=today_start,
+        next_due_at__lt=today_end
+    ).order_by('next_due_at').values_list('user_id', 'action', 'place', 'local_time'):
+        habits[user_id].append((action, place, local_time))
+
+    completions = defaultdict(list)
+    for user_id, action, is_completed in HabitCompletion.objects.filter(
+        habit__user_id__in=user_ids,
+        completion_date=yesterday
+    ).order_by().values_list('habit__user_id', 'habit__action', 'is_completed'):
+        completions[user_id].append((action, is_completed))
+
+    return habits, completions
+
+
+def render_digest(habits, completions):
+    """Текст ежедневной сводки"""
+    message = "☀️ *Доброе утро! Сводка на сегодня*\n\n"
+
+    if habits:
+        message += "📋 *Привычки на сегодня:*\n"
+        for i, (action, place, local_time) in enumerate(habits, 1):
+            message += f"{i}. {markdown_text(action)} в {local_time:%H:%M} ({markdown_text(place)})\n"
+    else:
+        message += "📝 На сегодня привычек нет — можно отдохнуть!\n"
+
+    if completions:
+        done = sum(1 for _, is_completed in completions if is_completed)
+        message += f"\n📊 *Вчера выполнено:* {done} из {len(completions)}\n"
+        for action, is_completed in completions:
+            message += f"{'✅' if is_completed else '❌'} {markdown_text(action)}\n"
+
+    return message
+
+
+def _enqueue_chunk(profiles, now):
+    """Сводки для порции профилей — в очередь уведомлений, возвращает число сообщений"""
+    # «Сегодня» и «вчера» у каждого пояса свои — данные грузим по поясам (обычно он один)
+    by_timezone = defaultdict(list)
+    for user_id, tz, *_ in profiles:
+        by_timezone[tz].append(user_id)
+
+    messages = []
+    for tz, user_ids in by_timezone.items():
+        habits, completions = load_digest_data(user_ids, now, tz)
+        messages += [
+            OutgoingMessage(
+                text=render_digest(habits[user_id], completions[user_id]), **profile_recipient(*recipient)
+            )
+            for user_id, profile_tz, *recipient in profiles
+            if profile_tz == tz
+        ]
+
+    queued = enqueue_messages(messages, kind=NotificationOutbox.KIND_DIGEST)
+    logger.info(f"📨 Пакет сводок: в очереди {queued}")
+    return queued
+
+
+def dispatch_daily_digests(now=None):
+    """
+    Поставить в очередь сводки всем, у кого время сводки попало в необработанные минуты.
+    Возвращает (профилей, сообщений в очереди).
+    """
+    now = now or clock.now()
+
+    minutes = claim_minutes(now, name=DIGEST_WATERMARK)
+    if not minutes:
+        return 0, 0
+
+    found_count = 0
+    queued_count = 0
+    chunk = []
+
+    for profile in get_digest_profiles(minutes).iterator(chunk_size=DIGEST_CHUNK_SIZE):
+        found_count += 1
+        chunk.append(profile)
+        if len(chunk) >= DIGEST_CHUNK_SIZE:
+            queued_count += _enqueue_chunk(chunk, now)
+            chunk = []
+
+    if chunk:
+        queued_count += _enqueue_chunk(chunk, now)
+
+    return found_count, queued_count
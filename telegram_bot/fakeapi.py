@@ -0,0 +1,143 @@
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+@dataclass
+class FakeApiConfig:
+    """Поведение поддельного Bot API: задержка ответа и доля ошибок"""
+
+    latency: float = 0.05  # секунд на запрос
+    jitter: float = 0.0  # случайная добавка к задержке, секунд
+    rate_429: float = 0.0  # доля ответов Too Many Requests
+    retry_after: int = 1
+    rate_403: float = 0.0  # доля ответов Forbidden (бот заблокирован)
+    seed: int = None
+
+
+@dataclass
+class FakeApiStats:
+    """Счетчики поддельного Bot API"""
+
+    requests: int = 0
+    sent: int = 0
+    too_many_requests: int = 0
+    forbidden: int = 0
+    # Пары (chat_id, time.time()) успешных sendMessage — по ним считаем опоздание каждого напоминания
+    sent_at: list = field(default_factory=list)
+
+
+class FakeTelegramApi:
+    """
+    Локальная замена api.telegram.org для нагрузочных тестов:
+    отвечает на sendMessage и служебные методы, умеет тормозить и отдавать 429/403.
+    Боту достаточно указать TELEGRAM_API_BASE_URL = http://host:port/bot
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        self.config = config or FakeApiConfig()
+        self.stats = FakeApiStats()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._message_id = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/bot'
+
+    def start(self):
+        """Запуск в фоновом потоке"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive, как у настоящего API: иначе меряем установку соединений, а не рассылку
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode()
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    params = json.loads(body or '{}')
+                else:
+                    params = dict(parse_qsl(body))
+                method = self.path.rsplit('/', 1)[-1]
+                status, payload = api.handle(method, params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, method, params):
+        """Ответ на вызов метода Bot API: (HTTP статус, JSON)"""
+        config = self.config
+        with self._lock:
+            self.stats.requests += 1
+            roll = self._random.random()
+            delay = config.latency + self._random.random() * config.jitter
+
+        if delay:
+            time.sleep(delay)
+
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'
+            }}
+
+        if method != 'sendMessage':
+            # getUpdates, answerCallbackQuery, editMessageReplyMarkup, setWebhook и т.п.
+            return 200, {'ok': True, 'result': [] if method == 'getUpdates' else True}
+
+        chat_id = int(params.get('chat_id', 0))
+        with self._lock:
+            if roll < config.rate_429:
+                self.stats.too_many_requests += 1
+                return 429, {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f'Too Many Requests: retry after {config.retry_after}',
+                    'parameters': {'retry_after': config.retry_after},
+                }
+            if roll < config.rate_429 + config.rate_403:
+                self.stats.forbidden += 1
+                return 403, {'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'}
+
+            self._message_id += 1
+            self.stats.sent += 1
+            self.stats.sent_at.append((chat_id, time.time()))
+            message_id = self._message_id
+
+        return 200, {'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': params.get('text', ''),
+        }}
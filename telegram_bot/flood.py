@@ -0,0 +1,109 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from telegram import Update
+
+from .ratelimit import LocalBucketBackend, RedisBucketBackend
+from .updates import update_chat_id
+
+logger = logging.getLogger(__name__)
+
+FLOOD_GLOBAL_BUCKET = 'tg:flood:global'
+FLOOD_CHAT_BUCKET = 'tg:flood:chat:{}'
+# Ключ блокировки корзин нужен бэкенду; защита от флуда его не выставляет
+FLOOD_BLOCK_KEY = 'tg:flood:blocked'
+FLOOD_STATS_KEY = 'tg:flood:stats'
+
+
+def update_kind(update):
+    """Вид обновления для счетчиков: команда, текст, нажатие кнопки"""
+    if isinstance(update, Update):
+        if update.callback_query:
+            return 'callback'
+        message = update.effective_message
+        if message and message.text:
+            if message.text.startswith('/'):
+                return message.text.split()[0].split('@')[0]
+            return 'text'
+    return 'other'
+
+
+class FloodGuard:
+    """
+    Защита от флуда перед обработчиками бота: корзина токенов на каждый чат и общая на бота.
+    Токен берется, когда обновление пришло, — до очереди чата, разбора токена и запросов к БД.
+    Лишнее обновление ждет не дольше max_delay, и только если у чата нет других обновлений в работе;
+    иначе, как и сверх max_queued в очереди чата, отбрасывается. Отложенные и отброшенные
+    считаются по видам обновлений.
+    """
+
+    def __init__(self, backend, chat_rate=1, chat_burst=5, global_rate=100, global_burst=200, max_delay=1.0,
+                 max_queued=3):
+        self.backend = backend
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.max_delay = max_delay
+        self.max_queued = max_queued
+        # Пропущенные считаем только в процессе: иначе общий счетчик стоил бы запроса на каждое обновление
+        self.passed = 0
+
+    def _buckets(self, chat_id):
+        buckets = [(FLOOD_GLOBAL_BUCKET, self.global_rate, self.global_burst)]
+        if chat_id is not None:
+            buckets.append((FLOOD_CHAT_BUCKET.format(chat_id), self.chat_rate, self.chat_burst))
+        return buckets
+
+    async def admit(self, update, queued=0):
+        """
+        True — обновление можно обрабатывать (возможно, после короткой паузы), False — отбросить.
+        queued — сколько обновлений этого чата уже обрабатывается или ждет очереди.
+        """
+        chat_id = update_chat_id(update)
+        kind = update_kind(update)
+        if queued >= self.max_queued:
+            return await self.drop(chat_id, kind)
+
+        buckets = self._buckets(chat_id)
+        wait = await self.backend.take(FLOOD_BLOCK_KEY, buckets)
+        if wait <= 0:
+            self.passed += 1
+            return True
+
+        # Ждать токена можно, только пока чат простаивает: иначе поток одного чата копился бы в очереди
+        if not queued and wait <= self.max_delay:
+            await asyncio.sleep(wait)
+            if await self.backend.take(FLOOD_BLOCK_KEY, buckets) <= 0:
+                self.passed += 1
+                await self.backend.count(FLOOD_STATS_KEY, ['delayed', f'delayed:{kind}'])
+                return True
+
+        return await self.drop(chat_id, kind)
+
+    async def drop(self, chat_id, kind):
+        await self.backend.count(FLOOD_STATS_KEY, ['dropped', f'dropped:{kind}'])
+        logger.debug(f"🚫 Флуд: отброшено обновление {kind} из чата {chat_id}")
+        return False
+
+    async def stats(self):
+        """Счетчики отложенных и отброшенных обновлений (общие для реплик, если бэкенд — Redis)"""
+        return {'passed': self.passed, **await self.backend.counts(FLOOD_STATS_KEY)}
+
+
+def build_flood_guard():
+    """Защита от флуда по настройкам проекта"""
+    if getattr(settings, 'TELEGRAM_FLOOD_BACKEND', 'local') == 'redis':
+        backend = RedisBucketBackend(settings.TELEGRAM_FLOOD_REDIS_URL)
+    else:
+        backend = LocalBucketBackend()
+    return FloodGuard(
+        backend,
+        chat_rate=getattr(settings, 'TELEGRAM_FLOOD_CHAT_RATE', 1),
+        chat_burst=getattr(settings, 'TELEGRAM_FLOOD_CHAT_BURST', 5),
+        global_rate=getattr(settings, 'TELEGRAM_FLOOD_GLOBAL_RATE', 100),
+        global_burst=getattr(settings, 'TELEGRAM_FLOOD_GLOBAL_BURST', 200),
+        max_delay=getattr(settings, 'TELEGRAM_FLOOD_MAX_DELAY', 1.0),
+        max_queued=getattr(settings, 'TELEGRAM_FLOOD_MAX_QUEUED', 3),
+    )
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from datetime import time as dt_time
+from types import SimpleNamespace
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from habits import clock
+from habits.models import Habit
+from habits.schedule import utc_offset_minutes
+from telegram_bot.bot import HabitBot
+from users.models import UserProfile
+from .benchmark_reminders import percentile
+
+User = get_user_model()
+
+# Чаты тестовых пользователей — заведомо вне диапазона настоящих
+BENCHMARK_CHAT_BASE = 9_100_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест команды /habits: N чатов одновременно, ответы не отправляются. '
+        'Все данные создаются в транзакции и откатываются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chats', type=int, default=1000, help='Сколько чатов шлют /habits одновременно')
+        parser.add_argument('--habits-per-chat', type=int, default=3)
+        parser.add_argument('--rounds', type=int, default=3, help='Сколько раз повторить волну запросов')
+
+    def seed(self, chats, per_chat):
+        """Пользователи, профили и привычки на сегодня — массовыми вставками"""
+        run = int(time.time())
+        now = clock.now()
+        offset = utc_offset_minutes(now=now)
+        users = User.objects.bulk_create([
+            User(username=f'cmdbench_{run}_{index}', password='!') for index in range(chats)
+        ])
+        profiles = [
+            UserProfile(user=user, telegram_chat_id=BENCHMARK_CHAT_BASE + index, notifications_enabled=True)
+            for index, user in enumerate(users)
+        ]
+        for user, profile in zip(users, profiles):
+            profile.apply_utc_offset(offset)
+            user.profile = profile
+        UserProfile.objects.bulk_create(profiles)
+
+        habits = []
+        for index, user in enumerate(users):
+            for number in range(per_chat):
+                habit = Habit(
+                    user=user,
+                    place='Бенчмарк',
+                    local_time=dt_time((7 + number) % 24, (index * 5) % 60),
+                    action=f'Привычка {number}',
+                )
+                habit.sync_fire_time(now)
+                habit.reminder_minute = habit.calculate_reminder_minute()
+                habit.next_due_at = habit.calculate_next_due_at(now)
+                habits.append(habit)
+        Habit.objects.bulk_create(habits, batch_size=1000)
+
+    async def wave(self, bot, chats):
+        """Одна волна: все чаты шлют /habits одновременно; время ответа каждого"""
+        async def one(chat_id):
+            replies = []
+
+            async def reply_text(text, **kwargs):
+                replies.append(text)
+
+            update = SimpleNamespace(
+                effective_chat=SimpleNamespace(id=chat_id),
+                message=SimpleNamespace(reply_text=reply_text),
+            )
+            started = time.perf_counter()
+            await bot.habits_command(update, None)
+            return time.perf_counter() - started, replies
+
+        return await asyncio.gather(*(one(BENCHMARK_CHAT_BASE + index) for index in range(chats)))
+
+    def handle(self, *args, **options):
+        chats = options['chats']
+        self.stdout.write(f"🌱 Создаем {chats} чатов по {options['habits_per_chat']} привычки...")
+        bot = HabitBot(token='benchmark')
+
+        rounds = []
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with transaction.atomic():
+            self.seed(chats, options['habits_per_chat'])
+            # Запросы асинхронного ORM выполняются в этом же потоке — считаем их на его соединении
+            with connection.execute_wrapper(count_queries):
+                for _ in range(options['rounds']):
+                    started = time.perf_counter()
+                    results = async_to_sync(self.wave)(bot, chats)
+                    rounds.append((time.perf_counter() - started, results))
+            transaction.set_rollback(True)
+
+        for number, (elapsed, results) in enumerate(rounds, 1):
+            latencies = sorted(latency for latency, _ in results)
+            empty = sum(1 for _, replies in results if not replies or 'нет запланированных' in replies[0])
+            rate = chats / elapsed if elapsed else 0
+            self.stdout.write(
+                f"📈 Волна {number}: {chats} команд за {elapsed:.2f} с — {rate:.0f} команд/с, "
+                f"p50 {percentile(latencies, 0.5) * 1000:.0f} мс, p99 {percentile(latencies, 0.99) * 1000:.0f} мс"
+                + (f", без привычек: {empty}" if empty else '')
+            )
+        self.stdout.write(f"🗄️ Запросов к БД на команду: {queries / (chats * len(rounds)):.1f}")
+        self.stdout.write('↩️ Тестовые данные откачены')
@@ -0,0 +1,115 @@
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from telegram_bot.bot import HabitBot
+from telegram_bot.fakeapi import FakeApiConfig, FakeTelegramApi
+from .benchmark_reminders import percentile
+
+# Чаты тестовых обновлений — заведомо вне диапазона настоящих
+BENCHMARK_CHAT_BASE = 9_200_000_000
+
+
+def help_update(update_id, chat_id):
+    """Обновление с командой /help — ответ идет в поддельный Bot API, без запросов к БД"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Бенчмарк'},
+            'text': '/help',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 5}],
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест обработки обновлений ботом: очередь /help от многих чатов через Application '
+        'против поддельного Bot API — по одному и параллельно, с проверкой порядка внутри чата'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chats', type=int, default=200)
+        parser.add_argument('--updates-per-chat', type=int, default=5)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64],
+                            help='Размеры пула обработчиков, которые сравниваем')
+        parser.add_argument('--latency-ms', type=float, default=20, help='Задержка ответа поддельного API')
+
+    async def run(self, bot, updates):
+        """Прогнать обновления через Application; время, задержки ответа и порядок обработки"""
+        application = bot.application
+        queued_at = {}
+        latencies = []
+        processed = []
+
+        async def record(update, context):
+            processed.append((update.effective_chat.id, update.update_id))
+            latencies.append(time.perf_counter() - queued_at[update.update_id])
+
+        # Группа после обработчиков команд: фиксирует момент, когда ответ уже отправлен
+        application.add_handler(TypeHandler(Update, record), group=1)
+        await application.initialize()
+        await application.start()
+        try:
+            started = time.perf_counter()
+            for data in updates:
+                queued_at[data['update_id']] = time.perf_counter()
+                await application.update_queue.put(Update.de_json(data, application.bot))
+            await application.update_queue.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            await application.stop()
+            await application.shutdown()
+        return elapsed, sorted(latencies), processed
+
+    def handle(self, *args, **options):
+        chats, per_chat = options['chats'], options['updates_per_chat']
+        # Обновления чатов вперемешку: 1-е от каждого чата, потом 2-е и т.д.
+        updates = [
+            help_update(number * chats + index + 1, BENCHMARK_CHAT_BASE + index)
+            for number in range(per_chat) for index in range(chats)
+        ]
+        api = FakeTelegramApi(config=FakeApiConfig(latency=options['latency_ms'] / 1000, seed=42)).start()
+        overrides = {
+            'TELEGRAM_API_BASE_URL': api.base_url,
+            'TELEGRAM_RATE_LIMIT_BACKEND': 'local',
+            'TELEGRAM_PERSISTENCE_BACKEND': 'local',
+            'TELEGRAM_PERSISTENCE_PATH': ':memory:',
+            # Меряем обработку обновлений, а не лимиты Telegram
+            'TELEGRAM_GLOBAL_RATE_LIMIT': 1_000_000,
+            'TELEGRAM_CHAT_RATE_LIMIT': 1_000_000,
+            'TELEGRAM_FLOOD_BACKEND': 'local',
+            'TELEGRAM_FLOOD_GLOBAL_RATE': 1_000_000,
+            'TELEGRAM_FLOOD_GLOBAL_BURST': 1_000_000,
+            'TELEGRAM_FLOOD_CHAT_BURST': 1_000_000,
+            'TELEGRAM_FLOOD_MAX_QUEUED': 1_000_000,
+        }
+        self.stdout.write(f"🌱 {len(updates)} обновлений от {chats} чатов, задержка API {options['latency_ms']:.0f} мс")
+
+        try:
+            with override_settings(**overrides):
+                for concurrency in options['concurrency']:
+                    bot = HabitBot(token='benchmark', concurrency=concurrency)
+                    elapsed, latencies, processed = async_to_sync(self.run)(bot, updates)
+
+                    last_seen, out_of_order = {}, 0
+                    for chat_id, update_id in processed:
+                        if update_id < last_seen.get(chat_id, 0):
+                            out_of_order += 1
+                        last_seen[chat_id] = update_id
+
+                    self.stdout.write(
+                        f"📈 Параллельно {concurrency}: {len(processed)} обновлений за {elapsed:.2f} с — "
+                        f"{len(processed) / elapsed if elapsed else 0:.0f} обновлений/с, "
+                        f"p50 {percentile(latencies, 0.5) * 1000:.0f} мс, "
+                        f"p99 {percentile(latencies, 0.99) * 1000:.0f} мс, нарушений порядка в чате: {out_of_order}"
+                    )
+        finally:
+            api.stop()
@@ -0,0 +1,160 @@
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from habits.models import Habit
+from telegram_bot.delivery import TelegramSender
+from telegram_bot.fakeapi import FakeApiConfig, FakeTelegramApi
+from telegram_bot.models import NotificationOutbox, ReminderDispatch, ReminderWatermark
+from telegram_bot.outbox import drain_outbox
+from telegram_bot.reminders import ONE_MINUTE, REMINDER_WATERMARK, dispatch_due_reminders, minute_floor, \
+    minute_of_day, reminder_lead
+from users.models import UserProfile
+
+User = get_user_model()
+
+# Чаты тестовых пользователей — заведомо вне диапазона настоящих
+BENCHMARK_CHAT_BASE = 9_000_000_000
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированному списку"""
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def chat_fire_times():
+    """
+    Срок напоминания для каждого тестового чата по журналу рассылки (time.time()).
+    У чата с несколькими привычками берем самый ранний срок.
+    """
+    fire_times = {}
+    for chat_id, fire_date, minute in ReminderDispatch.objects.filter(
+        habit__user__profile__telegram_chat_id__gte=BENCHMARK_CHAT_BASE,
+    ).values_list('habit__user__profile__telegram_chat_id', 'fire_date', 'minute'):
+        fire_at = datetime.combine(fire_date, dt_time.min, tzinfo=dt_timezone.utc) + timedelta(minutes=minute)
+        fire_at = fire_at.timestamp()
+        fire_times[chat_id] = min(fire_at, fire_times.get(chat_id, fire_at))
+    return fire_times
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест рассылки: N привычек в одну минуту, отправка в поддельный Bot API. '
+        'Все данные создаются в транзакции и откатываются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habits', type=int, default=1000, help='Сколько привычек в одну минуту')
+        parser.add_argument('--per-chat', type=int, default=1, help='Привычек на один чат')
+        parser.add_argument('--api-url', default='', help='Уже запущенный поддельный API (иначе поднимем свой)')
+        parser.add_argument('--latency-ms', type=float, default=50)
+        parser.add_argument('--jitter-ms', type=float, default=0)
+        parser.add_argument('--rate-429', type=float, default=0)
+        parser.add_argument('--rate-403', type=float, default=0)
+        parser.add_argument('--concurrency', type=int, default=None, help='TELEGRAM_SEND_CONCURRENCY')
+        parser.add_argument('--no-rate-limit', action='store_true', help='Без лимитов Telegram (пропускная способность кода)')
+
+    def seed(self, count, per_chat, habit_at):
+        """Пользователи, профили и привычки на одну минуту — массовыми вставками"""
+        run = int(time.time())
+        chats = -(-count // per_chat)
+        users = User.objects.bulk_create([
+            User(username=f'bench_{run}_{index}', password='!') for index in range(chats)
+        ])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, telegram_chat_id=BENCHMARK_CHAT_BASE + index, notifications_enabled=True)
+            for index, user in enumerate(users)
+        ])
+        Habit.objects.bulk_create([
+            Habit(
+                user=users[index // per_chat],
+                place='Бенчмарк',
+                time=dt_time(habit_at.hour, habit_at.minute),
+                action=f'Привычка {index}',
+                reminder_minute=minute_of_day(habit_at - reminder_lead()),
+                next_due_at=habit_at,
+            )
+            for index in range(count)
+        ], batch_size=1000)
+
+    def handle(self, *args, **options):
+        api = None
+        api_url = options['api_url']
+        if not api_url:
+            api = FakeTelegramApi(config=FakeApiConfig(
+                latency=options['latency_ms'] / 1000,
+                jitter=options['jitter_ms'] / 1000,
+                rate_429=options['rate_429'],
+                rate_403=options['rate_403'],
+                seed=42,
+            )).start()
+            api_url = api.base_url
+
+        overrides = {'TELEGRAM_API_BASE_URL': api_url, 'TELEGRAM_RATE_LIMIT_BACKEND': 'local'}
+        if options['concurrency']:
+            overrides['TELEGRAM_SEND_CONCURRENCY'] = options['concurrency']
+        if options['no_rate_limit']:
+            overrides.update(TELEGRAM_GLOBAL_RATE_LIMIT=1_000_000, TELEGRAM_CHAT_RATE_LIMIT=1_000_000)
+
+        fire_minute = minute_floor(timezone.now())
+        self.stdout.write(f"🌱 Создаем {options['habits']} привычек на {fire_minute + reminder_lead():%H:%M} UTC...")
+
+        try:
+            with override_settings(**overrides), transaction.atomic():
+                self.seed(options['habits'], options['per_chat'], fire_minute + reminder_lead())
+                ReminderWatermark.objects.update_or_create(
+                    name=REMINDER_WATERMARK, defaults={'last_minute': fire_minute - ONE_MINUTE}
+                )
+                sender = TelegramSender(token='benchmark')
+
+                started = time.time()
+                found, queued = dispatch_due_reminders(fire_minute)
+                scheduled = time.time()
+                processed, sent = 0, 0
+                while True:
+                    batch_processed, batch_sent = drain_outbox(sender)
+                    if not batch_processed:
+                        break
+                    processed += batch_processed
+                    sent += batch_sent
+                elapsed = time.time() - started
+
+                statuses = dict(
+                    NotificationOutbox.objects.filter(chat_id__gte=BENCHMARK_CHAT_BASE)
+                    .values_list('status').annotate(count=Count('id'))
+                )
+                fire_times = chat_fire_times()
+                transaction.set_rollback(True)
+        finally:
+            if api:
+                api.stop()
+
+        self.stdout.write(f"📋 Привычек найдено: {found}, сообщений в очереди: {queued} "
+                          f"(планирование {scheduled - started:.2f} с)")
+        self.stdout.write(self.style.SUCCESS(
+            f"📈 Доставлено {sent} за {elapsed:.2f} с — {sent / elapsed if elapsed else 0:.1f} сообщений/с"
+        ))
+
+        if api:
+            # Опоздание каждого напоминания — от его срока, а не от начала прогона
+            lateness = sorted(
+                moment - fire_times[chat_id] for chat_id, moment in api.stats.sent_at if chat_id in fire_times
+            )
+            self.stdout.write(f"⏱️ Опоздание от срока напоминания: p50 {percentile(lateness, 0.5):.2f} с, "
+                              f"p99 {percentile(lateness, 0.99):.2f} с, max {lateness[-1] if lateness else 0:.2f} с")
+            self.stdout.write(f"⚠️ Ответов 429: {api.stats.too_many_requests}, 403: {api.stats.forbidden}")
+
+        self.stdout.write(
+            f"📦 Очередь: отправлено {statuses.get(NotificationOutbox.STATUS_SENT, 0)}, "
+            f"не доставлено {statuses.get(NotificationOutbox.STATUS_DEAD, 0)}, "
+            f"ждут повтора {statuses.get(NotificationOutbox.STATUS_PENDING, 0)}"
+        )
+        self.stdout.write('↩️ Тестовые данные откачены')
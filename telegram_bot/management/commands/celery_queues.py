@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from telegram_bot.queues import queue_stats
+
+
+class Command(BaseCommand):
+    help = 'Глубина очередей Celery и возраст самой старой задачи'
+
+    def handle(self, *args, **options):
+        for item in queue_stats():
+            age = item['oldest_age_seconds']
+            line = f"📦 {item['queue']:<10} задач: {item['depth']:<8} самой старой: "
+            line += f"{age} с" if age is not None else "—"
+            self.stdout.write(line)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from telegram_bot.fakeapi import FakeApiConfig, FakeTelegramApi
+
+
+class Command(BaseCommand):
+    help = 'Локальная замена Telegram Bot API для нагрузочных тестов (задержка, 429, 403)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8081)
+        parser.add_argument('--latency-ms', type=float, default=50, help='Задержка ответа, мс')
+        parser.add_argument('--jitter-ms', type=float, default=0, help='Случайная добавка к задержке, мс')
+        parser.add_argument('--rate-429', type=float, default=0, help='Доля ответов 429 (0..1)')
+        parser.add_argument('--retry-after', type=int, default=1, help='retry_after в ответах 429, с')
+        parser.add_argument('--rate-403', type=float, default=0, help='Доля ответов 403 (0..1)')
+
+    def handle(self, *args, **options):
+        api = FakeTelegramApi(
+            host=options['host'],
+            port=options['port'],
+            config=FakeApiConfig(
+                latency=options['latency_ms'] / 1000,
+                jitter=options['jitter_ms'] / 1000,
+                rate_429=options['rate_429'],
+                retry_after=options['retry_after'],
+                rate_403=options['rate_403'],
+            ),
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'🧪 Поддельный Bot API: {api.base_url}'))
+        self.stdout.write(f'Укажите TELEGRAM_API_BASE_URL={api.base_url} для бота и воркеров')
+
+        try:
+            api.serve_forever()
+        except KeyboardInterrupt:
+            stats = api.stats
+            self.stdout.write(self.style.WARNING(
+                f'\n🛑 Остановлен. Запросов: {stats.requests}, отправлено: {stats.sent}, '
+                f'429: {stats.too_many_requests}, 403: {stats.forbidden}'
+            ))
+        finally:
+            api.stop()
@@ -0,0 +1,23 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from telegram_bot.flood import build_flood_guard
+
+
+class Command(BaseCommand):
+    help = 'Сколько обновлений бота отложила и отбросила защита от флуда (по видам обновлений)'
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'TELEGRAM_FLOOD_BACKEND', 'local') != 'redis':
+            self.stdout.write(
+                '⚠️ TELEGRAM_FLOOD_BACKEND=local: счетчики живут в процессе бота, общих нет'
+            )
+            return
+
+        stats = async_to_sync(build_flood_guard().stats)()
+        self.stdout.write(f"🚫 Отброшено: {stats.get('dropped', 0)}, отложено: {stats.get('delayed', 0)}")
+        for field, value in sorted(stats.items()):
+            if ':' in field:
+                action, kind = field.split(':', 1)
+                self.stdout.write(f"   {'отброшено' if action == 'dropped' else 'отложено'} {kind:<12} {value}")
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from telegram_bot.sinks import SmtpSink, WebhookReceiver
+
+
+class Command(BaseCommand):
+    help = 'Локальные SMTP-сервер и получатель вебхуков для проверки каналов уведомлений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--smtp-port', type=int, default=1025)
+        parser.add_argument('--webhook-port', type=int, default=8082)
+
+    def handle(self, *args, **options):
+        smtp = SmtpSink(host=options['host'], port=options['smtp_port']).start()
+        webhook = WebhookReceiver(host=options['host'], port=options['webhook_port']).start()
+
+        host, port = smtp.address
+        self.stdout.write(self.style.SUCCESS(f'📮 SMTP: {host}:{port} (EMAIL_HOST={host} EMAIL_PORT={port})'))
+        self.stdout.write(self.style.SUCCESS(f'🪝 Вебхук: {webhook.url}'))
+
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(
+                f'\n🛑 Остановлены. Писем: {len(smtp.stats.messages)} '
+                f'(соединений {smtp.stats.connections}), вебхуков: {len(webhook.stats.messages)} '
+                f'(соединений {webhook.stats.connections})'
+            ))
+        finally:
+            smtp.stop()
+            webhook.stop()
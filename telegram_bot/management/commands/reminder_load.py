@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from telegram_bot.planner import minute_label, plan_summary, reminder_histogram
+
+
+class Command(BaseCommand):
+    help = 'Ожидаемая нагрузка напоминаний по минутам суток (UTC) и пиковые минуты'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Сколько самых нагруженных минут показать',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Вывести всю гистограмму в JSON',
+        )
+
+    def handle(self, *args, **options):
+        histogram = reminder_histogram()
+        summary = plan_summary(histogram)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'summary': summary, 'histogram': histogram}, ensure_ascii=False))
+            return
+
+        budget = summary['budget_per_minute']
+        self.stdout.write(f"📊 Привычек с напоминаниями: {summary['total_habits']}, "
+                          f"ожидается отправок в сутки: {summary['expected_per_day']}")
+        self.stdout.write(f"🚦 Бюджет Telegram: {budget} сообщений в минуту")
+
+        self.stdout.write('\n⏱️ По часам (UTC), сумма и пик за минуту:')
+        for hour in range(24):
+            minutes = histogram[hour * 60:(hour + 1) * 60]
+            total = sum(item['expected'] for item in minutes)
+            peak = max(item['expected'] for item in minutes)
+            if total:
+                self.stdout.write(f"  {hour:02d}:00  {total:10.1f}  пик {peak:.1f}")
+
+        self.stdout.write("\n🔥 Самые нагруженные минуты (UTC):")
+        top = sorted(histogram, key=lambda item: item['expected'], reverse=True)[:options['top']]
+        for item in top:
+            if not item['expected']:
+                break
+            line = f"  {minute_label(item['minute'])}  привычек {item['habits']}, ожидается {item['expected']}"
+            if item['expected'] > budget:
+                line = self.style.WARNING(line + f" — выше бюджета в {item['expected'] / budget:.1f} раза")
+            self.stdout.write(line)
+
+        if summary['hot_minutes'] and not summary['smoothing_enabled']:
+            self.stdout.write(self.style.WARNING(
+                f"\n⚠️ Минут выше бюджета: {len(summary['hot_minutes'])}. "
+                f"Включите REMINDER_SMOOTHING_ENABLED, чтобы растянуть отправку "
+                f"на {summary['smoothing_window_seconds']} с"
+            ))
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 import subprocess
 import sys
@@ -17,6 +18,38 @@ class Command(BaseCommand):
             action='store_true',
             help='Запустить Celery Worker',
         )
+        parser.add_argument(
+            '--queues',
+            default='',
+            help='Очереди через запятую (reminders,bulk,analytics): на каждую — свой воркер со своим пулом',
+        )
+        parser.add_argument(
+            '--solo',
+            action='store_true',
+            help='Один воркер --pool=solo на все очереди (Windows, локальная отладка)',
+        )
+
+    def worker_commands(self, queues, solo):
+        """Команды запуска воркеров: по процессу на очередь с пулом из CELERY_WORKER_POOLS"""
+        base = [sys.executable, '-m', 'celery', '-A', 'config', 'worker', '--loglevel=info']
+
+        if solo:
+            return [base + ['-Q', ','.join(queues), '--pool=solo']]
+
+        commands = []
+        for queue in queues:
+            options = settings.CELERY_WORKER_POOLS.get(queue, {'pool': 'solo', 'concurrency': 1})
+            command = base + [
+                '-Q', queue,
+                '-n', f'{queue}@%h',
+                f"--pool={options['pool']}",
+                f"--concurrency={options['concurrency']}",
+            ]
+            if options['pool'] == 'prefork':
+                # Задача уходит свободному процессу, а не в очередь к занятому
+                command += ['-O', 'fair']
+            commands.append(command)
+        return commands
 
     def handle(self, *args, **options):
         if not options['worker'] and not options['beat']:
@@ -24,13 +57,13 @@ class Command(BaseCommand):
             options['worker'] = True
             options['beat'] = True
 
+        queues = [queue.strip() for queue in options['queues'].split(',') if queue.strip()]
+        queues = queues or list(settings.CELERY_WORKER_POOLS)
+
         commands = []
 
         if options['worker']:
-            commands.append([
-                sys.executable, '-m', 'celery', '-A', 'config', 'worker',
-                '--loglevel=info', '--pool=solo'
-            ])
+            commands += self.worker_commands(queues, options['solo'])
 
         if options['beat']:
             commands.append([
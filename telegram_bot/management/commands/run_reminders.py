@@ -0,0 +1,27 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from telegram_bot.scheduler import ReminderDaemon
+
+
+class Command(BaseCommand):
+    help = 'Запуск демона напоминаний (расписание в памяти, отправка точно в начале минуты)'
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS('⏰ Запуск демона напоминаний...')
+        )
+
+        asyncio.run(self._run())
+
+        self.stdout.write(self.style.WARNING('🛑 Демон напоминаний остановлен'))
+
+    async def _run(self):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        await ReminderDaemon().run(stop)
@@ -1,3 +1,5 @@
+import asyncio
+
 from django.core.management.base import BaseCommand
 from telegram_bot.bot import HabitBot
 
@@ -5,10 +7,21 @@ from telegram_bot.bot import HabitBot
 class Command(BaseCommand):
     help = 'Запуск Telegram бота для трекера привычек'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--webhook', action='store_true',
+            help='Зарегистрировать вебхук (TELEGRAM_WEBHOOK_URL) вместо polling — обновления принимает ASGI'
+        )
+
     def handle(self, *args, **options):
+        bot = HabitBot()
+
+        if options['webhook']:
+            asyncio.run(bot.set_webhook())
+            self.stdout.write(self.style.SUCCESS('🪝 Вебхук зарегистрирован, обновления принимает ASGI-приложение'))
+            return
+
         self.stdout.write(
             self.style.SUCCESS('🤖 Запуск Telegram бота...')
         )
-
-        bot = HabitBot()
-        bot.run()
\ No newline at end of file
+        bot.run()
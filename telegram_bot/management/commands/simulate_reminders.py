@@ -0,0 +1,73 @@
+import csv
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from telegram_bot.simulator import run_simulation
+
+
+class Command(BaseCommand):
+    help = (
+        'Симуляция суток или недели рассылки на подменных часах: нагрузка по минутам '
+        'и сверка отправленных напоминаний с ожидаемыми. Все данные откатываются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1, help='Сколько суток симулировать')
+        parser.add_argument('--habits', type=int, default=0, help='Создать столько привычек (0 — взять существующие)')
+        parser.add_argument('--speed', type=float, default=1000, help='Во сколько раз быстрее реального времени (0 — без пауз)')
+        parser.add_argument('--start', default='', help='Начало симуляции, YYYY-MM-DD (UTC, по умолчанию — завтра)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--top', type=int, default=10, help='Сколько самых нагруженных минут показать')
+        parser.add_argument('--csv', default='', help='Сохранить нагрузку по минутам в CSV')
+
+    def handle(self, *args, **options):
+        if options['start']:
+            try:
+                start = datetime.strptime(options['start'], '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+            except ValueError:
+                raise CommandError('--start: ожидается дата в формате YYYY-MM-DD')
+        else:
+            start = (timezone.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        self.stdout.write(f"🕰️ Симуляция с {start:%Y-%m-%d %H:%M} UTC на {options['days']} сут., "
+                          f"ускорение {options['speed'] or '∞'}")
+        report = run_simulation(
+            start,
+            days=options['days'],
+            habits=options['habits'],
+            speed=options['speed'],
+            seed=options['seed'],
+            progress=lambda minute: self.stdout.write(f"  … {minute:%Y-%m-%d %H:%M} UTC"),
+        )
+
+        self.stdout.write(f"📋 Привычек: {report.habits}, напоминаний ожидалось: {len(report.expected)}, "
+                          f"отправлено: {len(report.actual)}, сводок: {report.digests}")
+        self.stdout.write(f"📨 Сообщений: {sum(report.messages.values())} за {report.wall_seconds:.1f} с реального времени")
+
+        self.stdout.write("\n🔥 Самые нагруженные минуты (UTC):")
+        for minute, count in report.reminders.most_common(options['top']):
+            if not count:
+                break
+            self.stdout.write(f"  {minute:%Y-%m-%d %H:%M}  привычек {count}, сообщений {report.messages[minute]}")
+
+        if options['csv']:
+            with open(options['csv'], 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['minute', 'reminders', 'messages'])
+                for minute in sorted(set(report.reminders) | set(report.messages)):
+                    writer.writerow([minute.isoformat(), report.reminders[minute], report.messages[minute]])
+            self.stdout.write(f"💾 Нагрузка по минутам: {options['csv']}")
+
+        if report.ok:
+            self.stdout.write(self.style.SUCCESS('✅ Все напоминания ушли ровно в свои минуты'))
+        else:
+            for habit_id, minute in report.missing[:options['top']]:
+                self.stdout.write(self.style.ERROR(f"  ❌ Не отправлено: привычка {habit_id} в {minute:%Y-%m-%d %H:%M} UTC"))
+            for habit_id, minute in report.unexpected[:options['top']]:
+                self.stdout.write(self.style.ERROR(f"  ❓ Лишнее: привычка {habit_id} в {minute:%Y-%m-%d %H:%M} UTC"))
+            raise CommandError(
+                f"Расхождения: не отправлено {len(report.missing)}, лишних {len(report.unexpected)}"
+            )
+        self.stdout.write('↩️ Данные симуляции откачены')
@@ -0,0 +1,82 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("habits", "0002_habit_reminder_minute"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="Рассылка"
+                    ),
+                ),
+                (
+                    "last_minute",
+                    models.DateTimeField(
+                        verbose_name="Последняя обработанная минута (UTC)"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Отметка обработки рассылки",
+                "verbose_name_plural": "Отметки обработки рассылок",
+            },
+        ),
+        migrations.CreateModel(
+            name="ReminderDispatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fire_date", models.DateField(verbose_name="Дата напоминания (UTC)")),
+                (
+                    "minute",
+                    models.PositiveSmallIntegerField(verbose_name="Минута суток (UTC)"),
+                ),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Отправленное напоминание",
+                "verbose_name_plural": "Отправленные напоминания",
+                "unique_together": {("fire_date", "minute", "habit")},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_bot", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeadLetter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "chat_id",
+                    models.BigIntegerField(
+                        db_index=True, verbose_name="ID чата в Telegram"
+                    ),
+                ),
+                ("text", models.TextField(verbose_name="Текст сообщения")),
+                ("error", models.TextField(verbose_name="Ошибка")),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=1, verbose_name="Попыток отправки"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, db_index=True, verbose_name="Дата"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Недоставленное сообщение",
+                "verbose_name_plural": "Недоставленные сообщения",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_bot", "0002_deadletter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationOutbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("chat_id", models.BigIntegerField(verbose_name="ID чата в Telegram")),
+                ("text", models.TextField(verbose_name="Текст сообщения")),
+                (
+                    "parse_mode",
+                    models.CharField(
+                        blank=True,
+                        default="Markdown",
+                        max_length=16,
+                        verbose_name="Разметка",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Ожидает отправки"),
+                            ("sending", "Отправляется"),
+                            ("sent", "Отправлено"),
+                            ("dead", "Не доставлено"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Попыток отправки"
+                    ),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Следующая попытка",
+                    ),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Дата доставки"
+                    ),
+                ),
+                (
+                    "error",
+                    models.TextField(blank=True, verbose_name="Последняя ошибка"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Дата"),
+                ),
+            ],
+            options={
+                "verbose_name": "Исходящее уведомление",
+                "verbose_name_plural": "Исходящие уведомления",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="outbox_status_next_idx",
+                    )
+                ],
+            },
+        ),
+    ]
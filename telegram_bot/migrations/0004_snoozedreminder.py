@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0003_habit_next_due_at"),
+        ("telegram_bot", "0003_notificationoutbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="buttons",
+            field=models.JSONField(blank=True, null=True, verbose_name="Кнопки"),
+        ),
+        migrations.CreateModel(
+            name="SnoozedReminder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("chat_id", models.BigIntegerField(verbose_name="ID чата в Telegram")),
+                ("habit_at", models.DateTimeField(verbose_name="Время привычки")),
+                (
+                    "due_at",
+                    models.DateTimeField(db_index=True, verbose_name="Когда напомнить"),
+                ),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Отложенное напоминание",
+                "verbose_name_plural": "Отложенные напоминания",
+                "ordering": ["due_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_bot", "0004_snoozedreminder"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deadletter",
+            name="address",
+            field=models.CharField(
+                blank=True, max_length=500, verbose_name="Адрес (email или вебхук)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="deadletter",
+            name="channel",
+            field=models.CharField(
+                default="telegram", max_length=16, verbose_name="Канал"
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="address",
+            field=models.CharField(
+                blank=True, max_length=500, verbose_name="Адрес (email или вебхук)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="channel",
+            field=models.CharField(
+                default="telegram", max_length=16, verbose_name="Канал"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="deadletter",
+            name="chat_id",
+            field=models.BigIntegerField(
+                blank=True, db_index=True, null=True, verbose_name="ID чата в Telegram"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notificationoutbox",
+            name="chat_id",
+            field=models.BigIntegerField(
+                blank=True, null=True, verbose_name="ID чата в Telegram"
+            ),
+        ),
+    ]
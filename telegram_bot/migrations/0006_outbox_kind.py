@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("telegram_bot", "0005_outbox_channel"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationoutbox",
+            name="kind",
+            field=models.CharField(
+                choices=[("reminder", "Напоминание"), ("digest", "Сводка")],
+                default="reminder",
+                max_length=16,
+                verbose_name="Вид",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notificationoutbox",
+            index=models.Index(
+                fields=["kind", "status", "next_attempt_at"],
+                name="outbox_kind_status_next_idx",
+            ),
+        ),
+    ]
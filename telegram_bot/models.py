@@ -1,3 +1,249 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class ReminderWatermark(models.Model):
+    """Последняя обработанная минута периодической рассылки"""
+
+    name = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='Рассылка'
+    )
+
+    last_minute = models.DateTimeField(
+        verbose_name='Последняя обработанная минута (UTC)'
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Отметка обработки рассылки'
+        verbose_name_plural = 'Отметки обработки рассылок'
+
+    def __str__(self):
+        return f"{self.name}: {self.last_minute:%d.%m.%Y %H:%M} UTC"
+
+
+class ReminderDispatch(models.Model):
+    """Журнал отправленных напоминаний: не больше одного на (привычку, дату, минуту)"""
+
+    # Без внешнего ключа в БД и без отдельного индекса — журнал должен оставаться компактным,
+    # записи удаленных привычек вычищаются вместе со старыми датами
+    habit = models.ForeignKey(
+        'habits.Habit',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+        verbose_name='Привычка'
+    )
+
+    fire_date = models.DateField(
+        verbose_name='Дата напоминания (UTC)'
+    )
+
+    minute = models.PositiveSmallIntegerField(
+        verbose_name='Минута суток (UTC)'
+    )
+
+    class Meta:
+        verbose_name = 'Отправленное напоминание'
+        verbose_name_plural = 'Отправленные напоминания'
+        # Дата первой — индекс подходит и для поиска дублей, и для очистки старых записей
+        unique_together = ['fire_date', 'minute', 'habit']
+
+    def __str__(self):
+        return f"{self.habit_id} — {self.fire_date} {self.minute // 60:02d}:{self.minute % 60:02d} UTC"
+
+
+class DeadLetter(models.Model):
+    """Сообщения, которые не удалось доставить окончательно"""
+
+    chat_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='ID чата в Telegram'
+    )
+
+    channel = models.CharField(
+        max_length=16,
+        default='telegram',
+        verbose_name='Канал'
+    )
+
+    address = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name='Адрес (email или вебхук)'
+    )
+
+    text = models.TextField(
+        verbose_name='Текст сообщения'
+    )
+
+    error = models.TextField(
+        verbose_name='Ошибка'
+    )
+
+    attempts = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name='Попыток отправки'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')
+
+    class Meta:
+        verbose_name = 'Недоставленное сообщение'
+        verbose_name_plural = 'Недоставленные сообщения'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.chat_id or self.address}: {self.error[:50]}"
+
+
+class NotificationOutbox(models.Model):
+    """Очередь исходящих уведомлений: планировщик пишет, воркеры параллельно разбирают"""
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENDING, 'Отправляется'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_DEAD, 'Не доставлено'),
+    ]
+
+    # Срочные напоминания и несрочные сводки разбирают разные воркеры: утренний поток сводок
+    # не задерживает напоминания
+    KIND_REMINDER = 'reminder'
+    KIND_DIGEST = 'digest'
+
+    KIND_CHOICES = [
+        (KIND_REMINDER, 'Напоминание'),
+        (KIND_DIGEST, 'Сводка'),
+    ]
+
+    kind = models.CharField(
+        max_length=16,
+        choices=KIND_CHOICES,
+        default=KIND_REMINDER,
+        verbose_name='Вид'
+    )
+
+    chat_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='ID чата в Telegram'
+    )
+
+    channel = models.CharField(
+        max_length=16,
+        default='telegram',
+        verbose_name='Канал'
+    )
+
+    address = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name='Адрес (email или вебхук)'
+    )
+
+    text = models.TextField(
+        verbose_name='Текст сообщения'
+    )
+
+    parse_mode = models.CharField(
+        max_length=16,
+        blank=True,
+        default='Markdown',
+        verbose_name='Разметка'
+    )
+
+    buttons = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Кнопки'
+    )
+
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name='Статус'
+    )
+
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток отправки'
+    )
+
+    # Для ожидающих — когда можно отправлять, для отправляемых — до какого момента строка занята воркером
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Следующая попытка'
+    )
+
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата доставки'
+    )
+
+    error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата')
+
+    class Meta:
+        verbose_name = 'Исходящее уведомление'
+        verbose_name_plural = 'Исходящие уведомления'
+        indexes = [
+            # Выборка воркера: вид + статус + срок
+            models.Index(fields=['kind', 'status', 'next_attempt_at'], name='outbox_kind_status_next_idx'),
+            # Очистка старых строк всех видов
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.chat_id or self.address}: {self.get_status_display()}"
+
+
+class SnoozedReminder(models.Model):
+    """Отложенные напоминания: очередь с задержкой, которую разбирает один потребитель по сроку"""
+
+    chat_id = models.BigIntegerField(
+        verbose_name='ID чата в Telegram'
+    )
+
+    habit = models.ForeignKey(
+        'habits.Habit',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+        verbose_name='Привычка'
+    )
+
+    habit_at = models.DateTimeField(
+        verbose_name='Время привычки'
+    )
+
+    due_at = models.DateTimeField(
+        db_index=True,
+        verbose_name='Когда напомнить'
+    )
+
+    class Meta:
+        verbose_name = 'Отложенное напоминание'
+        verbose_name_plural = 'Отложенные напоминания'
+        ordering = ['due_at']
+
+    def __str__(self):
+        return f"{self.habit_id} — {self.due_at:%d.%m.%Y %H:%M} UTC"
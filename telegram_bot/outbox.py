@@ -0,0 +1,223 @@
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from habits import clock
+from .channels import get_dispatcher
+from .delivery import OutgoingMessage
+from .models import DeadLetter, NotificationOutbox
+from .planner import jitter_seconds
+from .retries import disable_gone_chats, retry_delay
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_batch_size():
+    """Сколько строк воркер забирает за раз"""
+    return getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+
+
+def enqueue_messages(messages, not_before=None, spread=0, kind=NotificationOutbox.KIND_REMINDER):
+    """
+    Положить сообщения в очередь одной вставкой, возвращает их число.
+    spread — растянуть отправку на столько секунд с постоянным сдвигом для каждого чата.
+    kind — вид сообщений: напоминания и сводки разбирают разные воркеры.
+    """
+    not_before = not_before or clock.now()
+    rows = NotificationOutbox.objects.bulk_create(
+        [
+            NotificationOutbox(
+                kind=kind,
+                chat_id=message.chat_id,
+                channel=message.channel,
+                address=message.address,
+                text=message.text,
+                parse_mode=message.parse_mode or '',
+                buttons=message.buttons,
+                next_attempt_at=not_before + timedelta(seconds=jitter_seconds(message.chat_id or message.address, spread)),
+            )
+            for message in messages
+        ],
+        batch_size=1000,
+    )
+    return len(rows)
+
+
+def claim_batch(limit=None, now=None, kind=None, exclude_channels=None):
+    """
+    Забрать порцию строк, готовых к отправке (только вида kind, если он задан,
+    и кроме строк каналов exclude_channels).
+    SKIP LOCKED: параллельные воркеры не ждут друг друга и не получают одни и те же строки.
+    Строка занята воркером до next_attempt_at — если воркер упал, ее заберет другой.
+    """
+    now = now or clock.now()
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+
+    queryset = NotificationOutbox.objects.select_for_update(skip_locked=True).filter(
+        status__in=[NotificationOutbox.STATUS_PENDING, NotificationOutbox.STATUS_SENDING],
+        next_attempt_at__lte=now,
+    )
+    if kind:
+        queryset = queryset.filter(kind=kind)
+    if exclude_channels:
+        queryset = queryset.exclude(channel__in=exclude_channels)
+
+    with transaction.atomic():
+        rows = list(queryset.order_by('next_attempt_at')[:limit or outbox_batch_size()])
+        if rows:
+            NotificationOutbox.objects.filter(id__in=[row.id for row in rows]).update(
+                status=NotificationOutbox.STATUS_SENDING,
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + lease,
+            )
+
+    for row in rows:
+        row.status = NotificationOutbox.STATUS_SENDING
+        row.attempts += 1
+    return rows
+
+
+def row_message(row):
+    """Сообщение для отправки из строки очереди"""
+    return OutgoingMessage(
+        chat_id=row.chat_id, text=row.text, parse_mode=row.parse_mode or None, buttons=row.buttons,
+        channel=row.channel, address=row.address,
+    )
+
+
+def paused_channels(sender):
+    """Каналы отправщика, которые сейчас приостановлены предохранителем"""
+    paused = getattr(sender, 'paused_channels', None)
+    return set(paused()) if callable(paused) else set()
+
+
+def record_results(rows, results, now=None):
+    """
+    Записать результаты отправки порции:
+    доставленные — sent, временные ошибки — обратно в очередь с задержкой,
+    окончательные и исчерпавшие попытки — dead (и в недоставленные).
+    Отложенные предохранителем не тратят попытку: ждут его закрытия.
+    Возвращает (отправлено, отложено, не доставлено).
+    """
+    now = now or clock.now()
+    max_attempts = getattr(settings, 'TELEGRAM_RETRY_MAX_ATTEMPTS', 5)
+
+    sent_ids = []
+    failed = []
+    dead = []
+    gone_chats = set()
+
+    for row, result in zip(rows, results):
+        if result.ok:
+            sent_ids.append(row.id)
+            continue
+
+        row.error = result.error
+        if result.deferred:
+            row.attempts -= 1
+            row.status = NotificationOutbox.STATUS_PENDING
+            row.next_attempt_at = now + timedelta(seconds=result.retry_after)
+            failed.append(row)
+            continue
+        if result.chat_gone:
+            gone_chats.add(row.chat_id)
+        if result.permanent or row.attempts >= max_attempts:
+            row.status = NotificationOutbox.STATUS_DEAD
+            dead.append(DeadLetter(
+                chat_id=row.chat_id, channel=row.channel, address=row.address,
+                text=row.text, error=row.error, attempts=row.attempts,
+            ))
+        else:
+            row.status = NotificationOutbox.STATUS_PENDING
+            row.next_attempt_at = now + timedelta(seconds=retry_delay(row.attempts))
+        failed.append(row)
+
+    with transaction.atomic():
+        if sent_ids:
+            NotificationOutbox.objects.filter(id__in=sent_ids).update(
+                status=NotificationOutbox.STATUS_SENT, sent_at=now, error=''
+            )
+        if failed:
+            NotificationOutbox.objects.bulk_update(failed, ['status', 'attempts', 'next_attempt_at', 'error'])
+        if dead:
+            DeadLetter.objects.bulk_create(dead)
+            logger.warning(f"📪 Недоставленных сообщений: {len(dead)}")
+        disable_gone_chats(gone_chats)
+
+    return len(sent_ids), len(failed) - len(dead), len(dead)
+
+
+def drain_outbox(sender=None, batch_size=None, max_batches=None, kind=None):
+    """
+    Разобрать очередь порциями, пока есть готовые строки (но не больше max_batches порций).
+    kind — только строки этого вида (напоминания или сводки), None — все.
+    Порция делится по каналам доставки (Telegram, почта, вебхук);
+    строки каналов с открытым предохранителем не забираем.
+    Возвращает (обработано, отправлено).
+    """
+    sender = sender or get_dispatcher()
+    max_batches = max_batches or getattr(settings, 'OUTBOX_MAX_BATCHES_PER_DRAIN', 50)
+
+    processed = 0
+    sent_total = 0
+    for _ in range(max_batches):
+        rows = claim_batch(batch_size, kind=kind, exclude_channels=paused_channels(sender))
+        if not rows:
+            break
+        results = sender.send_batch([row_message(row) for row in rows])
+        sent, retried, dead = record_results(rows, results)
+        logger.info(f"📨 Очередь уведомлений: отправлено {sent}, отложено {retried}, не доставлено {dead}")
+        processed += len(rows)
+        sent_total += sent
+    return processed, sent_total
+
+
+async def adrain_outbox(sender, batch_size=None, max_batches=None):
+    """
+    То же для асинхронного процесса (демон напоминаний): только напоминания и не больше
+    max_batches порций — остаток разберут воркеры или следующий срок. Возвращает число отправленных.
+    """
+    max_batches = max_batches or getattr(settings, 'OUTBOX_MAX_BATCHES_PER_DRAIN', 50)
+
+    sent_total = 0
+    for _ in range(max_batches):
+        rows = await sync_to_async(claim_batch)(
+            batch_size, kind=NotificationOutbox.KIND_REMINDER, exclude_channels=paused_channels(sender),
+        )
+        if not rows:
+            break
+        results = await sender.asend_batch([row_message(row) for row in rows])
+        sent, _, _ = await sync_to_async(record_results)(rows, results)
+        sent_total += sent
+    return sent_total
+
+
+def schedule_drains(count, queue=None, kind=NotificationOutbox.KIND_REMINDER):
+    """
+    Запустить столько задач разбора очереди, сколько нужно на count сообщений вида kind.
+    queue — очередь Celery, если не та, что задана в CELERY_TASK_ROUTES (например, для сводок).
+    """
+    from .tasks import drain_notification_outbox
+
+    if not count:
+        return 0
+    batches = -(-count // outbox_batch_size())  # округление вверх
+    workers = min(batches, getattr(settings, 'OUTBOX_MAX_PARALLEL_DRAINS', 8))
+    for _ in range(workers):
+        drain_notification_outbox.apply_async(kwargs={'kind': kind}, queue=queue)
+    return workers
+
+
+def prune_outbox(now=None):
+    """Удалить доставленные и недоставленные строки старше OUTBOX_RETENTION_DAYS дней"""
+    now = now or clock.now()
+    retention = getattr(settings, 'OUTBOX_RETENTION_DAYS', 2)
+    deleted, _ = NotificationOutbox.objects.filter(
+        status__in=[NotificationOutbox.STATUS_SENT, NotificationOutbox.STATUS_DEAD],
+        next_attempt_at__lt=now - timedelta(days=retention),
+    ).delete()
+    return deleted
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+
+from django.conf import settings
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = 'tg:state:{}'
+USER_DATA = 'user_data'
+# Версия состояния пользователя (разговор и user_data): меняется при каждой записи,
+# по ней реплика понимает, что состояние нужно перечитать
+VERSIONS = 'versions'
+
+# Внутренности ConversationHandler (python-telegram-bot 20.3): публичного способа обновить
+# состояние одного разговора нет. Их наличие проверяется перед каждым обновлением разговора и в тестах.
+TRACKING_DICT_INTERNALS = ('_write_access_keys', 'update_no_track', 'data')
+
+
+def conversation_section(name):
+    return f'conversations:{name}'
+
+
+def dump_key(key):
+    """Ключ разговора (кортеж id чата и пользователя) — строкой для хранилища"""
+    return json.dumps(list(key))
+
+
+def load_key(field):
+    return tuple(json.loads(field))
+
+
+def check_conversation_internals(handler):
+    """Убедиться, что у ConversationHandler есть внутренности, через которые обновляется разговор"""
+    conversations = getattr(handler, '_conversations', None)
+    missing = [name for name in TRACKING_DICT_INTERNALS if not hasattr(conversations, name)]
+    if conversations is None or missing:
+        raise RuntimeError(
+            f"ConversationHandler без {missing or '_conversations'}: общие разговоры реплик не работают "
+            f"с этой версией python-telegram-bot"
+        )
+
+
+class LocalStateStore:
+    """
+    Состояние бота в файле SQLite — для одного процесса бота и локального запуска.
+    Переживает перезапуск, но не делится между репликами.
+    """
+
+    shared = False
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS bot_state ('
+                'section TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (section, field))'
+            )
+        return self._conn
+
+    def _load(self, section):
+        with self._lock:
+            rows = self.conn.execute('SELECT field, value FROM bot_state WHERE section = ?', (section,))
+            return dict(rows.fetchall())
+
+    def _get(self, items):
+        with self._lock:
+            return [
+                (row[0] if row else None)
+                for row in (
+                    self.conn.execute('SELECT value FROM bot_state WHERE section = ? AND field = ?', item).fetchone()
+                    for item in items
+                )
+            ]
+
+    def _write(self, changes):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'INSERT INTO bot_state (section, field, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (section, field) DO UPDATE SET value = excluded.value',
+                [(section, field, value) for (section, field), value in changes.items() if value is not None],
+            )
+            self.conn.executemany(
+                'DELETE FROM bot_state WHERE section = ? AND field = ?',
+                [item for item, value in changes.items() if value is None],
+            )
+
+    # SQLite синхронный — запросы уходят в поток, чтобы не держать цикл событий бота
+    async def load(self, section):
+        return await asyncio.to_thread(self._load, section)
+
+    async def get(self, items):
+        return await asyncio.to_thread(self._get, items)
+
+    async def write(self, changes):
+        await asyncio.to_thread(self._write, changes)
+
+
+class RedisStateStore:
+    """Состояние бота в хешах Redis — общее для всех реплик бота"""
+
+    shared = True
+
+    def __init__(self, url):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    async def load(self, section):
+        return await self._redis.hgetall(STATE_KEY.format(section))
+
+    async def get(self, items):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for section, field in items:
+                pipe.hget(STATE_KEY.format(section), field)
+            return await pipe.execute()
+
+    async def write(self, changes):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for (section, field), value in changes.items():
+                if value is None:
+                    pipe.hdel(STATE_KEY.format(section), field)
+                else:
+                    pipe.hset(STATE_KEY.format(section), field, value)
+            await pipe.execute()
+
+
+class SharedPersistence(BasePersistence):
+    """
+    Состояния ConversationHandler и context.user_data во внешнем хранилище.
+    Application отдает изменения раз в update_interval секунд — все изменения одного
+    прогона уходят в хранилище одной пачкой (в Redis — один конвейер), а не запросом на обновление.
+    Неизменившиеся user_data не пишутся; общее хранилище перечитывается, только если сменилась версия пользователя.
+    """
+
+    def __init__(self, store, update_interval=1):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self._pending = {}
+        self._batch = None
+        # Что лежит в хранилище по мнению этой реплики: user_data (JSON) и версии пользователей
+        self._stored = {}
+        self._versions = {}
+
+    @property
+    def shared(self):
+        return self.store.shared
+
+    async def _queue(self, item, value, user_id):
+        """Отложить изменение до записи пачкой; вернуться, когда пачка записана"""
+        self._pending[item] = value
+        if self.shared:
+            self._pending[(VERSIONS, str(user_id))] = None
+        if self._batch is None:
+            self._batch = asyncio.ensure_future(self._write_batch())
+        await self._batch
+
+    async def _write_batch(self):
+        # Application вызывает update_* для всех изменений разом (gather) — ждем, пока встанут в очередь все
+        await asyncio.sleep(0)
+        changes, self._pending, self._batch = self._pending, {}, None
+        version = uuid.uuid4().hex
+        changes = {item: version if item[0] == VERSIONS else value for item, value in changes.items()}
+        try:
+            await self.store.write(changes)
+        except Exception:
+            # Не теряем изменения: уйдут со следующей пачкой, если их не перезапишут более новые
+            for item, value in changes.items():
+                self._pending.setdefault(item, value)
+            raise
+        for (section, field), value in changes.items():
+            if section == VERSIONS:
+                self._versions[field] = value
+            elif section == USER_DATA:
+                self._stored[(section, field)] = value
+
+    async def get_user_data(self):
+        data = await self.store.load(USER_DATA)
+        self._stored.update(((USER_DATA, user_id), value) for user_id, value in data.items())
+        return {int(user_id): json.loads(value) for user_id, value in data.items()}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        states = await self.store.load(conversation_section(name))
+        return {load_key(field): json.loads(state) for field, state in states.items()}
+
+    async def update_conversation(self, name, key, new_state):
+        # Ключ разговора — (id чата, id пользователя): версия общая с user_data этого пользователя
+        await self._queue(
+            (conversation_section(name), dump_key(key)), None if new_state is None else json.dumps(new_state), key[-1]
+        )
+
+    async def update_user_data(self, user_id, data):
+        # Application отдает user_data после каждого обновления пользователя — пишем только изменения
+        item = (USER_DATA, str(user_id))
+        value = json.dumps(data) if data else None
+        if self._pending.get(item, self._stored.get(item)) != value:
+            await self._queue(item, value, user_id)
+
+    async def drop_user_data(self, user_id):
+        await self._queue((USER_DATA, str(user_id)), None, user_id)
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        # Перечитывается в refresh вместе с разговором — одной проверкой версии на обновление
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        """Остановка бота: дописать все, что не успело уйти"""
+        if self._batch is not None:
+            await self._batch
+        if self._pending:
+            changes, self._pending = self._pending, {}
+            await self.store.write(changes)
+
+    async def refresh(self, handler, key, user_data):
+        """
+        Перед обновлением чата взять разговор и user_data пользователя из общего хранилища: предыдущее
+        сообщение могла обработать другая реплика. Сначала читается только версия пользователя —
+        состояние перечитываем, если его с тех пор кто-то записал. Свои незаписанные изменения
+        новее хранилища — их не трогаем.
+        """
+        user_id = str(key[-1])
+        version, = await self.store.get([(VERSIONS, user_id)])
+        if version == self._versions.get(user_id):
+            return
+
+        conversation_item = (conversation_section(handler.name), dump_key(key))
+        user_item = (USER_DATA, user_id)
+        state, data = await self.store.get([conversation_item, user_item])
+
+        # Состояния ConversationHandler хранит в TrackingDict (после initialize Application)
+        check_conversation_internals(handler)
+        conversations = handler._conversations
+        if key not in conversations._write_access_keys and conversation_item not in self._pending:
+            if state is None:
+                conversations.data.pop(key, None)
+            else:
+                conversations.update_no_track({key: json.loads(state)})
+
+        unsaved = (json.dumps(user_data) if user_data else None) != self._stored.get(user_item)
+        if not unsaved and user_item not in self._pending:
+            user_data.clear()
+            user_data.update(json.loads(data) if data else {})
+            self._stored[user_item] = data
+        self._versions[user_id] = version
+
+
+def build_persistence():
+    """Хранилище состояний бота по настройкам проекта"""
+    if getattr(settings, 'TELEGRAM_PERSISTENCE_BACKEND', 'redis') == 'local':
+        store = LocalStateStore(settings.TELEGRAM_PERSISTENCE_PATH)
+    else:
+        store = RedisStateStore(settings.TELEGRAM_PERSISTENCE_REDIS_URL)
+    return SharedPersistence(store, update_interval=getattr(settings, 'TELEGRAM_PERSISTENCE_INTERVAL', 1))
@@ -0,0 +1,83 @@
+import zlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count
+
+from habits.models import Habit, MINUTES_PER_DAY
+from users.models import reachable_profiles
+
+
+def minute_label(minute):
+    """Минута суток в виде ЧЧ:ММ (UTC)"""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def send_budget_per_minute():
+    """Сколько сообщений в минуту пропускает общий лимит Telegram"""
+    return int(getattr(settings, 'TELEGRAM_GLOBAL_RATE_LIMIT', 30) * 60)
+
+
+def reminder_histogram():
+    """
+    Ожидаемая нагрузка по минутам суток (UTC) — одним запросом с группировкой.
+    Привычка с периодичностью N дней в среднем дает 1/N отправки в сутки.
+    Возвращает список из MINUTES_PER_DAY словарей: minute, time, habits, expected.
+    """
+    habits = defaultdict(int)
+    expected = defaultdict(float)
+
+    rows = Habit.objects.filter(
+        reachable_profiles(profile='user__profile__'),
+        is_pleasant=False,
+        reminder_minute__isnull=False,
+        user__profile__notifications_enabled=True,
+    ).order_by().values('reminder_minute', 'frequency').annotate(count=Count('id'))
+
+    for row in rows:
+        habits[row['reminder_minute']] += row['count']
+        expected[row['reminder_minute']] += row['count'] / row['frequency']
+
+    return [
+        {
+            'minute': minute,
+            'time': minute_label(minute),
+            'habits': habits[minute],
+            'expected': round(expected[minute], 2),
+        }
+        for minute in range(MINUTES_PER_DAY)
+    ]
+
+
+def plan_summary(histogram=None):
+    """Пик, бюджет отправки и «горячие» минуты, где ожидаемая нагрузка выше бюджета"""
+    histogram = histogram if histogram is not None else reminder_histogram()
+    budget = send_budget_per_minute()
+    peak = max(histogram, key=lambda item: item['expected'])
+
+    return {
+        'budget_per_minute': budget,
+        'total_habits': sum(item['habits'] for item in histogram),
+        'expected_per_day': round(sum(item['expected'] for item in histogram), 2),
+        'peak': peak,
+        'hot_minutes': [item for item in histogram if item['expected'] > budget],
+        'smoothing_enabled': getattr(settings, 'REMINDER_SMOOTHING_ENABLED', False),
+        'smoothing_window_seconds': smoothing_window(),
+    }
+
+
+def smoothing_window():
+    """Окно, на которое растягиваем отправку «горячей» минуты"""
+    return getattr(settings, 'REMINDER_SMOOTHING_WINDOW_SECONDS', 180)
+
+
+def smoothing_threshold():
+    """Сколько сообщений в минуту отправляем без сглаживания"""
+    return getattr(settings, 'REMINDER_SMOOTHING_THRESHOLD', None) or send_budget_per_minute()
+
+
+def jitter_seconds(key, window):
+    """Детерминированный сдвиг в пределах окна: один и тот же ключ — всегда тот же сдвиг"""
+    if window <= 0:
+        return 0
+    return zlib.crc32(str(key).encode()) % window
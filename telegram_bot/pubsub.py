@@ -0,0 +1,90 @@
+import asyncio
+import json
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_CHANNEL = 'habits:schedule'
+
+
+class LocalChannel:
+    """Канал публикаций внутри одного процесса (для тестов и локального запуска)"""
+
+    def __init__(self):
+        self._subscribers = []
+
+    def publish(self, message):
+        for loop, queue in list(self._subscribers):
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    async def subscribe(self, on_subscribed=None):
+        """
+        Асинхронный итератор по сообщениям канала. on_subscribed ждем, когда подписка уже готова:
+        сообщения, пришедшие за это время, не теряются, а ждут в очереди.
+        """
+        queue = asyncio.Queue()
+        subscriber = (asyncio.get_running_loop(), queue)
+        self._subscribers.append(subscriber)
+        try:
+            if on_subscribed is not None:
+                await on_subscribed()
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.remove(subscriber)
+
+
+class RedisChannel:
+    """Канал публикаций через Redis pub/sub"""
+
+    def __init__(self, url, name=SCHEDULE_CHANNEL):
+        self.url = url
+        self.name = name
+        self._client = None
+
+    def publish(self, message):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(self.name, json.dumps(message))
+
+    async def subscribe(self, on_subscribed=None):
+        import redis.asyncio as redis
+
+        client = redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.name)
+        try:
+            if on_subscribed is not None:
+                await on_subscribed()
+            async for item in pubsub.listen():
+                yield json.loads(item['data'])
+        finally:
+            await pubsub.unsubscribe(self.name)
+            await client.close()
+
+
+_channel = None
+
+
+def get_schedule_channel():
+    """Канал изменений расписания привычек"""
+    global _channel
+    if _channel is None:
+        if getattr(settings, 'HABIT_SCHEDULE_CHANNEL_BACKEND', 'redis') == 'local':
+            _channel = LocalChannel()
+        else:
+            _channel = RedisChannel(settings.HABIT_SCHEDULE_CHANNEL_URL)
+    return _channel
+
+
+def publish_schedule_change(habit_id, reminder_minute):
+    """Сообщить демону напоминаний об изменении привычки (None — убрать из расписания)"""
+    try:
+        get_schedule_channel().publish({'habit_id': habit_id, 'reminder_minute': reminder_minute})
+    except Exception as e:
+        # Демон все равно периодически перечитывает расписание целиком
+        logger.warning(f"⚠️ Не удалось опубликовать изменение привычки {habit_id}: {e}")
@@ -0,0 +1,40 @@
+import json
+import time
+
+from django.conf import settings
+
+
+def queue_names():
+    """Очереди Celery, для которых заведены свои воркеры"""
+    return list(getattr(settings, 'CELERY_WORKER_POOLS', {}) or ['celery'])
+
+
+def _broker_client():
+    import redis
+
+    return redis.Redis.from_url(settings.CELERY_BROKER_URL)
+
+
+def queue_stats(client=None, now=None):
+    """
+    Глубина очередей и возраст самой старой задачи (в секундах) в брокере Redis.
+    Kombu кладет задачи слева и забирает справа, поэтому самая старая — последняя в списке;
+    время постановки берем из заголовка published_at (ставится при публикации).
+    """
+    client = client or _broker_client()
+    now = now or time.time()
+
+    stats = []
+    for name in queue_names():
+        depth = client.llen(name)
+        oldest_age = None
+        if depth:
+            raw = client.lindex(name, -1)
+            try:
+                published_at = json.loads(raw)['headers'].get('published_at')
+            except (TypeError, ValueError, KeyError):
+                published_at = None
+            if published_at:
+                oldest_age = round(max(now - published_at, 0), 1)
+        stats.append({'queue': name, 'depth': depth, 'oldest_age_seconds': oldest_age})
+    return stats
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import time
+
+from django.conf import settings
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_BUCKET = 'tg:rate:global'
+CHAT_BUCKET = 'tg:rate:chat:{}'
+BLOCK_KEY = 'tg:rate:blocked'
+
+# Время берем у Redis, чтобы расхождение часов между воркерами не влияло на лимит.
+# Коэффициент замедления после RetryAfter хранится рядом с блокировкой (KEYS[2]) и восстанавливается со временем.
+BACKOFF_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local function recovered(key)
+    local data = redis.call('HMGET', key, 'factor', 'ts', 'recovery')
+    if not data[1] then
+        return 1
+    end
+    return math.min(1, tonumber(data[1]) + math.max(0, now - tonumber(data[2])) * tonumber(data[3]))
+end
+"""
+
+# Берем токены сразу из всех корзин или не берем ни одного, чтобы не терять токены.
+# Темп первой (общей) корзины умножается на коэффициент замедления.
+TAKE_SCRIPT = BACKOFF_LUA + """
+local wait = 0
+
+local blocked = tonumber(redis.call('GET', KEYS[1]))
+if blocked and blocked > now then
+    wait = blocked - now
+end
+local factor = recovered(KEYS[2])
+
+local state = {}
+for i = 3, #KEYS do
+    local rate = tonumber(ARGV[(i - 3) * 2 + 1])
+    local capacity = tonumber(ARGV[(i - 3) * 2 + 2])
+    if i == 3 and factor < 1 then
+        rate = math.max(rate * factor, math.min(rate, 1))
+        capacity = math.max(capacity * factor, 1)
+    end
+    local data = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+    state[i] = {tokens, rate, capacity}
+end
+
+for i = 3, #KEYS do
+    local tokens = state[i][1]
+    if wait == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(state[i][3] / state[i][2] * 1000) + 1000)
+end
+
+return tostring(wait)
+"""
+
+# Блокировка на ARGV[1] секунд. С ARGV[2] (минимальный коэффициент) темп еще и снижается вдвое,
+# но один раз на блокировку: RetryAfter, пойманные воркерами одновременно, не роняют темп до минимума.
+BLOCK_SCRIPT = BACKOFF_LUA + """
+local seconds = tonumber(ARGV[1])
+local until_ts = now + seconds
+local current = tonumber(redis.call('GET', KEYS[1]))
+local factor = recovered(KEYS[2])
+if ARGV[2] and not (current and current > now) then
+    local recovery = tonumber(ARGV[3])
+    factor = math.max(tonumber(ARGV[2]), factor / 2)
+    redis.call('HSET', KEYS[2], 'factor', factor, 'ts', until_ts, 'recovery', recovery)
+    redis.call('PEXPIRE', KEYS[2], math.ceil((seconds + (1 - factor) / recovery) * 1000) + 1000)
+end
+if not current or current < until_ts then
+    redis.call('SET', KEYS[1], tostring(until_ts), 'PX', math.ceil(seconds * 1000) + 1000)
+end
+return tostring(factor)
+"""
+
+FACTOR_SCRIPT = BACKOFF_LUA + """
+return tostring(recovered(KEYS[1]))
+"""
+
+
+def backoff_key(block_key):
+    """Ключ коэффициента замедления для блокировки block_key"""
+    return f'{block_key}:backoff'
+
+
+class LocalBucketBackend:
+    """Корзины токенов в памяти процесса (для тестов и локального запуска)"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._blocked_until = {}
+        self._backoff = {}
+        self._counters = {}
+
+    def _factor(self, block_key, now):
+        factor, ts, recovery = self._backoff.get(block_key, (1.0, now, 0.0))
+        return min(1.0, factor + max(0.0, now - ts) * recovery)
+
+    async def take(self, block_key, buckets):
+        """
+        Забрать по токену из каждой корзины, вернуть сколько ждать (0 — токены взяты).
+        Темп первой (общей) корзины умножается на коэффициент замедления.
+        """
+        now = time.monotonic()
+        wait = max(0.0, self._blocked_until.get(block_key, 0.0) - now)
+        factor = self._factor(block_key, now)
+
+        state = []
+        for index, (key, rate, capacity) in enumerate(buckets):
+            if index == 0 and factor < 1:
+                rate, capacity = max(rate * factor, min(rate, 1)), max(capacity * factor, 1)
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate)
+            state.append((key, tokens))
+
+        for key, tokens in state:
+            self._buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+
+        return wait
+
+    async def block(self, block_key, seconds, min_factor=None, recovery=0.0):
+        """
+        Запретить отправку на seconds секунд. С min_factor еще и снизить темп вдвое (не ниже min_factor):
+        после блокировки он восстанавливается на recovery в секунду. Возвращает коэффициент темпа.
+        """
+        now = time.monotonic()
+        until = now + seconds
+        blocked_until = self._blocked_until.get(block_key, 0.0)
+        factor = self._factor(block_key, now)
+        # Одна блокировка — одно снижение, сколько бы RetryAfter ни пришло за нее
+        if min_factor is not None and blocked_until <= now:
+            factor = max(min_factor, factor / 2)
+            self._backoff[block_key] = (factor, until, recovery)
+        self._blocked_until[block_key] = max(blocked_until, until)
+        return factor
+
+    async def factor(self, block_key):
+        """Текущий коэффициент темпа: 1 — без замедления"""
+        return self._factor(block_key, time.monotonic())
+
+    async def count(self, key, fields):
+        """Увеличить счетчики fields на единицу"""
+        counters = self._counters.setdefault(key, {})
+        for field in fields:
+            counters[field] = counters.get(field, 0) + 1
+
+    async def counts(self, key):
+        return dict(self._counters.get(key, {}))
+
+
+class RedisBucketBackend:
+    """Корзины токенов в Redis — общие для всех воркеров Celery и процесса бота"""
+
+    def __init__(self, url):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(TAKE_SCRIPT)
+        self._block = self._redis.register_script(BLOCK_SCRIPT)
+        self._factor = self._redis.register_script(FACTOR_SCRIPT)
+
+    async def take(self, block_key, buckets):
+        keys = [block_key, backoff_key(block_key)] + [key for key, _, _ in buckets]
+        args = []
+        for _, rate, capacity in buckets:
+            args += [rate, capacity]
+        return float(await self._take(keys=keys, args=args))
+
+    async def block(self, block_key, seconds, min_factor=None, recovery=0.0):
+        args = [seconds] if min_factor is None else [seconds, min_factor, recovery]
+        return float(await self._block(keys=[block_key, backoff_key(block_key)], args=args))
+
+    async def factor(self, block_key):
+        return float(await self._factor(keys=[backoff_key(block_key)]))
+
+    async def count(self, key, fields):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for field in fields:
+                pipe.hincrby(key, field, 1)
+            await pipe.execute()
+
+    async def counts(self, key):
+        return {field.decode(): int(value) for field, value in (await self._redis.hgetall(key)).items()}
+
+
+class TelegramRateLimiter:
+    """
+    Ограничение частоты запросов к Telegram: общая корзина на бота
+    и отдельная корзина на каждый чат. При RetryAfter от Telegram
+    отправка останавливается для всех, а общий темп временно снижается —
+    коэффициент хранится в бэкенде рядом с блокировкой, поэтому общий для всех процессов,
+    и после блокировки восстанавливается со временем.
+    """
+
+    MIN_RATE_FACTOR = 0.1
+    RECOVERY_PER_SECOND = 0.02  # от половины темпа до полного — за 25 с без новых RetryAfter
+
+    def __init__(self, backend, global_rate=30, chat_rate=1):
+        self.backend = backend
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+
+    def _buckets(self, chat_id):
+        buckets = [(GLOBAL_BUCKET, self.global_rate, self.global_rate)]
+        if chat_id is not None:
+            buckets.append((CHAT_BUCKET.format(chat_id), self.chat_rate, 1))
+        return buckets
+
+    async def acquire(self, chat_id=None):
+        """Дождаться разрешения на отправку в чат"""
+        while True:
+            wait = await self.backend.take(BLOCK_KEY, self._buckets(chat_id))
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def rate_factor(self):
+        """Доля полного темпа, с которой сейчас идет отправка"""
+        return await self.backend.factor(BLOCK_KEY)
+
+    async def retry_after(self, seconds, chat_id=None):
+        """Telegram попросил подождать: блокируем отправку и снижаем темп"""
+        factor = await self.backend.block(BLOCK_KEY, seconds, self.MIN_RATE_FACTOR, self.RECOVERY_PER_SECOND)
+        logger.warning(
+            f"⏳ Telegram ограничил отправку на {seconds} с (чат {chat_id}), "
+            f"темп снижен до {factor:.0%}"
+        )
+
+
+class SharedRateLimiter(BaseRateLimiter):
+    """Подключение TelegramRateLimiter к python-telegram-bot (ExtBot и Application)"""
+
+    def __init__(self, limiter, max_retries=3):
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                await self.limiter.retry_after(e.retry_after, chat_id)
+
+
+def build_rate_limiter():
+    """Ограничитель частоты по настройкам проекта"""
+    if getattr(settings, 'TELEGRAM_RATE_LIMIT_BACKEND', 'redis') == 'local':
+        backend = LocalBucketBackend()
+    else:
+        backend = RedisBucketBackend(settings.TELEGRAM_RATE_LIMIT_REDIS_URL)
+
+    limiter = TelegramRateLimiter(
+        backend,
+        global_rate=getattr(settings, 'TELEGRAM_GLOBAL_RATE_LIMIT', 30),
+        chat_rate=getattr(settings, 'TELEGRAM_CHAT_RATE_LIMIT', 1),
+    )
+    return SharedRateLimiter(
+        limiter,
+        max_retries=getattr(settings, 'TELEGRAM_RATE_LIMIT_MAX_RETRIES', 3),
+    )
@@ -0,0 +1,403 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from telegram.constants import MessageLimit
+from telegram.helpers import escape_markdown
+
+from habits import clock
+from habits.models import Habit
+from habits.schedule import advance_overdue_habits
+from users.models import reachable_profiles
+from .channels import profile_recipient
+from .delivery import OutgoingMessage
+from .models import ReminderDispatch, ReminderWatermark
+from .outbox import enqueue_messages
+from .planner import smoothing_threshold, smoothing_window
+
+logger = logging.getLogger(__name__)
+
+REMINDER_WATERMARK = 'habit_reminders'
+
+# Сколько строк привычек читаем из БД и ставим в очередь за один раз
+REMINDER_CHUNK_SIZE = 500
+
+ONE_MINUTE = timedelta(minutes=1)
+
+
+def minute_floor(value):
+    """Начало минуты в UTC"""
+    return value.astimezone(dt_timezone.utc).replace(second=0, microsecond=0)
+
+
+def minute_of_day(value):
+    """Номер минуты в сутках (UTC)"""
+    value = value.astimezone(dt_timezone.utc)
+    return value.hour * 60 + value.minute
+
+
+def reminder_lead():
+    """Упреждение напоминания"""
+    return timedelta(minutes=getattr(settings, 'HABIT_REMINDER_LEAD_MINUTES', 5))
+
+
+def get_due_habits(fire_minutes, habit_ids=None):
+    """
+    Привычки, напоминания о которых приходятся на указанные минуты (UTC)
+    и которые по периодичности нужно выполнять именно в этот раз.
+    habit_ids — ограничить выборку известными привычками (из расписания демона).
+    """
+    lead = reminder_lead()
+    habits = Habit.objects.all() if habit_ids is None else Habit.objects.filter(id__in=habit_ids)
+    return habits.filter(
+        reachable_profiles(profile='user__profile__'),
+        reminder_minute__in={minute_of_day(minute) for minute in fire_minutes},
+        next_due_at__in={minute + lead for minute in fire_minutes},
+        is_pleasant=False,
+        user__profile__notifications_enabled=True,
+    ).select_related('user__profile').order_by('user_id')
+
+
+def markdown_text(value):
+    """Текст пользователя для parse_mode='Markdown': символы разметки экранируются"""
+    return escape_markdown(str(value), version=1)
+
+
+def render_reminder(habit, habit_at):
+    """Текст напоминания о привычке, habit_at — момент выполнения привычки"""
+    return (
+        f"⏰ *Напоминание о привычке!*\n\n"
+        f"📍 *Место:* {markdown_text(habit.place)}\n"
+        f"🕐 *Время:* {habit.get_local_time_str()} (по вашему времени)\n"
+        f"📌 *Действие:* {markdown_text(habit.action)}\n"
+        f"⏱️ *Длительность:* {habit.duration} сек.\n\n"
+        f"✅ Отметь выполнение кнопкой ниже или в приложении!"
+    )
+
+
+def render_reminder_item(habit, habit_at):
+    """Строка о привычке в общем напоминании"""
+    return (
+        f"🕐 *{habit.get_local_time_str()}* — {markdown_text(habit.action)}\n"
+        f"📍 {markdown_text(habit.place)} · ⏱️ {habit.duration} сек.\n\n"
+    )
+
+
+# Меняется вместе с шаблонами напоминаний: записи старых шаблонов перестают читаться
+REMINDER_TEXT_VERSION = 3
+
+
+def reminder_text_key(habit_id):
+    """Ключ готовых текстов напоминания о привычке в кеше"""
+    return f'reminder_text:v{REMINDER_TEXT_VERSION}:{habit_id}'
+
+
+def get_reminder_texts(items):
+    """
+    Готовые тексты напоминаний для пар (привычка, habit_at): {id привычки: (отдельное, строка общего)}.
+    Кеш читается и пополняется одним запросом на пакет; запись годится, пока не изменилась
+    привычка (updated_at — его обновляет и пересчет после смены смещения пояса).
+    Недоступный кеш — просто рендерим.
+    """
+    if not items:
+        return {}
+
+    keys = {habit.id: reminder_text_key(habit.id) for habit, _ in items}
+    try:
+        cached = cache.get_many(keys.values())
+    except Exception as e:
+        logger.warning(f"⚠️ Кеш текстов напоминаний недоступен: {e}")
+        cached = None
+
+    texts = {}
+    missed = {}
+    for habit, habit_at in items:
+        version = habit.updated_at.isoformat() if habit.updated_at else ''
+        entry = (cached or {}).get(keys[habit.id])
+        if entry and entry[0] == version:
+            texts[habit.id] = (entry[1], entry[2])
+            continue
+        texts[habit.id] = (render_reminder(habit, habit_at), render_reminder_item(habit, habit_at))
+        missed[keys[habit.id]] = (version, *texts[habit.id])
+
+    if missed and cached is not None:
+        try:
+            cache.set_many(missed, timeout=getattr(settings, 'REMINDER_TEXT_CACHE_SECONDS', 8 * 24 * 3600))
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить тексты напоминаний в кеш: {e}")
+    return texts
+
+
+def invalidate_reminder_text(habit_id):
+    """Сбросить готовые тексты после изменения или удаления привычки"""
+    try:
+        cache.delete(reminder_text_key(habit_id))
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сбросить текст напоминания {habit_id}: {e}")
+
+
+REMINDERS_HEADER = "⏰ *Напоминание о привычках!* (по вашему времени)\n\n"
+REMINDERS_FOOTER = "✅ Отметь выполнение кнопками ниже или в приложении!"
+
+DONE_ACTION = 'done'
+SNOOZE_ACTION = 'snooze'
+
+
+def reminder_callback(action, habit, habit_at):
+    """callback_data кнопки: действие, привычка и дата выполнения (UTC) — укладываемся в 64 байта"""
+    return f"{action}:{habit.id}:{habit_at:%Y%m%d}"
+
+
+def reminder_buttons(items):
+    """Кнопки «Выполнено» и «Отложить» — по ряду на каждую привычку сообщения"""
+    snooze_minutes = getattr(settings, 'REMINDER_SNOOZE_MINUTES', 10)
+    if len(items) == 1:
+        habit, habit_at = items[0]
+        return [[
+            ('✅ Выполнено', reminder_callback(DONE_ACTION, habit, habit_at)),
+            (f'⏰ Через {snooze_minutes} мин', reminder_callback(SNOOZE_ACTION, habit, habit_at)),
+        ]]
+    return [
+        [
+            (f'✅ {habit.action[:24]}', reminder_callback(DONE_ACTION, habit, habit_at)),
+            (f'⏰ +{snooze_minutes} мин', reminder_callback(SNOOZE_ACTION, habit, habit_at)),
+        ]
+        for habit, habit_at in items
+    ]
+
+
+def split_chat_reminders(items, texts=None):
+    """
+    Делим привычки одного чата на сообщения:
+    не больше REMINDER_MAX_HABITS_PER_MESSAGE и не длиннее сообщения Telegram.
+    texts — готовые тексты из get_reminder_texts.
+    """
+    texts = texts or get_reminder_texts(items)
+    max_habits = getattr(settings, 'REMINDER_MAX_HABITS_PER_MESSAGE', 5)
+    max_length = MessageLimit.MAX_TEXT_LENGTH - len(REMINDERS_HEADER) - len(REMINDERS_FOOTER)
+
+    groups = []
+    group = []
+    length = 0
+    for habit, habit_at in items:
+        item_length = len(texts[habit.id][1])
+        if group and (len(group) >= max_habits or length + item_length > max_length):
+            groups.append(group)
+            group = []
+            length = 0
+        group.append((habit, habit_at))
+        length += item_length
+
+    groups.append(group)
+    return groups
+
+
+def render_reminder_group(items, texts=None):
+    """Текст сообщения для группы привычек одного чата"""
+    texts = texts or get_reminder_texts(items)
+    if len(items) == 1:
+        return texts[items[0][0].id][0]
+    body = ''.join(texts[habit.id][1] for habit, _ in items)
+    return REMINDERS_HEADER + body + REMINDERS_FOOTER
+
+
+def build_messages(habits, fire_times):
+    """
+    Сообщения для пакета привычек: по одному (или несколько, если много) на пользователя,
+    в выбранный им канал.
+    """
+    lead = reminder_lead()
+    by_user = defaultdict(list)
+    for habit in habits:
+        by_user[habit.user_id].append((habit, fire_times[habit.reminder_minute] + lead))
+
+    # Тексты всего пакета — одним запросом в кеш, без рендеринга в цикле
+    texts = get_reminder_texts([item for items in by_user.values() for item in items])
+
+    messages = []
+    for items in by_user.values():
+        items.sort(key=lambda item: item[1])
+        user = items[0][0].user
+        profile = user.profile
+        recipient = profile_recipient(
+            profile.notification_channel, profile.telegram_chat_id, user.email, profile.webhook_url
+        )
+        messages += [
+            OutgoingMessage(text=render_reminder_group(group, texts), buttons=reminder_buttons(group), **recipient)
+            for group in split_chat_reminders(items, texts)
+        ]
+    return messages
+
+
+def claim_minutes(now, name=REMINDER_WATERMARK):
+    """
+    Забрать все необработанные минуты до текущей включительно и сдвинуть отметку.
+    Если beat опоздал, вернутся все пропущенные минуты (но не больше REMINDER_MAX_CATCHUP_MINUTES),
+    если два запуска пересеклись — второй получит пустой список.
+    """
+    current = minute_floor(now)
+    max_catchup = getattr(settings, 'REMINDER_MAX_CATCHUP_MINUTES', 60)
+
+    with transaction.atomic():
+        watermark, _ = ReminderWatermark.objects.select_for_update().get_or_create(
+            name=name,
+            defaults={'last_minute': current - ONE_MINUTE}
+        )
+        start = max(watermark.last_minute + ONE_MINUTE, current - ONE_MINUTE * (max_catchup - 1))
+        if start > current:
+            return []
+
+        watermark.last_minute = current
+        watermark.save(update_fields=['last_minute', 'updated_at'])
+
+    minutes = []
+    while start <= current:
+        minutes.append(start)
+        start += ONE_MINUTE
+    return minutes
+
+
+def claim_dispatches(habits, fire_times, name=REMINDER_WATERMARK):
+    """
+    Записать напоминания в журнал и вернуть только те привычки,
+    напоминание о которых в эту минуту еще никто не отправлял.
+    """
+    keys = {
+        habit.id: (fire_times[habit.reminder_minute].date(), habit.reminder_minute)
+        for habit in habits
+    }
+    if not keys:
+        return []
+
+    with transaction.atomic():
+        # Запись в журнал сериализуем блокировкой строки отметки — проверка и вставка атомарны
+        list(ReminderWatermark.objects.select_for_update().filter(name=name).values_list('id', flat=True))
+
+        sent = set(
+            ReminderDispatch.objects.filter(
+                fire_date__in={fire_date for fire_date, _ in keys.values()},
+                minute__in={minute for _, minute in keys.values()},
+                habit_id__in=keys.keys(),
+            ).values_list('habit_id', 'fire_date', 'minute')
+        )
+
+        claimed = [habit for habit in habits if (habit.id, *keys[habit.id]) not in sent]
+        ReminderDispatch.objects.bulk_create(
+            [
+                ReminderDispatch(habit_id=habit.id, fire_date=keys[habit.id][0], minute=keys[habit.id][1])
+                for habit in claimed
+            ],
+            ignore_conflicts=True,
+        )
+
+    return claimed
+
+
+def reminder_spread(due_count, minutes_count=1):
+    """
+    Окно сглаживания для пачки напоминаний: если включено и нагрузка выше порога,
+    отправка растягивается на REMINDER_SMOOTHING_WINDOW_SECONDS, иначе уходит сразу.
+    """
+    if not getattr(settings, 'REMINDER_SMOOTHING_ENABLED', False):
+        return 0
+    if due_count <= smoothing_threshold() * minutes_count:
+        return 0
+    return smoothing_window()
+
+
+def advance_for_minutes(minutes):
+    """
+    Сдвинуть просроченные привычки перед выборкой напоминаний за минуты minutes.
+    Сутки считаем по моменту выполнения, а не напоминания: иначе привычка в 00:00 MSK
+    сдвигалась уже после своего напоминания в 23:55 и пропускала его каждый день.
+    Раньше первой минуты окна не сдвигаем — напоминания внутри окна еще не отправлены.
+    """
+    lead = reminder_lead()
+    return advance_overdue_habits(minutes[-1] + lead, not_after=minutes[0] + lead)
+
+
+def collect_due_reminders(minutes, habit_ids):
+    """
+    Привычки из расписания демона, по которым пора напомнить, уже записанные в журнал.
+    Возвращает (привычки, fire_times).
+    """
+    advance_for_minutes(minutes)
+    fire_times = {minute_of_day(minute): minute for minute in minutes}
+    habits = list(get_due_habits(minutes, habit_ids=habit_ids))
+    return claim_dispatches(habits, fire_times), fire_times
+
+
+def _enqueue(habits, fire_times, spread=0):
+    """Поставить напоминания порции в очередь уведомлений, возвращает число сообщений"""
+    if not habits:
+        return 0
+    return enqueue_messages(build_messages(habits, fire_times), spread=spread)
+
+
+def claim_and_enqueue(habits, fire_times, spread=0):
+    """
+    Журнал и очередь уведомлений — в одной транзакции: иначе при сбое между ними
+    напоминание числилось бы отправленным, а журнал не дал бы его повторить.
+    """
+    with transaction.atomic():
+        return _enqueue(claim_dispatches(habits, fire_times), fire_times, spread)
+
+
+def dispatch_due_reminders(now=None):
+    """
+    Поставить в очередь уведомлений напоминания за все необработанные минуты.
+    Привычки одного чата объединяются в одно сообщение, отправляют их воркеры очереди.
+    Возвращает (найдено привычек, сообщений в очереди).
+    """
+    now = now or clock.now()
+
+    minutes = claim_minutes(now)
+    if not minutes:
+        logger.info("⏭️ Минуты уже обработаны другим запуском")
+        return 0, 0
+
+    if len(minutes) > 1:
+        logger.warning(f"⏪ Догоняем пропущенные минуты: {len(minutes)} шт. с {minutes[0]:%H:%M} UTC")
+
+    # Просроченные привычки переводим на следующий период, чтобы next_due_at был актуален
+    advance_for_minutes(minutes)
+
+    fire_times = {minute_of_day(minute): minute for minute in minutes}
+
+    spread = 0
+    if getattr(settings, 'REMINDER_SMOOTHING_ENABLED', False):
+        spread = reminder_spread(get_due_habits(minutes).count(), len(minutes))
+        if spread:
+            logger.info(f"🌊 Пиковая минута: отправка растянута на {spread} с")
+
+    # Один индексный проход по всем пропущенным минутам, строки читаем порциями
+    habits = get_due_habits(minutes).iterator(chunk_size=REMINDER_CHUNK_SIZE)
+
+    found_count = 0
+    queued_count = 0
+    chunk = []
+
+    for habit in habits:
+        # Строки отсортированы по пользователю: порцию закрываем только на границе чата,
+        # чтобы все привычки одного чата ушли одним сообщением
+        if len(chunk) >= REMINDER_CHUNK_SIZE and habit.user_id != chunk[-1].user_id:
+            queued_count += claim_and_enqueue(chunk, fire_times, spread)
+            chunk = []
+        found_count += 1
+        chunk.append(habit)
+
+    if chunk:
+        queued_count += claim_and_enqueue(chunk, fire_times, spread)
+
+    return found_count, queued_count
+
+
+def prune_dispatch_log(today=None):
+    """Удалить записи журнала старше REMINDER_LEDGER_RETENTION_DAYS дней"""
+    today = today or clock.now().date()
+    retention = getattr(settings, 'REMINDER_LEDGER_RETENTION_DAYS', 2)
+    deleted, _ = ReminderDispatch.objects.filter(fire_date__lt=today - timedelta(days=retention)).delete()
+    return deleted
@@ -0,0 +1,31 @@
+import logging
+
+from django.conf import settings
+
+from users.models import UserProfile
+from .delivery import OutgoingMessage
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempt):
+    """Экспоненциальная задержка перед повтором: base, 2*base, 4*base, ..."""
+    base = getattr(settings, 'TELEGRAM_RETRY_BASE_DELAY', 30)
+    return base * 2 ** (attempt - 1)
+
+
+def disable_gone_chats(chat_ids):
+    """Отключить уведомления для чатов, куда бот больше не может писать"""
+    if not chat_ids:
+        return 0
+    disabled = UserProfile.objects.filter(
+        telegram_chat_id__in=chat_ids,
+        notifications_enabled=True
+    ).update(notifications_enabled=False)
+    logger.warning(f"🔕 Отключены уведомления для недоступных чатов: {disabled}")
+    return disabled
+
+
+def messages_from_payload(payload):
+    """Восстановить сообщения из аргументов задачи Celery"""
+    return [OutgoingMessage(**item) for item in payload]
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from habits import clock
+from habits.models import Habit, MINUTES_PER_DAY
+from .channels import ChannelDispatcher
+from .delivery import TelegramSender
+from .outbox import adrain_outbox, enqueue_messages
+from .pubsub import get_schedule_channel
+from .snooze import drain_snoozed_reminders, next_snooze_due
+from .reminders import (
+    ONE_MINUTE, build_messages, collect_due_reminders, minute_floor, minute_of_day, reminder_spread
+)
+
+logger = logging.getLogger(__name__)
+
+# Сколько ждать подписки на изменения привычек перед первой загрузкой расписания, секунд
+SUBSCRIBE_TIMEOUT = 10
+
+
+class TimingWheel:
+    """Расписание в памяти: минута суток (UTC) -> id привычек, напоминание о которых в эту минуту"""
+
+    def __init__(self):
+        self._slots = defaultdict(set)
+        self._positions = {}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def add(self, habit_id, minute):
+        self.remove(habit_id)
+        self._slots[minute % MINUTES_PER_DAY].add(habit_id)
+        self._positions[habit_id] = minute % MINUTES_PER_DAY
+
+    def remove(self, habit_id):
+        minute = self._positions.pop(habit_id, None)
+        if minute is not None:
+            self._slots[minute].discard(habit_id)
+            if not self._slots[minute]:
+                del self._slots[minute]
+
+    def slot(self, minute):
+        """id привычек в минуте суток"""
+        return set(self._slots.get(minute, ()))
+
+    def load(self, rows):
+        """Заполнить расписание заново из пар (id привычки, минута напоминания)"""
+        self._slots.clear()
+        self._positions.clear()
+        for habit_id, minute in rows:
+            self.add(habit_id, minute)
+
+
+def enqueue_due_reminders(minutes, habit_ids):
+    """
+    Напоминания из расписания демона — в очередь уведомлений, возвращает число сообщений.
+    Журнал и очередь пишутся одной транзакцией, как и в dispatch_due_reminders.
+    """
+    with transaction.atomic():
+        habits, fire_times = collect_due_reminders(minutes, habit_ids)
+        if not habits:
+            return 0
+        spread = reminder_spread(len(habits), len(minutes))
+        return enqueue_messages(build_messages(habits, fire_times), spread=spread)
+
+
+def load_schedule_rows():
+    """Все привычки, о которых бывают напоминания — одним запросом"""
+    return list(
+        Habit.objects.filter(is_pleasant=False, reminder_minute__isnull=False)
+        .order_by()
+        .values_list('id', 'reminder_minute')
+    )
+
+
+class ReminderDaemon:
+    """
+    Долгоживущий процесс напоминаний: просыпается ровно на границе минуты
+    и ходит в БД, только если в расписании на эту минуту кто-то есть.
+    Журнал напоминаний общий с задачей Celery, поэтому они не дублируют друг друга;
+    поставленные в очередь сообщения демон сразу разбирает сам, не дожидаясь воркеров.
+    Он же — потребитель очереди отложенных напоминаний: просыпается к ближайшему сроку.
+    """
+
+    def __init__(self, sender=None, channel=None, reload_interval=None):
+        # Свой бот на event loop демона; почта и вебхуки — через общие каналы
+        self.sender = sender or ChannelDispatcher({'telegram': TelegramSender()})
+        self.channel = channel or get_schedule_channel()
+        self.reload_interval = reload_interval or getattr(settings, 'REMINDER_DAEMON_RELOAD_SECONDS', 3600)
+        self.wheel = TimingWheel()
+        self.next_snooze_at = None
+        self._loaded_at = None
+
+    async def reload(self):
+        """Перечитать расписание из БД (на случай пропущенных публикаций)"""
+        rows = await sync_to_async(load_schedule_rows)()
+        self.wheel.load(rows)
+        self.next_snooze_at = await sync_to_async(next_snooze_due)()
+        self._loaded_at = time.monotonic()
+        logger.info(f"🗓️ Расписание напоминаний загружено: {len(self.wheel)} привычек")
+
+    def apply_change(self, message):
+        """Применить опубликованное изменение привычки или новый срок отложенного напоминания"""
+        if 'snooze_due_at' in message:
+            due_at = datetime.fromisoformat(message['snooze_due_at'])
+            if self.next_snooze_at is None or due_at < self.next_snooze_at:
+                self.next_snooze_at = due_at
+        elif message.get('reminder_minute') is None:
+            self.wheel.remove(message['habit_id'])
+        else:
+            self.wheel.add(message['habit_id'], message['reminder_minute'])
+
+    async def listen(self, loaded=None):
+        """
+        Слушаем изменения привычек, при обрыве переподключаемся.
+        Расписание загружается после каждой подписки, а не до нее: изменение, пришедшее
+        во время загрузки, дождется в подписке, а не потеряется между загрузкой и подпиской.
+        loaded выставляется после первой загрузки.
+        """
+        async def subscribed():
+            await self.reload()
+            if loaded is not None:
+                loaded.set()
+
+        while True:
+            try:
+                async for message in self.channel.subscribe(on_subscribed=subscribed):
+                    self.apply_change(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Потеряна подписка на изменения привычек: {e}")
+                await asyncio.sleep(1)
+
+    async def fire(self, minutes):
+        """Разослать напоминания за минуты, возвращает число отправленных сообщений"""
+        habit_ids = set()
+        for minute in minutes:
+            habit_ids |= self.wheel.slot(minute_of_day(minute))
+        if not habit_ids:
+            return 0
+
+        queued = await sync_to_async(enqueue_due_reminders)(minutes, habit_ids)
+        if not queued:
+            return 0
+
+        sent = await adrain_outbox(self.sender)
+        lateness = (clock.now() - minutes[-1]).total_seconds()
+        logger.info(f"📨 Напоминания за {minutes[-1]:%H:%M} UTC: в очереди {queued}, отправлено {sent}, "
+                    f"задержка {lateness:.2f} с")
+        return sent
+
+    async def fire_snoozes(self):
+        """Разослать отложенные напоминания, срок которых наступил"""
+        queued = await sync_to_async(drain_snoozed_reminders)()
+        sent = await adrain_outbox(self.sender) if queued else 0
+        self.next_snooze_at = await sync_to_async(next_snooze_due)()
+        return sent
+
+    def pending_minutes(self, last, now):
+        """Минуты после last до текущей включительно (не больше REMINDER_MAX_CATCHUP_MINUTES)"""
+        current = minute_floor(now)
+        max_catchup = getattr(settings, 'REMINDER_MAX_CATCHUP_MINUTES', 60)
+        start = max(last + ONE_MINUTE, current - ONE_MINUTE * (max_catchup - 1))
+
+        minutes = []
+        while start <= current:
+            minutes.append(start)
+            start += ONE_MINUTE
+        return minutes
+
+    async def wait_loaded(self, loaded, stop):
+        """Первую загрузку делает listen сразу после подписки; если подписаться не удалось — загружаем сами"""
+        waiters = [asyncio.ensure_future(loaded.wait()), asyncio.ensure_future(stop.wait())]
+        done, pending = await asyncio.wait(waiters, timeout=SUBSCRIBE_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in pending:
+            waiter.cancel()
+        if not done:
+            # Изменения, пропущенные без подписки, догонит периодическая перезагрузка
+            logger.warning("⚠️ Нет подписки на изменения привычек, расписание загружено без нее")
+            await self.reload()
+
+    async def run(self, stop=None):
+        """Основной цикл: ждем начала минуты, рассылаем, снова ждем"""
+        stop = stop or asyncio.Event()
+        loaded = asyncio.Event()
+        listener = asyncio.create_task(self.listen(loaded))
+
+        try:
+            await self.wait_loaded(loaded, stop)
+            last = minute_floor(clock.now()) - ONE_MINUTE
+            while not stop.is_set():
+                minutes = self.pending_minutes(last, clock.now())
+                if minutes:
+                    last = minutes[-1]
+                    try:
+                        await self.fire(minutes)
+                    except Exception as e:
+                        logger.error(f"❌ Ошибка рассылки за {last:%H:%M} UTC: {e}")
+
+                if self.next_snooze_at is not None and self.next_snooze_at <= clock.now():
+                    try:
+                        await self.fire_snoozes()
+                    except Exception as e:
+                        logger.error(f"❌ Ошибка отправки отложенных напоминаний: {e}")
+                        self.next_snooze_at = clock.now() + timedelta(seconds=5)
+
+                if time.monotonic() - self._loaded_at >= self.reload_interval:
+                    await self.reload()
+
+                wake_at = last + ONE_MINUTE
+                if self.next_snooze_at is not None:
+                    wake_at = min(wake_at, self.next_snooze_at)
+                delay = (wake_at - clock.now()).total_seconds()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=max(delay, 0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
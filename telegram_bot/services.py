@@ -1,8 +1,8 @@
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import AccessToken
 from users.models import UserProfile
-from habits.models import Habit
-from django.utils import timezone
+from habits.agenda import aget_chat_agenda
+from .completions import buffer_completion
 from asgiref.sync import sync_to_async
 import logging
 
@@ -10,22 +10,22 @@ User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
-@sync_to_async
-def _connect_telegram_account_sync(token, chat_id, telegram_username):
-    """Синхронная функция для привязки Telegram"""
+async def connect_telegram_account(token, chat_id, telegram_username):
+    """Привязка Telegram к пользователю по JWT — на асинхронном ORM, без перехода в поток на всю функцию"""
     try:
         # Декодируем токен и получаем пользователя
         access_token = AccessToken(token)
-        user_id = access_token['user_id']
-
-        user = User.objects.get(id=user_id)
+        user = await User.objects.aget(id=access_token['user_id'])
 
         # Обновляем профиль
-        profile, created = UserProfile.objects.get_or_create(user=user)
-        profile.telegram_chat_id = chat_id
-        profile.telegram_username = telegram_username
-        profile.notifications_enabled = True
-        profile.save()
+        await UserProfile.objects.aupdate_or_create(
+            user=user,
+            defaults={
+                'telegram_chat_id': chat_id,
+                'telegram_username': telegram_username,
+                'notifications_enabled': True,
+            }
+        )
 
         logger.info(f"Telegram аккаунт {telegram_username} привязан к пользователю {user.username}")
         return True, "Аккаунт успешно привязан"
@@ -35,44 +35,32 @@ def _connect_telegram_account_sync(token, chat_id, telegram_username):
         return False, f"Ошибка: {str(e)}"
 
 
-async def connect_telegram_account(token, chat_id, telegram_username):
-    """Асинхронная обертка для привязки Telegram"""
-    return await _connect_telegram_account_sync(token, chat_id, telegram_username)
+async def get_today_habits(chat_id):
+    """Привычки на сегодня для чата — из общей повестки: на попадании в кеш без запросов к БД"""
+    try:
+        habits = await aget_chat_agenda(chat_id)
+    except Exception as e:
+        logger.error(f"Error getting habits: {e}")
+        return []
+    return (habits or [])[:10]
 
 
-@sync_to_async
-def _get_today_habits_sync(chat_id):
-    """Синхронная функция для получения привычек"""
-    try:
-        profile = UserProfile.objects.get(telegram_chat_id=chat_id)
-        user = profile.user
+async def complete_habit(chat_id, habit_id, completion_date):
+    """
+    Отметка выполнения из Telegram: нажатие попадает в буфер без запросов к БД,
+    в HabitCompletion его пачкой пишет периодический сброс (там же проверяется владелец)
+    """
+    await buffer_completion(chat_id, habit_id, completion_date)
 
-        now = timezone.now()
-        current_time = now.time()
 
-        habits = Habit.objects.filter(
-            user=user,
-            is_pleasant=False,
-            time__gte=current_time
-        ).order_by('time')[:10]
+@sync_to_async
+def _snooze_habit_sync(chat_id, habit_id, habit_date):
+    """Синхронная функция для откладывания напоминания"""
+    from .snooze import snooze_reminder
 
-        return [
-            {
-                'id': h.id,
-                'action': h.action,
-                'time': h.time.strftime('%H:%M'),
-                'place': h.place,
-                'duration': h.duration
-            }
-            for h in habits
-        ]
-    except UserProfile.DoesNotExist:
-        return []
-    except Exception as e:
-        logger.error(f"Error getting habits: {e}")
-        return []
+    return snooze_reminder(chat_id, habit_id, habit_date)
 
 
-async def get_today_habits(chat_id):
-    """Асинхронная обертка для получения привычек"""
-    return await _get_today_habits_sync(chat_id)
\ No newline at end of file
+async def snooze_habit(chat_id, habit_id, habit_date):
+    """Асинхронная обертка: отложить напоминание, возвращает время нового напоминания или None"""
+    return await _snooze_habit_sync(chat_id, habit_id, habit_date)
@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from habits.models import Habit
+from .pubsub import publish_schedule_change
+from .reminders import invalidate_reminder_text
+
+
+@receiver(post_save, sender=Habit)
+def habit_saved(sender, instance, **kwargs):
+    """Изменение привычки — в расписание демона напоминаний и сброс готового текста"""
+    minute = None if instance.is_pleasant else instance.reminder_minute
+    transaction.on_commit(lambda: publish_schedule_change(instance.pk, minute))
+    transaction.on_commit(lambda: invalidate_reminder_text(instance.pk))
+
+
+@receiver(post_delete, sender=Habit)
+def habit_deleted(sender, instance, **kwargs):
+    """Удаленная привычка — убрать из расписания демона напоминаний и из кеша текстов"""
+    habit_id = instance.pk
+    transaction.on_commit(lambda: publish_schedule_change(habit_id, None))
+    transaction.on_commit(lambda: invalidate_reminder_text(habit_id))
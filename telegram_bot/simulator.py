@@ -0,0 +1,183 @@
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from habits import clock
+from habits.models import Habit
+from habits.schedule import utc_offset_minutes
+from users.models import UserProfile, reachable_profiles
+from .delivery import DeliveryResult
+from .digest import DIGEST_WATERMARK, dispatch_daily_digests
+from .models import ReminderDispatch, ReminderWatermark
+from .outbox import drain_outbox
+from .reminders import ONE_MINUTE, REMINDER_WATERMARK, dispatch_due_reminders, minute_floor, reminder_lead
+from .snooze import drain_snoozed_reminders
+
+User = get_user_model()
+
+# Чаты симулированных пользователей — заведомо вне диапазона настоящих
+SIMULATION_CHAT_BASE = 8_000_000_000
+
+# Люди чаще выбирают круглое время — так получаются реальные пики
+ROUND_MINUTES = (0, 0, 0, 0, 30, 30, 15, 45)
+
+
+class RecordingSender:
+    """Поддельная доставка: ничего не отправляет, запоминает сообщения по минутам симуляции"""
+
+    def __init__(self):
+        self.sent = Counter()
+        self.messages = []
+
+    def send_batch(self, messages):
+        messages = list(messages)
+        minute = minute_floor(clock.now())
+        self.sent[minute] += len(messages)
+        self.messages += messages
+        return [DeliveryResult(message=message, ok=True, message_id=index) for index, message in enumerate(messages)]
+
+
+@dataclass
+class SimulationReport:
+    """Итоги симуляции: нагрузка по минутам и сверка с ожидаемыми напоминаниями"""
+
+    start: datetime
+    end: datetime
+    habits: int = 0
+    # минута (UTC) -> число привычек, напоминание о которых ушло в эту минуту
+    reminders: Counter = field(default_factory=Counter)
+    # минута (UTC) -> число сообщений, отправленных в эту минуту
+    messages: Counter = field(default_factory=Counter)
+    expected: set = field(default_factory=set)
+    actual: set = field(default_factory=set)
+    digests: int = 0
+    wall_seconds: float = 0.0
+
+    @property
+    def missing(self):
+        return sorted(self.expected - self.actual)
+
+    @property
+    def unexpected(self):
+        return sorted(self.actual - self.expected)
+
+    @property
+    def ok(self):
+        return not self.missing and not self.unexpected
+
+
+def seed_habits(count, start, rng):
+    """Пользователи и привычки со случайным временем и периодичностью — массовыми вставками"""
+    users = User.objects.bulk_create([
+        User(username=f'sim_{int(time.time())}_{index}', password='!') for index in range(max(count // 3, 1))
+    ])
+    offset = utc_offset_minutes(now=start)
+    profiles = [
+        UserProfile(user=user, telegram_chat_id=SIMULATION_CHAT_BASE + index, notifications_enabled=True)
+        for index, user in enumerate(users)
+    ]
+    for user, profile in zip(users, profiles):
+        profile.apply_utc_offset(offset)
+        # Профиль в кэше пользователя — пояс владельца без запроса на каждую привычку
+        user.profile = profile
+    UserProfile.objects.bulk_create(profiles)
+
+    habits = []
+    for index in range(count):
+        habit = Habit(
+            user=rng.choice(users),
+            place='Симуляция',
+            time=dt_time(rng.randrange(24), rng.choice(ROUND_MINUTES) if rng.random() < 0.8 else rng.randrange(60)),
+            action=f'Привычка {index}',
+            frequency=rng.choice((1, 1, 1, 2, 3, 7)),
+            is_pleasant=rng.random() < 0.1,
+        )
+        habit.sync_fire_time(now=start)
+        habit.reminder_minute = habit.calculate_reminder_minute()
+        habit.next_due_at = habit.calculate_next_due_at(now=start)
+        habits.append(habit)
+    return Habit.objects.bulk_create(habits, batch_size=1000)
+
+
+def expected_reminders(habits, start, end):
+    """
+    Напоминания, которые должны уйти за период, посчитанные независимо от конвейера:
+    ряд next_due_at, next_due_at + frequency, ... минус упреждение.
+    """
+    lead = reminder_lead()
+    expected = set()
+    for habit in habits:
+        occurrence = habit.next_due_at
+        while occurrence - lead < end:
+            if occurrence - lead >= start:
+                expected.add((habit.id, occurrence - lead))
+            occurrence += timedelta(days=habit.frequency)
+    return expected
+
+
+def run_simulation(start, days=1, habits=0, speed=1000, seed=42, progress=None):
+    """
+    Прогнать конвейер напоминаний по минутам на подменных часах.
+    Все данные создаются и меняются в транзакции, которая откатывается.
+    speed — во сколько раз быстрее реального времени (0 — без пауз).
+    """
+    start = minute_floor(start)
+    end = start + timedelta(days=days)
+    report = SimulationReport(start=start, end=end)
+    sender = RecordingSender()
+    simulated = clock.SimulatedClock(start)
+    started = time.monotonic()
+
+    with clock.use_clock(simulated), transaction.atomic():
+        if habits:
+            seed_habits(habits, start, random.Random(seed))
+        # Те же условия, что у выборки напоминаний, кроме времени
+        tracked = list(Habit.objects.filter(
+            reachable_profiles(profile='user__profile__'),
+            is_pleasant=False,
+            next_due_at__isnull=False,
+            user__profile__notifications_enabled=True,
+        ))
+        report.habits = len(tracked)
+        report.expected = expected_reminders(tracked, start, end)
+
+        for name in (REMINDER_WATERMARK, DIGEST_WATERMARK):
+            ReminderWatermark.objects.update_or_create(name=name, defaults={'last_minute': start - ONE_MINUTE})
+        ReminderDispatch.objects.filter(fire_date__gte=start.date()).delete()
+
+        minute = start
+        total_minutes = days * 24 * 60
+        for index in range(total_minutes):
+            # Beat срабатывает не ровно в начале минуты
+            simulated.set(minute + timedelta(seconds=30))
+            found, _ = dispatch_due_reminders()
+            report.reminders[minute] += found
+            report.digests += dispatch_daily_digests()[0]
+            drain_snoozed_reminders()
+            drain_outbox(sender)
+
+            if speed:
+                # Минута симуляции длится 60 / speed реальных секунд
+                lag = started + (index + 1) * 60 / speed - time.monotonic()
+                if lag > 0:
+                    time.sleep(lag)
+            if progress and minute.minute == 0 and minute.hour % 6 == 0:
+                progress(minute)
+            minute += ONE_MINUTE
+
+        report.actual = {
+            (habit_id, datetime.combine(fire_date, dt_time(minute // 60, minute % 60), tzinfo=dt_timezone.utc))
+            for habit_id, fire_date, minute in ReminderDispatch.objects.filter(
+                fire_date__gte=start.date()
+            ).values_list('habit_id', 'fire_date', 'minute')
+        }
+        transaction.set_rollback(True)
+
+    report.messages = sender.sent
+    report.wall_seconds = time.monotonic() - started
+    return report
@@ -0,0 +1,146 @@
+import json
+import socketserver
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class SinkStats:
+    """Счетчики локального получателя: соединения и принятые сообщения"""
+
+    connections: int = 0
+    messages: list = field(default_factory=list)
+
+
+class _Server:
+    """Общий запуск и остановка в фоновом потоке"""
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+
+class SmtpSink(_Server):
+    """
+    Локальный SMTP-сервер для проверки почтового канала: письма никуда не уходят,
+    а складываются в stats.messages. rejected — адреса, которые сервер отвергает (550).
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, rejected=()):
+        self.stats = SinkStats()
+        self.rejected = set(rejected)
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(f'{line}\r\n'.encode())
+
+            def handle(self):
+                with sink._lock:
+                    sink.stats.connections += 1
+                self.reply('220 habits-sink ESMTP')
+                recipients = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        break
+                    command = line.decode(errors='replace').strip()
+                    verb = command[:4].upper()
+
+                    if verb in ('EHLO', 'HELO'):
+                        self.reply('250 habits-sink')
+                    elif verb == 'MAIL':
+                        recipients = []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        address = command.split(':', 1)[1].strip().strip('<>')
+                        if address in sink.rejected:
+                            self.reply('550 No such user')
+                        else:
+                            recipients.append(address)
+                            self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        data = []
+                        for data_line in self.rfile:
+                            if data_line in (b'.\r\n', b'.\n'):
+                                break
+                            data.append(data_line.decode(errors='replace'))
+                        with sink._lock:
+                            sink.stats.messages.append({'to': recipients, 'data': ''.join(data)})
+                        self.reply('250 OK')
+                    elif verb in ('RSET', 'NOOP'):
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        break
+                    else:
+                        self.reply('502 Command not implemented')
+
+        return Handler
+
+
+class WebhookReceiver(_Server):
+    """
+    Локальный получатель вебхуков: принимает POST с JSON и отвечает status.
+    По stats.connections видно, переиспользует ли отправитель соединения.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, status=200):
+        self.stats = SinkStats()
+        self.status = status
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.address
+        return f'http://{host}:{port}/hook'
+
+    def _handler_class(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Один экземпляр обработчика — одно соединение
+                with receiver._lock:
+                    receiver.stats.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                with receiver._lock:
+                    receiver.stats.messages.append({'path': self.path, 'payload': payload})
+                data = b'{"ok": true}'
+                self.send_response(receiver.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,100 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+
+from habits import clock
+from habits.models import Habit
+from habits.schedule import occurrence_at
+from .delivery import OutgoingMessage
+from .models import SnoozedReminder
+from .outbox import enqueue_messages
+from .pubsub import get_schedule_channel
+from .reminders import reminder_buttons, render_reminder
+
+logger = logging.getLogger(__name__)
+
+# Сколько отложенных напоминаний забираем за один раз
+SNOOZE_BATCH_SIZE = 500
+
+
+def snooze_reminder(chat_id, habit_id, habit_date, now=None):
+    """
+    Отложить напоминание на REMINDER_SNOOZE_MINUTES минут.
+    Возвращает время нового напоминания или None, если привычка не принадлежит чату.
+    """
+    now = now or clock.now()
+    habit = Habit.objects.filter(id=habit_id, user__profile__telegram_chat_id=chat_id).first()
+    if habit is None:
+        return None
+
+    due_at = now + timedelta(minutes=getattr(settings, 'REMINDER_SNOOZE_MINUTES', 10))
+    SnoozedReminder.objects.create(
+        chat_id=chat_id,
+        habit=habit,
+        habit_at=occurrence_at(habit_date, habit.time),
+        due_at=due_at,
+    )
+
+    # Демон напоминаний проснется к этому сроку, не опрашивая таблицу
+    transaction.on_commit(lambda: publish_snooze(due_at))
+    return due_at
+
+
+def publish_snooze(due_at):
+    """Сообщить потребителю очереди о новом сроке"""
+    try:
+        get_schedule_channel().publish({'snooze_due_at': due_at.isoformat()})
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось опубликовать отложенное напоминание: {e}")
+
+
+def next_snooze_due():
+    """Ближайший срок в очереди (по индексу) или None"""
+    return SnoozedReminder.objects.aggregate(due=Min('due_at'))['due']
+
+
+def drain_snoozed_reminders(now=None):
+    """
+    Перенести в очередь уведомлений все отложенные напоминания, срок которых наступил,
+    в порядке сроков. Возвращает число сообщений.
+    SKIP LOCKED — на случай, если кроме демона запущена задача-страховка.
+    """
+    now = now or clock.now()
+    queued = 0
+
+    while True:
+        with transaction.atomic():
+            rows = list(
+                SnoozedReminder.objects.select_for_update(skip_locked=True)
+                .filter(due_at__lte=now)
+                .order_by('due_at')[:SNOOZE_BATCH_SIZE]
+            )
+            if not rows:
+                break
+
+            habits = Habit.objects.select_related('user__profile').in_bulk({row.habit_id for row in rows})
+            messages = []
+            for row in rows:
+                habit = habits.get(row.habit_id)
+                # Привычку удалили или уведомления отключили, пока напоминание ждало
+                if habit is None or not habit.user.profile.notifications_enabled:
+                    continue
+                items = [(habit, row.habit_at)]
+                messages.append(OutgoingMessage(
+                    chat_id=row.chat_id,
+                    text=render_reminder(habit, row.habit_at),
+                    buttons=reminder_buttons(items),
+                ))
+
+            queued += enqueue_messages(messages)
+            SnoozedReminder.objects.filter(id__in=[row.id for row in rows]).delete()
+
+        if len(rows) < SNOOZE_BATCH_SIZE:
+            break
+
+    if queued:
+        logger.info(f"⏰ Отложенных напоминаний в очереди: {queued}")
+    return queued
@@ -1,11 +1,17 @@
 from celery import shared_task
 from django.utils import timezone
-from django.conf import settings
-from habits.models import Habit
-import asyncio
-from telegram import Bot
+from habits import clock
+from habits.schedule import recompute_fire_times
+from .completions import flush_completions
+from .digest import dispatch_daily_digests
+from .models import NotificationOutbox
+from .outbox import drain_outbox, enqueue_messages, prune_outbox, schedule_drains
+from .planner import plan_summary
+from .pubsub import publish_schedule_change
+from .reminders import dispatch_due_reminders, prune_dispatch_log
+from .retries import messages_from_payload
+from .snooze import drain_snoozed_reminders
 import logging
-from datetime import timedelta, datetime
 
 logger = logging.getLogger(__name__)
 
@@ -14,81 +20,98 @@ logger = logging.getLogger(__name__)
 def send_habit_reminders():
     """
     Отправка напоминаний о привычках.
-    Ищет привычки, которые должны быть выполнены в ближайшие 5 минут.
+    Обрабатывает все минуты с прошлого запуска: напоминание уходит
+    за HABIT_REMINDER_LEAD_MINUTES минут до времени привычки и не больше одного раза.
     """
-    now_utc = timezone.now()
+    now_utc = clock.now()
     now_local = timezone.localtime(now_utc)
 
     logger.info(f"🕐 Celery запущен в {now_local.strftime('%H:%M')} MSK (UTC: {now_utc.strftime('%H:%M')})")
 
-    # ОТЛАДКА: посмотрим все привычки testuser с временем
-    test_habits = Habit.objects.filter(user__username='testuser')
-    logger.info(f"📊 Все привычки testuser в БД (UTC):")
-    for h in test_habits:
-        logger.info(f"   - {h.action}: {h.time.hour}:{h.time.minute:02d} UTC (ID: {h.id})")
+    found_count, queued_count = dispatch_due_reminders(now_utc)
 
-    # Ищем привычки, которые нужно выполнить в ближайшие 5 минут
-    time_min = now_utc.time()
-    time_max = (now_utc + timedelta(minutes=1)).time()
+    logger.info(f"📋 Найдено привычек для отправки: {found_count}")
 
-    logger.info(
-        f"🔍 Поиск привычек с временем от {time_min.hour}:{time_min.minute:02d} до {time_max.hour}:{time_max.minute:02d} UTC")
+    if not found_count:
+        return f"Нет привычек для отправки в ближайшие 5 минут (сейчас {now_local.strftime('%H:%M')} MSK)"
 
-    habits = Habit.objects.filter(
-        time__gte=time_min,
-        time__lte=time_max,
-        is_pleasant=False,
-        user__profile__notifications_enabled=True,
-        user__profile__telegram_chat_id__isnull=False
-    ).select_related('user__profile')
+    # Отправляют воркеры очереди — сколько их нужно, столько и запускаем
+    schedule_drains(queued_count)
+    return f"Напоминаний в очереди: {queued_count}"
 
-    logger.info(f"📋 Найдено привычек для отправки: {habits.count()}")
 
-    if not habits:
-        return f"Нет привычек для отправки в ближайшие 5 минут (сейчас {now_local.strftime('%H:%M')} MSK)"
+@shared_task
+def send_daily_digests():
+    """Ежедневная сводка: привычки на сегодня и выполнение за вчера"""
+    found_count, queued_count = dispatch_daily_digests()
+
+    if not found_count:
+        return "Нет сводок для отправки"
+
+    # Сводки не срочные — разбираем их воркерами bulk, а воркеры напоминаний их не берут
+    schedule_drains(queued_count, queue='bulk', kind=NotificationOutbox.KIND_DIGEST)
+    return f"Сводок в очереди: {queued_count} из {found_count}"
+
+
+@shared_task
+def flush_completion_buffer():
+    """Запись нажатий «Выполнено» из Telegram пачкой — число запросов не зависит от числа нажатий"""
+    written = flush_completions()
+    return f"Записано выполнений: {written}"
+
+
+@shared_task
+def recompute_habit_fire_times():
+    """
+    Пересчет UTC-времени привычек и сводок после смены смещения пояса (переход на летнее время).
+    Строки обновляются массово, без сигналов — демону напоминаний сообщаем об изменениях сами.
+    """
+    changed = recompute_fire_times()
+    for habit_id, reminder_minute in changed:
+        publish_schedule_change(habit_id, reminder_minute)
+
+    if changed:
+        logger.info(f"🕰️ Пересчитано время привычек после смены смещения пояса: {len(changed)}")
+    return f"Пересчитано привычек: {len(changed)}"
 
-    # Отправка сообщений
-    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
-    sent_count = 0
-
-    for habit in habits:
-        chat_id = habit.user.profile.telegram_chat_id
-
-        # Конвертация времени привычки в локальное
-        habit_utc = timezone.now().replace(
-            hour=habit.time.hour,
-            minute=habit.time.minute,
-            second=0,
-            microsecond=0
-        )
-
-        # Если время привычки уже прошло сегодня, значит на завтра
-        if habit_utc < now_utc:
-            habit_utc += timedelta(days=1)
-
-        habit_local = timezone.localtime(habit_utc)
-
-        logger.info(f"📨 Отправка {habit.user.username} на время {habit_local.strftime('%H:%M')} MSK")
-
-        message = (
-            f"⏰ *Напоминание о привычке!*\n\n"
-            f"📍 *Место:* {habit.place}\n"
-            f"🕐 *Время:* {habit_local.strftime('%H:%M')} (по Москве)\n"
-            f"📌 *Действие:* {habit.action}\n"
-            f"⏱️ *Длительность:* {habit.duration} сек.\n\n"
-            f"✅ Отметь выполнение в приложении!"
-        )
-
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(
-                bot.send_message(chat_id=chat_id, text=message, parse_mode='Markdown')
-            )
-            loop.close()
-            sent_count += 1
-            logger.info(f"✅ Отправлено успешно")
-        except Exception as e:
-            logger.error(f"❌ Ошибка отправки: {e}")
-
-    return f"Отправлено напоминаний: {sent_count}"
\ No newline at end of file
+
+@shared_task
+def prune_reminder_dispatches():
+    """Очистка журнала отправленных напоминаний и старых строк очереди уведомлений"""
+    deleted = prune_dispatch_log()
+    outbox_deleted = prune_outbox()
+    return f"Удалено записей журнала: {deleted}, строк очереди: {outbox_deleted}"
+
+
+@shared_task
+def report_reminder_load():
+    """Ежедневный отчет о нагрузке напоминаний: пик и минуты выше бюджета Telegram"""
+    summary = plan_summary()
+    peak = summary['peak']
+    if summary['hot_minutes']:
+        logger.warning(f"🔥 Минут выше бюджета отправки: {len(summary['hot_minutes'])}, "
+                       f"пик {peak['time']} UTC — {peak['expected']} при бюджете {summary['budget_per_minute']}")
+    return f"Пик нагрузки: {peak['time']} UTC — {peak['expected']} сообщений"
+
+
+@shared_task
+def send_snoozed_reminders():
+    """Страховка для отложенных напоминаний, если демон напоминаний не запущен"""
+    queued = drain_snoozed_reminders()
+    schedule_drains(queued)
+    return f"Отложенных напоминаний в очереди: {queued}"
+
+
+@shared_task
+def drain_notification_outbox(kind=NotificationOutbox.KIND_REMINDER):
+    """Разбор очереди уведомлений вида kind; задач можно запускать сколько угодно параллельно"""
+    processed, sent = drain_outbox(kind=kind)
+    return f"Обработано уведомлений: {processed}, отправлено: {sent}"
+
+
+@shared_task
+def retry_deliveries(messages, attempt):
+    """Повторы теперь живут в очереди уведомлений: задачи, поставленные раньше, перекладываем туда"""
+    queued = enqueue_messages(messages_from_payload(messages))
+    schedule_drains(queued)
+    return f"Возвращено в очередь: {queued} (попытка {attempt})"
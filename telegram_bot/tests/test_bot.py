@@ -0,0 +1,601 @@
+import asyncio
+import tempfile
+from datetime import datetime, time, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+
+from habits.models import Habit
+from telegram_bot.bot import HabitBot
+from telegram_bot.fakeapi import FakeApiConfig, FakeTelegramApi
+from telegram_bot.flood import FloodGuard
+from telegram_bot.persistence import LocalStateStore, SharedPersistence, check_conversation_internals
+from telegram_bot.ratelimit import LocalBucketBackend
+from telegram_bot.services import connect_telegram_account, get_today_habits
+from telegram_bot.updates import ChatOrderedApplication, configure_concurrency
+from telegram_bot.webhook import OWNER_KEY, OWNER_LEASE, TelegramWebhook, WebhookBusy
+from users.models import UserProfile
+
+User = get_user_model()
+
+
+class TelegramServicesTest(TestCase):
+    """Тесты для сервисов Telegram бота"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.profile = UserProfile.objects.get(user=self.user)
+
+    def test_connect_telegram_account_success(self):
+        """Тест успешной привязки Telegram аккаунта"""
+        refresh = RefreshToken.for_user(self.user)
+        token = str(refresh.access_token)
+
+        success, message = async_to_sync(connect_telegram_account)(
+            token, 123456789, 'test_tg_user'
+        )
+
+        self.assertTrue(success)
+        self.assertEqual(message, "Аккаунт успешно привязан")
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.telegram_chat_id, 123456789)
+        self.assertEqual(self.profile.telegram_username, 'test_tg_user')
+
+    def test_connect_telegram_account_invalid_token(self):
+        """Тест привязки с невалидным токеном"""
+        success, message = async_to_sync(connect_telegram_account)(
+            'invalid_token', 123456789, 'test_tg_user'
+        )
+
+        self.assertFalse(success)
+        self.assertIn('Ошибка', message)
+
+    def test_get_today_habits_success(self):
+        """Тест получения привычек на сегодня: только полезные и только со сроком сегодня"""
+        self.profile.telegram_chat_id = 123456789
+        self.profile.save()
+
+        Habit.objects.create(user=self.user, place='Парк', local_time=time(8, 30), action='Пробежка', duration=120)
+        Habit.objects.create(user=self.user, place='Дом', local_time=time(7, 0), action='Пить воду')
+        Habit.objects.create(user=self.user, place='Дом', local_time=time(9, 0), action='Ванна', is_pleasant=True)
+        tomorrow = Habit.objects.create(user=self.user, place='Дом', local_time=time(10, 0), action='Завтра')
+        Habit.objects.filter(pk=tomorrow.pk).update(next_due_at=tomorrow.next_due_at + timedelta(days=1))
+
+        habits = async_to_sync(get_today_habits)(123456789)
+
+        self.assertEqual([(h['action'], h['time']) for h in habits], [('Пить воду', '07:00'), ('Пробежка', '08:30')])
+
+    def test_get_today_habits_no_profile(self):
+        """Тест получения привычек без профиля"""
+        habits = async_to_sync(get_today_habits)(999999999)
+        self.assertEqual(len(habits), 0)
+
+
+class TelegramBotCommandsTest(TestCase):
+    """Тесты для команд Telegram бота"""
+
+    def setUp(self):
+        self.bot = HabitBot(token='test_token')
+        self.update = MagicMock()
+        self.context = MagicMock()
+
+        # ✅ ВАЖНО: используем AsyncMock для асинхронных методов
+        self.update.message = MagicMock()
+        self.update.message.reply_text = AsyncMock()
+        self.update.effective_user = MagicMock()
+        self.update.effective_user.first_name = 'Test'
+        self.update.effective_chat = MagicMock()
+        self.update.effective_chat.id = 123456789
+
+    def test_start_command(self):
+        """Тест команды /start"""
+        async_to_sync(self.bot.start_command)(self.update, self.context)
+        self.update.message.reply_text.assert_called_once()
+
+    def test_help_command(self):
+        """Тест команды /help"""
+        async_to_sync(self.bot.help_command)(self.update, self.context)
+        self.update.message.reply_text.assert_called_once()
+
+    @patch('telegram_bot.services.get_today_habits')
+    def test_habits_command_with_habits(self, mock_get_habits):
+        """Тест команды /habits когда есть привычки"""
+        mock_get_habits.return_value = [
+            {'id': 1, 'action': 'Пить воду', 'time': '07:00', 'place': 'Дом',
+             'next_due_at': '2026-03-02T04:00:00+00:00'},
+            {'id': 2, 'action': 'Пробежка', 'time': '08:30', 'place': 'Парк',
+             'next_due_at': '2026-03-02T05:30:00+00:00'}
+        ]
+
+        async_to_sync(self.bot.habits_command)(self.update, self.context)
+        self.update.message.reply_text.assert_called_once()
+        # Под списком — кнопка «Выполнено» для каждой привычки
+        markup = self.update.message.reply_text.call_args.kwargs['reply_markup']
+        self.assertEqual(
+            [row[0].callback_data for row in markup.inline_keyboard], ['done:1:20260302', 'done:2:20260302']
+        )
+
+    @patch('telegram_bot.services.get_today_habits')
+    def test_habits_command_no_habits(self, mock_get_habits):
+        """Тест команды /habits когда нет привычек"""
+        mock_get_habits.return_value = []
+
+        async_to_sync(self.bot.habits_command)(self.update, self.context)
+        self.update.message.reply_text.assert_called_once()
+
+    def test_connect_command(self):
+        """Тест команды /connect"""
+        result = async_to_sync(self.bot.connect_command)(self.update, self.context)
+        self.assertEqual(result, 1)
+        self.update.message.reply_text.assert_called_once()
+
+    @patch('telegram_bot.services.connect_telegram_account')
+    def test_handle_token_success(self, mock_connect):
+        """Тест успешной обработки токена"""
+        mock_connect.return_value = (True, "Аккаунт успешно привязан")
+        self.update.message.text = "valid_token"
+        self.update.effective_user.username = "testuser"
+
+        result = async_to_sync(self.bot.handle_token)(self.update, self.context)
+
+        self.assertEqual(result, -1)
+        self.update.message.reply_text.assert_called_once()
+
+    @patch('telegram_bot.services.connect_telegram_account')
+    def test_handle_token_failure(self, mock_connect):
+        """Тест ошибки при обработке токена"""
+        mock_connect.return_value = (False, "Неверный токен")
+        self.update.message.text = "invalid_token"
+
+        result = async_to_sync(self.bot.handle_token)(self.update, self.context)
+
+        self.assertEqual(result, -1)
+        self.update.message.reply_text.assert_called_once()
+
+    def test_cancel_command(self):
+        """Тест команды отмены"""
+        result = async_to_sync(self.bot.cancel)(self.update, self.context)
+        self.assertEqual(result, -1)
+        self.update.message.reply_text.assert_called_once()
+
+
+class TelegramWebhookTest(TestCase):
+    """Тесты для приема обновлений через вебхук в ASGI-приложении"""
+
+    def setUp(self):
+        cache.clear()
+        self.django_app = AsyncMock()
+        self.bot = MagicMock()
+        self.bot.application.initialize = AsyncMock()
+        self.bot.application.start = AsyncMock()
+        self.bot.application.stop = AsyncMock()
+        self.bot.application.shutdown = AsyncMock()
+        self.bot.application.bot = None
+        self.webhook = TelegramWebhook(
+            self.django_app, path='/telegram/webhook/', secret='s3cret', bot_factory=lambda: self.bot, enabled=True
+        )
+
+    def call(self, path='/telegram/webhook/', secret=b's3cret', body=b'{"update_id": 42}', method='POST'):
+        """Запрос к ASGI-приложению; возвращает статус ответа и обновления, попавшие в очередь"""
+        messages = []
+        self.bot.application.update_queue = asyncio.Queue()
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': method, 'path': path, 'headers': [
+            (b'x-telegram-bot-api-secret-token', secret),
+        ]}
+        async_to_sync(self.webhook)(scope, receive, send)
+
+        queued = []
+        while not self.bot.application.update_queue.empty():
+            queued.append(self.bot.application.update_queue.get_nowait())
+        status = messages[0]['status'] if messages else None
+        return status, queued
+
+    def test_update_put_into_application_queue(self):
+        """Тест: обновление с верным секретом уходит в очередь Application, бот запускается один раз"""
+        status, queued = self.call()
+        self.call()
+
+        self.assertEqual(status, 200)
+        self.assertEqual([update.update_id for update in queued], [42])
+        self.bot.application.start.assert_awaited_once()
+
+    def test_wrong_secret_rejected(self):
+        """Тест: без верного секрета обновление не принимается"""
+        self.assertEqual(self.call(secret=b'guess'), (403, []))
+        self.assertEqual(self.call(secret='секрет'.encode()), (403, []))
+        self.bot.application.start.assert_not_awaited()
+
+    def test_bad_requests(self):
+        """Тест: не POST и не JSON — ошибка, в очередь ничего не попадает"""
+        self.assertEqual(self.call(method='GET'), (405, []))
+        self.assertEqual(self.call(body=b'not json'), (400, []))
+
+    def test_other_paths_served_by_django(self):
+        """Тест: остальные запросы обслуживает приложение Django"""
+        self.call(path='/api/habits/')
+        self.django_app.assert_awaited_once()
+
+    def lifespan(self):
+        """Старт и остановка воркера; возвращает отправленные ответы lifespan"""
+        events = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(events)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        async_to_sync(self.webhook)({'type': 'lifespan'}, receive, send)
+        return sent
+
+    def test_lifespan_starts_and_stops_bot(self):
+        """Тест: бот запускается при старте воркера и останавливается при завершении"""
+        self.assertEqual(self.lifespan(), ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        self.bot.application.start.assert_awaited_once()
+        self.bot.application.shutdown.assert_awaited_once()
+
+    def test_webhook_served_by_one_process(self):
+        """Тест: вебхук принимает один процесс — второй воркер не запускает бота, пока жив первый"""
+        second = TelegramWebhook(
+            self.django_app, path='/telegram/webhook/', secret='s3cret', bot_factory=lambda: self.bot, enabled=True
+        )
+
+        async def run():
+            await self.webhook.start()
+            with self.assertRaises(WebhookBusy):
+                await second.start()
+            await self.webhook.stop()
+            await second.start()
+            await second.stop()
+
+        async_to_sync(run)()
+        self.assertEqual(self.bot.application.start.await_count, 2)
+
+        # Второй воркер с вебхуком не стартует вовсе
+        cache.set(OWNER_KEY, 'other-process', OWNER_LEASE)
+        self.assertEqual(self.lifespan(), ['lifespan.startup.failed'])
+        self.assertEqual(self.call()[0], 503)
+
+    @override_settings(TELEGRAM_WEBHOOK_URL='', TELEGRAM_BOT_TOKEN='123:abc', TELEGRAM_WEBHOOK_SECRET='')
+    def test_disabled_without_webhook_url(self):
+        """Тест: без TELEGRAM_WEBHOOK_URL путь вебхука уходит в Django, бот в воркере не запускается"""
+        self.webhook = TelegramWebhook(self.django_app, bot_factory=lambda: self.bot)
+
+        self.assertEqual(self.lifespan(), ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        self.call(secret=b'')
+        self.django_app.assert_awaited_once()
+        self.bot.application.start.assert_not_awaited()
+
+    @override_settings(TELEGRAM_WEBHOOK_URL='https://habits.example.com/telegram/webhook/',
+                       TELEGRAM_BOT_TOKEN='123:abc', TELEGRAM_WEBHOOK_SECRET='')
+    def test_webhook_url_requires_secret(self):
+        """Тест: секрет не выводится из токена — без TELEGRAM_WEBHOOK_SECRET вебхук не включается"""
+        with self.assertRaises(ImproperlyConfigured):
+            TelegramWebhook(self.django_app)
+        with self.assertRaises(ValueError):
+            async_to_sync(HabitBot(token='123:abc').set_webhook)()
+
+
+class ConcurrentUpdatesTest(TestCase):
+    """Тесты для параллельной обработки обновлений с порядком внутри чата"""
+
+    def setUp(self):
+        self.api = FakeTelegramApi(config=FakeApiConfig(latency=0)).start()
+
+    def tearDown(self):
+        self.api.stop()
+
+    def run_updates(self, updates, workers, flood_guard=None):
+        """Прогнать обновления через Application; журнал начала и конца обработки каждого"""
+
+        events = []
+        builder = Application.builder().token('test_token').base_url(self.api.base_url)
+        application = configure_concurrency(builder, workers, flood_guard).build()
+
+        async def slow_handler(update, context):
+            events.append(('start', update.effective_chat.id, update.update_id))
+            await asyncio.sleep(0.02)
+            events.append(('end', update.effective_chat.id, update.update_id))
+
+        application.add_handler(TypeHandler(Update, slow_handler))
+
+        async def run():
+            await application.initialize()
+            await application.start()
+            for update_id, chat_id in updates:
+                await application.update_queue.put(Update.de_json({'update_id': update_id, 'message': {
+                    'message_id': update_id, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'}, 'text': 'hi',
+                }}, application.bot))
+            await application.update_queue.join()
+            await application.stop()
+            await application.shutdown()
+
+        async_to_sync(run)()
+        return application, events
+
+    def test_same_chat_in_order_other_chats_concurrently(self):
+        """Тест: обновления одного чата — строго по очереди, разных чатов — одновременно"""
+        updates = [(1, 100), (2, 100), (3, 200), (4, 100), (5, 300)]
+        application, events = self.run_updates(updates, workers=2)
+
+        self.assertIsInstance(application, ChatOrderedApplication)
+        chat_events = [(kind, update_id) for kind, chat_id, update_id in events if chat_id == 100]
+        self.assertEqual(chat_events, [('start', 1), ('end', 1), ('start', 2), ('end', 2), ('start', 4), ('end', 4)])
+
+        running, peak = 0, 0
+        for kind, _, _ in events:
+            running += 1 if kind == 'start' else -1
+            peak = max(peak, running)
+        # Другие чаты не ждут очереди чата 100, но воркеров не больше двух
+        self.assertEqual(peak, 2)
+        self.assertEqual(len(application.chat_locks), 0)
+
+    def test_flooding_chat_dropped_without_stalling_others(self):
+        """Тест: поток из одного чата отбрасывается по приходе, сообщение другого чата не ждет его"""
+        guard = FloodGuard(LocalBucketBackend(), chat_rate=0.01, chat_burst=2, max_delay=1)
+        updates = [(update_id, 100) for update_id in range(1, 301)] + [(301, 200)]
+        started = datetime.now()
+        application, events = self.run_updates(updates, workers=16, flood_guard=guard)
+
+        processed = [update_id for kind, chat_id, update_id in events if kind == 'end' and chat_id == 100]
+        self.assertEqual(processed, [1, 2])
+        self.assertIn(('end', 200, 301), events)
+        self.assertEqual(async_to_sync(guard.stats)()['dropped'], 298)
+        # Отброшенные не спят в ожидании токенов и не держат воркеров
+        self.assertLess((datetime.now() - started).total_seconds(), 1)
+
+    def test_single_worker_keeps_sequential_application(self):
+        """Тест: при TELEGRAM_BOT_CONCURRENCY = 1 обновления обрабатываются по одному, как раньше"""
+        application, events = self.run_updates([(1, 100), (2, 200)], workers=1)
+
+        self.assertNotIsInstance(application, ChatOrderedApplication)
+        self.assertEqual(application.concurrent_updates, 0)
+        self.assertEqual([kind for kind, _, _ in events], ['start', 'end', 'start', 'end'])
+
+    def test_bot_uses_configured_concurrency(self):
+        """Тест: HabitBot берет размер пула из TELEGRAM_BOT_CONCURRENCY"""
+
+        with self.settings(TELEGRAM_BOT_CONCURRENCY=8):
+            bot = HabitBot(token='test_token')
+        self.assertEqual(bot.application.workers, 8)
+
+
+class SharedLocalStateStore(LocalStateStore):
+    """Файл SQLite вместо Redis: две реплики в тесте делят одно хранилище"""
+
+    shared = True
+
+
+class BotPersistenceTest(TestCase):
+    """Тесты для хранения состояний /connect и user_data вне процесса бота"""
+
+    def setUp(self):
+        self.api = FakeTelegramApi(config=FakeApiConfig(latency=0)).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = f'{self.tmp.name}/state.sqlite3'
+
+    def tearDown(self):
+        self.api.stop()
+        self.tmp.cleanup()
+
+    def make_bot(self, store=None):
+        persistence = SharedPersistence(store or LocalStateStore(self.path))
+        with self.settings(TELEGRAM_API_BASE_URL=self.api.base_url), \
+                patch('telegram_bot.bot.build_persistence', return_value=persistence):
+            return HabitBot(token='test_token', concurrency=1)
+
+    def message(self, update_id, text, chat_id=555):
+        data = {'update_id': update_id, 'message': {
+            'message_id': update_id, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Test', 'username': 'tester'}, 'text': text,
+        }}
+        if text.startswith('/'):
+            data['message']['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        return data
+
+    async def process(self, bot, *updates):
+        for data in updates:
+            await bot.application.update_queue.put(Update.de_json(data, bot.application.bot))
+        await bot.application.update_queue.join()
+
+    @patch('telegram_bot.services.connect_telegram_account', new_callable=AsyncMock)
+    def test_conversation_survives_restart(self, mock_connect):
+        """Тест: /connect до перезапуска, токен после — привязка продолжается"""
+        mock_connect.return_value = (True, 'ok')
+
+        async def run():
+            before = self.make_bot()
+            await before.application.initialize()
+            await before.application.start()
+            await self.process(before, self.message(1, '/connect'))
+            await before.application.stop()
+            await before.application.shutdown()
+
+            after = self.make_bot()
+            await after.application.initialize()
+            await after.application.start()
+            self.assertEqual(after.application.user_data[555], {'telegram_chat_id': 555})
+            await self.process(after, self.message(2, 'jwt-token'))
+            await after.application.stop()
+            await after.application.shutdown()
+
+        async_to_sync(run)()
+        mock_connect.assert_awaited_once_with('jwt-token', 555, 'tester')
+
+    @patch('telegram_bot.services.connect_telegram_account', new_callable=AsyncMock)
+    def test_replicas_share_conversation(self, mock_connect):
+        """Тест: /connect пришел в одну реплику, токен — в другую"""
+        mock_connect.return_value = (True, 'ok')
+
+        async def run():
+            first = self.make_bot(SharedLocalStateStore(self.path))
+            second = self.make_bot(SharedLocalStateStore(self.path))
+            for bot in (first, second):
+                await bot.application.initialize()
+                await bot.application.start()
+
+            await self.process(first, self.message(1, '/connect'))
+            await first.application.update_persistence()
+            await self.process(second, self.message(2, 'jwt-token'))
+            # Разговор закончен во второй реплике — первая тоже это видит
+            await second.application.update_persistence()
+            await self.process(first, self.message(3, 'еще текст'))
+
+            for bot in (first, second):
+                await bot.application.stop()
+                await bot.application.shutdown()
+
+        async_to_sync(run)()
+        mock_connect.assert_awaited_once_with('jwt-token', 555, 'tester')
+
+    def test_changes_written_in_one_batch(self):
+        """Тест: изменения одного прогона update_persistence уходят в хранилище одной записью"""
+        store = LocalStateStore(self.path)
+        persistence = SharedPersistence(store)
+
+        async def run():
+            with patch.object(store, 'write', wraps=store.write) as write:
+                await asyncio.gather(
+                    persistence.update_conversation('connect', (1, 1), 1),
+                    persistence.update_conversation('connect', (2, 2), 1),
+                    persistence.update_conversation('connect', (3, 3), 1),
+                    persistence.update_user_data(1, {'telegram_chat_id': 1}),
+                )
+                await persistence.update_conversation('connect', (2, 2), None)
+                # user_data не изменились — повторно не пишутся
+                await persistence.update_user_data(1, {'telegram_chat_id': 1})
+            self.assertEqual(write.await_count, 2)
+
+            restored = SharedPersistence(LocalStateStore(self.path))
+            return await restored.get_conversations('connect'), await restored.get_user_data()
+
+        conversations, user_data = async_to_sync(run)()
+        self.assertEqual(conversations, {(1, 1): 1, (3, 3): 1})
+        self.assertEqual(user_data, {1: {'telegram_chat_id': 1}})
+
+    def test_refresh_reads_state_only_after_version_change(self):
+        """Тест: реплика читает разговор и user_data, только если их записала другая реплика"""
+        first = SharedPersistence(SharedLocalStateStore(self.path))
+        second = SharedPersistence(SharedLocalStateStore(self.path))
+        bot = self.make_bot(SharedLocalStateStore(self.path))
+        handler = bot.conversation
+
+        async def run():
+            await bot.application.initialize()
+            user_data = {}
+            with patch.object(second.store, 'get', wraps=second.store.get) as get:
+                await second.refresh(handler, (555, 555), user_data)
+                await first.update_user_data(555, {'telegram_chat_id': 555})
+                await first.update_conversation('connect', (555, 555), 1)
+                await second.refresh(handler, (555, 555), user_data)
+                await second.refresh(handler, (555, 555), user_data)
+            # Версия — на каждое обновление, само состояние — только после записи первой реплики
+            self.assertEqual(get.await_count, 4)
+            await bot.application.shutdown()
+            return user_data
+
+        self.assertEqual(async_to_sync(run)(), {'telegram_chat_id': 555})
+        self.assertEqual(handler._conversations[(555, 555)], 1)
+
+    def test_conversation_internals_present(self):
+        """Тест: у ConversationHandler есть внутренности, на которые опирается обновление разговора"""
+        bot = self.make_bot()
+
+        async def run():
+            await bot.application.initialize()
+            check_conversation_internals(bot.conversation)
+            await bot.application.shutdown()
+
+        async_to_sync(run)()
+        with self.assertRaises(RuntimeError):
+            check_conversation_internals(MagicMock(_conversations=object()))
+
+
+class FloodGuardTest(TestCase):
+    """Тесты для защиты бота от флуда"""
+
+    def update(self, chat_id, text='/habits', update_id=1):
+        return Update.de_json({'update_id': update_id, 'message': {
+            'message_id': update_id, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'}, 'text': text,
+        }}, None)
+
+    def guard(self, **kwargs):
+        options = {'chat_rate': 1, 'chat_burst': 2, 'global_rate': 1000, 'global_burst': 1000, 'max_delay': 0}
+        options.update(kwargs)
+        return FloodGuard(LocalBucketBackend(), **options)
+
+    def test_chat_flood_dropped_other_chats_pass(self):
+        """Тест: сверх запаса чата обновления отбрасываются, другие чаты не страдают"""
+        guard = self.guard()
+        admitted = [async_to_sync(guard.admit)(self.update(1)) for _ in range(3)]
+        admitted.append(async_to_sync(guard.admit)(self.update(2, text='jwt-token')))
+
+        self.assertEqual(admitted, [True, True, False, True])
+        self.assertEqual(async_to_sync(guard.stats)(), {'passed': 3, 'dropped': 1, 'dropped:/habits': 1})
+
+    def test_global_limit(self):
+        """Тест: общий лимит бота действует на все чаты вместе"""
+        guard = self.guard(chat_burst=10, global_rate=1, global_burst=2)
+        admitted = [async_to_sync(guard.admit)(self.update(chat_id, text='токен')) for chat_id in (1, 2, 3)]
+
+        self.assertEqual(admitted, [True, True, False])
+        self.assertEqual(async_to_sync(guard.stats)()['dropped:text'], 1)
+
+    def test_short_wait_delays_instead_of_dropping(self):
+        """Тест: если токен скоро появится, обновление ждет, а не отбрасывается"""
+        guard = self.guard(chat_rate=50, chat_burst=1, max_delay=0.5)
+        admitted = [async_to_sync(guard.admit)(self.update(1)) for _ in range(2)]
+
+        self.assertEqual(admitted, [True, True])
+        self.assertEqual(async_to_sync(guard.stats)(), {'passed': 2, 'delayed': 1, 'delayed:/habits': 1})
+
+    @patch('telegram_bot.services.get_today_habits', new_callable=AsyncMock)
+    def test_flood_stopped_before_handlers(self, mock_get_habits):
+        """Тест: отброшенные обновления не доходят до обработчиков и запросов к БД"""
+
+        mock_get_habits.return_value = []
+        api = FakeTelegramApi(config=FakeApiConfig(latency=0)).start()
+        self.addCleanup(api.stop)
+        # Ответы в чат идут не чаще раза в секунду — корзина чата за это время почти не пополнится
+        with self.settings(TELEGRAM_API_BASE_URL=api.base_url, TELEGRAM_FLOOD_CHAT_RATE=0.01,
+                           TELEGRAM_FLOOD_CHAT_BURST=2, TELEGRAM_FLOOD_MAX_DELAY=0):
+            bot = HabitBot(token='test_token')
+
+        async def run():
+            application = bot.application
+            await application.initialize()
+            await application.start()
+            for update_id in range(1, 6):
+                await application.update_queue.put(Update.de_json({'update_id': update_id, 'message': {
+                    'message_id': update_id, 'date': 0, 'chat': {'id': 777, 'type': 'private'},
+                    'from': {'id': 777, 'is_bot': False, 'first_name': 'Test'}, 'text': '/habits',
+                    'entities': [{'type': 'bot_command', 'offset': 0, 'length': 7}],
+                }}, application.bot))
+            await application.update_queue.join()
+            await application.stop()
+            await application.shutdown()
+
+        async_to_sync(run)()
+        self.assertEqual(mock_get_habits.await_count, 2)
+        self.assertEqual(async_to_sync(bot.flood_guard.stats)()['dropped:/habits'], 3)
@@ -0,0 +1,318 @@
+import asyncio
+import socket
+from datetime import datetime, time
+from datetime import timezone as dt_timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase, override_settings
+from telegram.error import RetryAfter
+
+from habits.models import Habit
+from telegram_bot.channels import ChannelDispatcher, EmailChannel, WebhookChannel
+from telegram_bot.delivery import DeliveryResult, OutgoingMessage, TelegramSender
+from telegram_bot.fakeapi import FakeApiConfig, FakeTelegramApi
+from telegram_bot.models import NotificationOutbox
+from telegram_bot.outbox import drain_outbox
+from telegram_bot.ratelimit import LocalBucketBackend, SharedRateLimiter, TelegramRateLimiter
+from telegram_bot.reminders import dispatch_due_reminders
+from telegram_bot.sinks import SmtpSink, WebhookReceiver
+from users.models import UserProfile, webhook_url_error
+from users.serializers import UserProfileSerializer
+
+User = get_user_model()
+
+
+class TelegramSenderTest(TestCase):
+    """Тесты для пакетной отправки сообщений"""
+
+    def test_send_batch_reports_each_message(self):
+        """Тест: результат возвращается для каждого сообщения"""
+        sender = TelegramSender(token='test_token', concurrency=2)
+
+        async def send_message(chat_id, text, parse_mode, reply_markup=None):
+            if chat_id == 2:
+                raise Exception('Forbidden: bot was blocked by the user')
+            return MagicMock(message_id=chat_id * 10)
+
+        with patch('telegram_bot.delivery.ExtBot') as bot_class:
+            bot_class.return_value.send_message = AsyncMock(side_effect=send_message)
+            results = sender.send_batch([
+                OutgoingMessage(chat_id=1, text='a'),
+                OutgoingMessage(chat_id=2, text='b'),
+                OutgoingMessage(chat_id=3, text='c'),
+            ])
+
+        self.assertEqual([r.ok for r in results], [True, False, True])
+        self.assertEqual(results[0].message_id, 10)
+        self.assertIn('Forbidden', results[1].error)
+
+    def test_send_batch_bounded_concurrency(self):
+        """Тест: одновременно выполняется не больше concurrency запросов"""
+        sender = TelegramSender(token='test_token', concurrency=3)
+        state = {'in_flight': 0, 'max': 0}
+
+        async def send_message(chat_id, text, parse_mode, reply_markup=None):
+            state['in_flight'] += 1
+            state['max'] = max(state['max'], state['in_flight'])
+            await asyncio.sleep(0.01)
+            state['in_flight'] -= 1
+            return MagicMock(message_id=1)
+
+        with patch('telegram_bot.delivery.ExtBot') as bot_class:
+            bot_class.return_value.send_message = AsyncMock(side_effect=send_message)
+            results = sender.send_batch([OutgoingMessage(chat_id=i, text='x') for i in range(10)])
+
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(state['max'], 3)
+
+
+class FakeTelegramApiTest(TestCase):
+    """Тесты для поддельного Bot API"""
+
+    def setUp(self):
+        self.api = FakeTelegramApi(config=FakeApiConfig(latency=0, rate_403=0.5, seed=1)).start()
+        self.addCleanup(self.api.stop)
+
+    def test_sender_talks_to_fake_api(self):
+        """Тест: отправщик ходит в поддельный API по TELEGRAM_API_BASE_URL, ошибки считаются"""
+        with self.settings(TELEGRAM_API_BASE_URL=self.api.base_url):
+            results = TelegramSender(token='test').send_batch(
+                [OutgoingMessage(chat_id=chat_id, text='x') for chat_id in range(20)]
+            )
+
+        sent = [result for result in results if result.ok]
+        blocked = [result for result in results if result.chat_gone]
+        self.assertEqual(len(sent), self.api.stats.sent)
+        self.assertEqual(len(blocked), self.api.stats.forbidden)
+        self.assertEqual(len(sent) + len(blocked), 20)
+        self.assertTrue(sent and blocked)
+
+
+class NotificationChannelsTest(TestCase):
+    """Тесты для каналов уведомлений: Telegram, почта, вебхук"""
+
+    def test_email_batch_uses_one_smtp_connection(self):
+        """Тест: пакет писем уходит через одно SMTP-соединение, отвергнутый адрес — окончательная ошибка"""
+        sink = SmtpSink(rejected={'gone@example.com'}).start()
+        self.addCleanup(sink.stop)
+        host, port = sink.address
+        channel = EmailChannel(
+            backend='django.core.mail.backends.smtp.EmailBackend', host=host, port=port, timeout=5
+        )
+        messages = [
+            OutgoingMessage(chat_id=None, text='⏰ *Напоминание*\nПить воду', channel='email', address=address)
+            for address in ('a@example.com', 'gone@example.com', 'b@example.com')
+        ]
+
+        results = channel.send_batch(messages)
+
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertTrue(results[1].permanent)
+        self.assertEqual(sink.stats.connections, 1)
+        self.assertEqual([item['to'] for item in sink.stats.messages], [['a@example.com'], ['b@example.com']])
+
+    @override_settings(NOTIFICATION_WEBHOOK_ALLOW_LOCAL=True)
+    def test_webhook_batch_reuses_connection(self):
+        """Тест: вебхуки пакета идут по одному keep-alive соединению"""
+        receiver = WebhookReceiver().start()
+        self.addCleanup(receiver.stop)
+        channel = WebhookChannel(concurrency=1)
+        self.addCleanup(channel.close)
+        messages = [
+            OutgoingMessage(chat_id=None, text=f'Привычка {index}', channel='webhook', address=receiver.url)
+            for index in range(3)
+        ]
+
+        self.assertTrue(all(result.ok for result in channel.send_batch(messages)))
+        self.assertTrue(channel.send_batch(messages[:1])[0].ok)
+
+        self.assertEqual(len(receiver.stats.messages), 4)
+        self.assertEqual(receiver.stats.messages[0]['payload']['text'], 'Привычка 0')
+        self.assertEqual(receiver.stats.connections, 1)
+
+    @override_settings(NOTIFICATION_WEBHOOK_ALLOW_LOCAL=True)
+    def test_webhook_client_error_is_permanent(self):
+        """Тест: 4xx от получателя — окончательная ошибка, 5xx — повторяем"""
+        receiver = WebhookReceiver(status=410).start()
+        self.addCleanup(receiver.stop)
+        channel = WebhookChannel(concurrency=1)
+        self.addCleanup(channel.close)
+        message = OutgoingMessage(chat_id=None, text='x', channel='webhook', address=receiver.url)
+
+        self.assertTrue(channel.send_batch([message])[0].permanent)
+        receiver.status = 503
+        self.assertFalse(channel.send_batch([message])[0].permanent)
+
+    def test_webhook_url_must_be_public_https(self):
+        """Тест: вебхук — только https на публичный адрес, и при сохранении, и при отправке"""
+        self.assertIn('https', webhook_url_error('http://example.com/hook'))
+        for url in ('https://127.0.0.1/hook', 'https://10.0.0.5/hook', 'https://169.254.169.254/latest',
+                    'https://[::1]/hook', 'https://[::ffff:192.168.0.1]/hook', 'https://240.0.0.1/hook',
+                    'https://localhost/hook'):
+            self.assertIn('внутреннюю сеть', webhook_url_error(url), url)
+        # При сохранении DNS не спрашиваем: проверка не блокирует запрос и работает без сети
+        with patch('socket.getaddrinfo', side_effect=AssertionError('DNS при проверке адреса')):
+            self.assertIsNone(webhook_url_error('https://hooks.example.com/habits'))
+
+        user = User.objects.create_user(username='hookuser', password='testpass123')
+        serializer = UserProfileSerializer(
+            user.profile, data={'notification_channel': 'webhook', 'webhook_url': 'https://localhost/hook'},
+            partial=True,
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('webhook_url', serializer.errors)
+
+        # Адрес сохранили раньше, а теперь его имя ведет во внутреннюю сеть — запрос не уходит
+        channel = WebhookChannel(concurrency=1)
+        self.addCleanup(channel.close)
+        message = OutgoingMessage(chat_id=None, text='x', channel='webhook', address='https://hooks.example.com/h')
+        private = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.5', 443))]
+        with patch('telegram_bot.channels.socket.getaddrinfo', return_value=private), \
+                patch.object(httpx.HTTPTransport, 'handle_request') as mock_request:
+            result, = channel.send_batch([message])
+        mock_request.assert_not_called()
+        self.assertFalse(result.ok)
+        self.assertTrue(result.permanent)
+
+    def test_webhook_connects_to_checked_address(self):
+        """Тест: соединение идет на проверенный IP — хост не резолвится второй раз (DNS rebinding)"""
+        channel = WebhookChannel(concurrency=1)
+        self.addCleanup(channel.close)
+        message = OutgoingMessage(chat_id=None, text='x', channel='webhook', address='https://hooks.example.com/h')
+        public = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('93.184.216.34', 443))]
+
+        with patch('telegram_bot.channels.socket.getaddrinfo', return_value=public) as mock_resolve, \
+                patch.object(httpx.HTTPTransport, 'handle_request', return_value=httpx.Response(204)) as mock_request:
+            result, = channel.send_batch([message])
+
+        self.assertTrue(result.ok)
+        mock_resolve.assert_called_once()
+        request = mock_request.call_args.args[0]
+        self.assertEqual(request.url.host, '93.184.216.34')
+        self.assertEqual(request.headers['host'], 'hooks.example.com')
+        self.assertEqual(request.extensions['sni_hostname'], 'hooks.example.com')
+
+    def test_dispatcher_sends_channels_concurrently(self):
+        """Тест: части пакета для разных каналов уходят одновременно, а не одна за другой"""
+        email_started = asyncio.Event()
+
+        async def telegram_batch(messages):
+            # Без параллельной отправки почта начнется только после Telegram — и ожидание не дождется
+            await asyncio.wait_for(email_started.wait(), timeout=1)
+            return [DeliveryResult(message=message, ok=True) for message in messages]
+
+        async def email_batch(messages):
+            email_started.set()
+            return [DeliveryResult(message=message, ok=True) for message in messages]
+
+        telegram, email = MagicMock(), MagicMock()
+        telegram.asend_batch = AsyncMock(side_effect=telegram_batch)
+        email.asend_batch = AsyncMock(side_effect=email_batch)
+        messages = [
+            OutgoingMessage(chat_id=1, text='a'),
+            OutgoingMessage(chat_id=None, text='b', channel='email', address='b@example.com'),
+        ]
+
+        results = async_to_sync(ChannelDispatcher({'telegram': telegram, 'email': email}).asend_batch)(messages)
+
+        self.assertEqual([(result.message.text, result.ok) for result in results], [('a', True), ('b', True)])
+
+    def test_dispatcher_splits_batch_by_channel(self):
+        """Тест: каждый канал получает свою часть пакета, результаты — в исходном порядке"""
+        telegram, email = MagicMock(), MagicMock()
+        for channel in (telegram, email):
+            channel.send_batch.side_effect = lambda messages: [
+                DeliveryResult(message=message, ok=True) for message in messages
+            ]
+        messages = [
+            OutgoingMessage(chat_id=1, text='a'),
+            OutgoingMessage(chat_id=None, text='b', channel='email', address='b@example.com'),
+            OutgoingMessage(chat_id=2, text='c'),
+            OutgoingMessage(chat_id=None, text='d', channel='pigeon', address='?'),
+        ]
+
+        results = ChannelDispatcher({'telegram': telegram, 'email': email}).send_batch(messages)
+
+        self.assertEqual([result.message.text for result in results], ['a', 'b', 'c', 'd'])
+        self.assertEqual([result.ok for result in results], [True, True, True, False])
+        self.assertTrue(results[3].permanent)
+        self.assertEqual(telegram.send_batch.call_count, 1)
+        self.assertEqual(len(telegram.send_batch.call_args.args[0]), 2)
+
+    def test_reminder_goes_to_profile_channel(self):
+        """Тест: напоминание уходит в канал из профиля, даже без привязанного Telegram"""
+        user = User.objects.create_user(username='mailuser', email='mail@example.com', password='testpass123')
+        UserProfile.objects.filter(user=user).update(notification_channel='email')
+        habit = Habit.objects.create(user=user, place='Дом', time=time(7, 0), action='Пить воду')
+        Habit.objects.filter(pk=habit.pk).update(next_due_at=datetime(2026, 3, 2, 7, 0, tzinfo=dt_timezone.utc))
+
+        self.assertEqual(dispatch_due_reminders(datetime(2026, 3, 2, 6, 55, 30, tzinfo=dt_timezone.utc)), (1, 1))
+        row = NotificationOutbox.objects.get()
+        self.assertEqual((row.channel, row.address, row.chat_id), ('email', 'mail@example.com', None))
+
+        drain_outbox(ChannelDispatcher({'email': EmailChannel()}))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['mail@example.com'])
+        self.assertIn('Пить воду', mail.outbox[0].body)
+        self.assertEqual(NotificationOutbox.objects.get().status, 'sent')
+
+
+class TelegramRateLimiterTest(TestCase):
+    """Тесты для ограничителя частоты запросов"""
+
+    def setUp(self):
+        self.backend = LocalBucketBackend()
+        self.limiter = TelegramRateLimiter(self.backend, global_rate=30, chat_rate=1)
+
+    def test_chat_bucket_limits_same_chat(self):
+        """Тест: второе сообщение в тот же чат придется подождать"""
+        buckets = self.limiter._buckets(1)
+        self.assertEqual(async_to_sync(self.backend.take)('blocked', buckets), 0)
+        self.assertGreater(async_to_sync(self.backend.take)('blocked', buckets), 0)
+        # Другой чат при этом не ждет
+        self.assertEqual(async_to_sync(self.backend.take)('blocked', self.limiter._buckets(2)), 0)
+
+    def test_retry_after_blocks_and_slows_down(self):
+        """Тест: после RetryAfter отправка блокируется, а темп снижается"""
+        async_to_sync(self.limiter.retry_after)(5, chat_id=1)
+        # Второй RetryAfter за ту же блокировку (другой воркер) темп не снижает еще раз
+        async_to_sync(self.limiter.retry_after)(5, chat_id=2)
+
+        self.assertEqual(async_to_sync(self.limiter.rate_factor)(), 0.5)
+        wait = async_to_sync(self.backend.take)('tg:rate:blocked', self.limiter._buckets(3))
+        self.assertGreater(wait, 4)
+
+    def test_slowdown_is_shared_and_recovers_over_time(self):
+        """Тест: сниженный темп видят все ограничители с общим бэкендом, и он восстанавливается со временем"""
+        other = TelegramRateLimiter(self.backend, global_rate=30, chat_rate=1)
+        now = 1000.0
+        with patch('telegram_bot.ratelimit.time.monotonic', side_effect=lambda: now):
+            async_to_sync(self.limiter.retry_after)(1)
+            now += 1
+            self.assertEqual(async_to_sync(other.rate_factor)(), 0.5)
+            # Общая корзина сжалась до половины: 15 сообщений сразу, 16-е ждет
+            waits = [async_to_sync(self.backend.take)('tg:rate:blocked', other._buckets(None)) for _ in range(16)]
+            self.assertEqual(waits[:15], [0] * 15)
+            self.assertGreater(waits[15], 0)
+
+            now += 10
+            self.assertAlmostEqual(async_to_sync(other.rate_factor)(), 0.7)
+            now += 60
+            self.assertEqual(async_to_sync(other.rate_factor)(), 1.0)
+
+    def test_shared_rate_limiter_retries_after_retry_after(self):
+        """Тест: запрос повторяется после RetryAfter"""
+        rate_limiter = SharedRateLimiter(self.limiter, max_retries=2)
+        callback = AsyncMock(side_effect=[RetryAfter(0), {'ok': True}])
+
+        result = async_to_sync(rate_limiter.process_request)(
+            callback, (), {}, 'sendMessage', {'chat_id': 1}, None
+        )
+
+        self.assertEqual(result, {'ok': True})
+        self.assertEqual(callback.call_count, 2)
@@ -0,0 +1,181 @@
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from telegram.error import BadRequest, Forbidden, TimedOut
+
+from habits.clock import SimulatedClock, use_clock
+from telegram_bot.delivery import CircuitBreaker, DeliveryResult, OutgoingMessage, TelegramSender, classify_error
+from telegram_bot.models import DeadLetter, NotificationOutbox
+from telegram_bot.outbox import (
+    adrain_outbox,
+    claim_batch,
+    drain_outbox,
+    enqueue_messages,
+    record_results,
+    schedule_drains,
+)
+from users.models import UserProfile
+
+User = get_user_model()
+
+
+class DeliveryFailuresTest(TestCase):
+    """Тесты для повторов, недоставленных сообщений и отключения чатов"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = UserProfile.objects.get(user=self.user)
+        self.profile.telegram_chat_id = 111
+        self.profile.save()
+
+    def test_classify_error(self):
+        """Тест: Forbidden — окончательная ошибка, таймаут — временная"""
+        message = OutgoingMessage(chat_id=111, text='x')
+
+        self.assertTrue(classify_error(message, Forbidden('bot was blocked by the user')).chat_gone)
+        self.assertTrue(classify_error(message, BadRequest('Chat not found')).chat_gone)
+        self.assertFalse(classify_error(message, BadRequest("Can't parse entities")).chat_gone)
+        self.assertFalse(classify_error(message, TimedOut()).permanent)
+
+    def test_record_results(self):
+        """Тест: временные ошибки — обратно в очередь, окончательные — в недоставленные с отключением чата"""
+        enqueue_messages([OutgoingMessage(chat_id=chat_id, text='x') for chat_id in (1, 111, 222)])
+        rows = claim_batch()
+        outcomes = {
+            1: DeliveryResult(message=None, ok=True),
+            111: classify_error(None, Forbidden('bot was blocked by the user')),
+            222: classify_error(None, TimedOut()),
+        }
+        now = timezone.now()
+
+        self.assertEqual(record_results(rows, [outcomes[row.chat_id] for row in rows], now), (1, 1, 1))
+
+        self.profile.refresh_from_db()
+        self.assertFalse(self.profile.notifications_enabled)
+        self.assertEqual(DeadLetter.objects.get().chat_id, 111)
+        statuses = dict(NotificationOutbox.objects.values_list('chat_id', 'status'))
+        self.assertEqual(statuses, {1: 'sent', 111: 'dead', 222: 'pending'})
+        retry = NotificationOutbox.objects.get(chat_id=222)
+        self.assertEqual(retry.next_attempt_at, now + timedelta(seconds=30))
+
+    def test_last_attempt_goes_to_dead_letters(self):
+        """Тест: после последней попытки сообщение попадает в недоставленные"""
+        enqueue_messages([OutgoingMessage(chat_id=222, text='later')])
+        NotificationOutbox.objects.update(attempts=2)
+        rows = claim_batch()
+
+        with self.settings(TELEGRAM_RETRY_MAX_ATTEMPTS=3):
+            record_results(rows, [classify_error(None, TimedOut())])
+
+        self.assertEqual(NotificationOutbox.objects.get().status, 'dead')
+        self.assertEqual(DeadLetter.objects.get().attempts, 3)
+
+    def test_circuit_breaker_opens_after_failures(self):
+        """Тест: предохранитель срабатывает после серии ошибок"""
+        breaker = CircuitBreaker(threshold=3, cooldown=60)
+        for _ in range(3):
+            breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+
+        breaker.opened_at -= 61
+        self.assertFalse(breaker.is_open)
+
+    def test_outage_longer_than_retry_budget(self):
+        """Тест: сбой Telegram дольше всех повторов не отправляет напоминания в недоставленные"""
+        start = timezone.now()
+        clock = SimulatedClock(start)
+        outage = {'until': start + timedelta(minutes=20)}
+        enqueue_messages([OutgoingMessage(chat_id=chat_id, text='x') for chat_id in range(1, 6)], not_before=start)
+
+        async def send_message(chat_id, text, parse_mode, reply_markup=None):
+            if clock.now() < outage['until']:
+                raise TimedOut()
+            return MagicMock(message_id=chat_id)
+
+        def monotonic():
+            return (clock.now() - start).total_seconds()
+
+        with self.settings(TELEGRAM_CIRCUIT_BREAKER_THRESHOLD=3, TELEGRAM_CIRCUIT_BREAKER_COOLDOWN=60), \
+                use_clock(clock), patch('telegram_bot.delivery.time.monotonic', side_effect=monotonic), \
+                patch('telegram_bot.delivery.ExtBot') as bot_class:
+            bot_class.return_value.send_message = AsyncMock(side_effect=send_message)
+            sender = TelegramSender(token='test_token')
+            for _ in range(25 * 6):
+                drain_outbox(sender)
+                clock.advance(timedelta(seconds=10))
+
+        self.assertFalse(DeadLetter.objects.exists())
+        self.assertEqual(NotificationOutbox.objects.filter(status='sent').count(), 5)
+        # Пока предохранитель открыт, в Telegram уходит только пробный запрос раз в cooldown
+        self.assertLess(bot_class.return_value.send_message.call_count, 3 + 20 + 5 + 1)
+        self.assertLessEqual(max(NotificationOutbox.objects.values_list('attempts', flat=True)), 3)
+
+
+class NotificationOutboxTest(TestCase):
+    """Тесты для очереди уведомлений"""
+
+    def setUp(self):
+        enqueue_messages([OutgoingMessage(chat_id=chat_id, text='x') for chat_id in range(5)])
+
+    def test_claimed_rows_are_not_claimed_again(self):
+        """Тест: забранные строки не достаются второму воркеру, пока не истекла аренда"""
+        first = claim_batch(limit=3)
+        second = claim_batch(limit=3)
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({row.id for row in first} & {row.id for row in second})
+        self.assertEqual(claim_batch(), [])
+
+        # Воркер упал — после аренды строки снова доступны
+        later = timezone.now() + timedelta(seconds=301)
+        self.assertEqual(len(claim_batch(now=later)), 5)
+
+    def test_drain_outbox_sends_everything(self):
+        """Тест: разбор очереди порциями до конца"""
+        sender = MagicMock()
+        sender.send_batch.side_effect = lambda messages: [
+            DeliveryResult(message=message, ok=True) for message in messages
+        ]
+
+        self.assertEqual(drain_outbox(sender, batch_size=2), (5, 5))
+        self.assertEqual(sender.send_batch.call_count, 3)
+        self.assertFalse(NotificationOutbox.objects.exclude(status='sent').exists())
+        self.assertFalse(NotificationOutbox.objects.filter(sent_at__isnull=True).exists())
+
+    def test_async_drain_is_capped(self):
+        """Тест: демон разбирает не больше max_batches порций за раз"""
+        sender = MagicMock()
+        sender.asend_batch = AsyncMock(side_effect=lambda messages: [
+            DeliveryResult(message=message, ok=True) for message in messages
+        ])
+
+        self.assertEqual(async_to_sync(adrain_outbox)(sender, batch_size=2, max_batches=2), 4)
+        self.assertEqual(sender.asend_batch.call_count, 2)
+        self.assertEqual(NotificationOutbox.objects.filter(status='pending').count(), 1)
+
+    @patch('telegram_bot.tasks.drain_notification_outbox.apply_async')
+    def test_schedule_drains_by_volume(self, mock_apply_async):
+        """Тест: число параллельных задач разбора зависит от объема очереди"""
+        with self.settings(OUTBOX_BATCH_SIZE=100, OUTBOX_MAX_PARALLEL_DRAINS=4):
+            self.assertEqual(schedule_drains(150), 2)
+            self.assertEqual(schedule_drains(10000, queue='bulk', kind='digest'), 4)
+        self.assertEqual(mock_apply_async.call_count, 6)
+        self.assertEqual(mock_apply_async.call_args_list[0].kwargs, {'kwargs': {'kind': 'reminder'}, 'queue': None})
+        self.assertEqual(mock_apply_async.call_args.kwargs, {'kwargs': {'kind': 'digest'}, 'queue': 'bulk'})
+
+    def test_reminder_drain_skips_digests(self):
+        """Тест: разбор напоминаний не берет сводки, а разбор сводок — напоминания"""
+        enqueue_messages([OutgoingMessage(chat_id=chat_id, text='📊') for chat_id in range(3)], kind='digest')
+
+        reminders = claim_batch(kind=NotificationOutbox.KIND_REMINDER)
+        digests = claim_batch(kind=NotificationOutbox.KIND_DIGEST)
+
+        self.assertEqual({row.kind for row in reminders}, {'reminder'})
+        self.assertEqual(len(reminders), 5)
+        self.assertEqual({row.kind for row in digests}, {'digest'})
+        self.assertEqual(len(digests), 3)
@@ -0,0 +1,537 @@
+import asyncio
+import json
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config.celery import app as celery_app
+from habits.clock import SimulatedClock, use_clock
+from habits.models import Habit, HabitCompletion
+from telegram_bot.bot import HabitBot
+from telegram_bot.channels import plain_text
+from telegram_bot.completions import LocalCompletionBuffer, buffer_completion, flush_completions, get_completion_buffer
+from telegram_bot.digest import dispatch_daily_digests
+from telegram_bot.management.commands.run_celery import Command as RunCeleryCommand
+from telegram_bot.models import NotificationOutbox, ReminderDispatch, ReminderWatermark
+from telegram_bot.planner import jitter_seconds
+from telegram_bot.pubsub import LocalChannel
+from telegram_bot.queues import queue_stats
+from telegram_bot.reminders import (
+    claim_minutes,
+    dispatch_due_reminders,
+    get_due_habits,
+    get_reminder_texts,
+    reminder_text_key,
+)
+from telegram_bot.scheduler import ReminderDaemon, TimingWheel, load_schedule_rows
+from telegram_bot.simulator import run_simulation
+from telegram_bot.snooze import drain_snoozed_reminders, next_snooze_due, snooze_reminder
+from telegram_bot.tasks import send_habit_reminders
+from users.models import UserProfile
+
+User = get_user_model()
+
+
+class TelegramTasksTest(TestCase):
+    """Тесты для задач Celery"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.profile = UserProfile.objects.get(user=self.user)
+        self.profile.telegram_chat_id = 123456789
+        self.profile.notifications_enabled = True
+        self.profile.save()
+
+    def test_send_habit_reminders_no_habits(self):
+        """Тест отправки напоминаний когда нет привычек"""
+        result = send_habit_reminders()
+        self.assertIn('Нет привычек', result)
+
+    def test_get_due_habits_by_reminder_minute(self):
+        """Тест выбора привычек по минуте напоминания и сроку выполнения"""
+        habit = Habit.objects.create(
+            user=self.user, place='Дом', time=time(7, 0), action='Пить воду', frequency=7
+        )
+        Habit.objects.create(
+            user=self.user, place='Дом', time=time(7, 0), action='Ванна', is_pleasant=True
+        )
+        fire_at = habit.next_due_at - timedelta(minutes=5)
+
+        self.assertEqual(list(get_due_habits([fire_at])), [habit])
+        self.assertEqual(list(get_due_habits([fire_at + timedelta(minutes=5)])), [])
+        # Привычка раз в неделю не напоминает на следующий день
+        self.assertEqual(list(get_due_habits([fire_at + timedelta(days=1)])), [])
+
+
+class ReminderDispatchTest(TestCase):
+    """Тесты для отметки обработки и журнала напоминаний"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = UserProfile.objects.get(user=self.user)
+        self.profile.telegram_chat_id = 123456789
+        self.profile.save()
+        self.habit = Habit.objects.create(
+            user=self.user, place='Дом', time=time(7, 0), action='Пить воду'
+        )
+        self.now = datetime(2026, 3, 2, 6, 50, 30, tzinfo=dt_timezone.utc)
+        Habit.objects.filter(pk=self.habit.pk).update(next_due_at=datetime(2026, 3, 2, 7, 0, tzinfo=dt_timezone.utc))
+
+    def test_late_beat_catches_up_missed_minutes(self):
+        """Тест: опоздавший запуск догоняет пропущенные минуты"""
+        dispatch_due_reminders(self.now)
+
+        found, queued = dispatch_due_reminders(self.now + timedelta(minutes=7))
+
+        self.assertEqual((found, queued), (1, 1))
+        message = NotificationOutbox.objects.get()
+        self.assertEqual(message.chat_id, 123456789)
+        self.assertIn('Пить воду', message.text)
+
+    def test_overlapping_runs_do_not_duplicate(self):
+        """Тест: повторный запуск за ту же минуту ничего не отправляет"""
+        reminder_at = self.now.replace(minute=55)
+
+        self.assertEqual(dispatch_due_reminders(reminder_at), (1, 1))
+        self.assertEqual(dispatch_due_reminders(reminder_at), (0, 0))
+        self.assertEqual(ReminderDispatch.objects.count(), 1)
+
+    def test_ledger_blocks_resend_of_same_minute(self):
+        """Тест: журнал не дает отправить напоминание дважды даже при сбросе отметки"""
+        reminder_at = self.now.replace(minute=55)
+        dispatch_due_reminders(reminder_at)
+
+        ReminderWatermark.objects.update(last_minute=reminder_at.replace(second=0) - timedelta(minutes=10))
+
+        self.assertEqual(dispatch_due_reminders(reminder_at), (1, 0))
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_ledger_rolled_back_when_enqueue_fails(self):
+        """Тест: если очередь не записалась, журнал тоже откатывается и напоминание можно повторить"""
+
+        reminder_at = self.now.replace(minute=55)
+        with patch('telegram_bot.reminders.enqueue_messages', side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError):
+                dispatch_due_reminders(reminder_at)
+        self.assertFalse(ReminderDispatch.objects.exists())
+
+        ReminderWatermark.objects.update(last_minute=reminder_at.replace(second=0) - timedelta(minutes=10))
+        self.assertEqual(dispatch_due_reminders(reminder_at), (1, 1))
+
+    def _add_same_minute_habits(self, count):
+        for index in range(count):
+            habit = Habit.objects.create(user=self.user, place='Кухня', time=time(7, 0), action=f'Дело {index}')
+            Habit.objects.filter(pk=habit.pk).update(next_due_at=datetime(2026, 3, 2, 7, 0, tzinfo=dt_timezone.utc))
+
+    def test_same_minute_habits_coalesced_per_chat(self):
+        """Тест: привычки одного чата в одну минуту уходят одним сообщением"""
+        self._add_same_minute_habits(2)
+
+        found, queued = dispatch_due_reminders(self.now.replace(minute=55))
+
+        self.assertEqual((found, queued), (3, 1))
+        message = NotificationOutbox.objects.get()
+        self.assertIn('Пить воду', message.text)
+        self.assertIn('Дело 1', message.text)
+        # По ряду кнопок «Выполнено» / «Отложить» на каждую привычку
+        self.assertEqual(len(message.buttons), 3)
+        self.assertEqual(message.buttons[0][0][1], f'done:{self.habit.pk}:20260302')
+        self.assertEqual(message.buttons[0][1][1], f'snooze:{self.habit.pk}:20260302')
+
+    def test_coalesced_message_split_by_cap(self):
+        """Тест: сообщение делится, если привычек больше REMINDER_MAX_HABITS_PER_MESSAGE"""
+        self._add_same_minute_habits(4)
+
+        with self.settings(REMINDER_MAX_HABITS_PER_MESSAGE=2):
+            found, queued = dispatch_due_reminders(self.now.replace(minute=55))
+
+        self.assertEqual((found, queued), (5, 3))
+
+    def test_coalesced_message_escapes_habit_markdown(self):
+        """Тест: символы разметки в названии привычки экранируются — Telegram не отклонит сообщение"""
+        habit = Habit.objects.create(
+            user=self.user, place='Офис `A`', time=time(7, 0), action='Читать *Войну_и_мир* [гл. 1]'
+        )
+        Habit.objects.filter(pk=habit.pk).update(next_due_at=datetime(2026, 3, 2, 7, 0, tzinfo=dt_timezone.utc))
+
+        dispatch_due_reminders(self.now.replace(minute=55))
+
+        message = NotificationOutbox.objects.get()
+        self.assertEqual(message.parse_mode, 'Markdown')
+        self.assertIn(r'Читать \*Войну\_и\_мир\* \[гл. 1]', message.text)
+        self.assertIn(r'Офис \`A\`', message.text)
+        # В письме остается исходный текст привычки
+        self.assertIn('Читать *Войну_и_мир* [гл. 1]', plain_text(message.text))
+        self.assertIn('Офис `A`', plain_text(message.text))
+
+    def test_smoothing_spreads_hot_minute(self):
+        """Тест: при сглаживании пиковая минута растягивается на окно с постоянным сдвигом для чата"""
+        for index in range(3):
+            user = User.objects.create_user(username=f'user{index}', password='testpass123')
+            UserProfile.objects.filter(user=user).update(telegram_chat_id=1000 + index)
+            habit = Habit.objects.create(user=user, place='Дом', time=time(7, 0), action=f'Дело {index}')
+            Habit.objects.filter(pk=habit.pk).update(next_due_at=datetime(2026, 3, 2, 7, 0, tzinfo=dt_timezone.utc))
+        reminder_at = self.now.replace(minute=55, second=0)
+
+        with self.settings(REMINDER_SMOOTHING_ENABLED=True, REMINDER_SMOOTHING_THRESHOLD=2,
+                           REMINDER_SMOOTHING_WINDOW_SECONDS=120):
+            with use_clock(SimulatedClock(reminder_at)):
+                self.assertEqual(dispatch_due_reminders(reminder_at), (4, 4))
+
+        for row in NotificationOutbox.objects.all():
+            self.assertEqual(row.next_attempt_at, reminder_at + timedelta(seconds=jitter_seconds(row.chat_id, 120)))
+        self.assertGreater(len(set(NotificationOutbox.objects.values_list('next_attempt_at', flat=True))), 1)
+
+    def test_midnight_habit_reminded_every_day(self):
+        """Тест: привычка в 00:00 MSK (напоминание накануне в 23:55) не пропускается на второй день"""
+        Habit.objects.filter(pk=self.habit.pk).update(
+            time=time(21, 0), reminder_minute=20 * 60 + 55,
+            next_due_at=datetime(2026, 3, 1, 21, 0, tzinfo=dt_timezone.utc),
+        )
+        first = datetime(2026, 3, 1, 20, 55, 30, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(dispatch_due_reminders(first)[0], 1)
+        self.assertEqual(dispatch_due_reminders(first + timedelta(days=1))[0], 1)
+
+    def test_reminder_texts_cached_and_invalidated_on_save(self):
+        """Тест: тексты берутся из кеша без рендеринга и сбрасываются при изменении привычки"""
+        cache.clear()
+        habit = Habit.objects.get(pk=self.habit.pk)
+        items = [(habit, datetime(2026, 3, 2, 7, 0, tzinfo=dt_timezone.utc))]
+        get_reminder_texts(items)
+
+        with patch('telegram_bot.reminders.render_reminder') as mock_render:
+            texts = get_reminder_texts(items)
+        mock_render.assert_not_called()
+        self.assertIn('10:00', texts[habit.pk][0])
+
+        habit.action = 'Зарядка'
+        with self.captureOnCommitCallbacks(execute=True):
+            habit.save()
+        self.assertIsNone(cache.get(reminder_text_key(habit.pk)))
+        self.assertIn('Зарядка', get_reminder_texts([(habit, items[0][1])])[habit.pk][0])
+
+    def test_claim_minutes_caps_catch_up(self):
+        """Тест: после долгого простоя догоняем не больше REMINDER_MAX_CATCHUP_MINUTES"""
+        claim_minutes(self.now)
+        with self.settings(REMINDER_MAX_CATCHUP_MINUTES=10):
+            minutes = claim_minutes(self.now + timedelta(hours=5))
+        self.assertEqual(len(minutes), 10)
+
+
+class ReminderSimulationTest(TestCase):
+    """Тесты для подменных часов и симулятора рассылки"""
+
+    def test_clock_injection_drives_dispatch(self):
+        """Тест: рассылка без явного now берет время из подмененных часов"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        UserProfile.objects.filter(user=user).update(telegram_chat_id=123456789)
+        habit = Habit.objects.create(user=user, place='Дом', time=time(7, 0), action='Пить воду')
+        Habit.objects.filter(pk=habit.pk).update(next_due_at=datetime(2026, 3, 2, 7, 0, tzinfo=dt_timezone.utc))
+        simulated = SimulatedClock(datetime(2026, 3, 2, 6, 54, 30, tzinfo=dt_timezone.utc))
+
+        with use_clock(simulated):
+            self.assertEqual(dispatch_due_reminders(), (0, 0))
+            simulated.advance(timedelta(minutes=1))
+            self.assertEqual(dispatch_due_reminders(), (1, 1))
+
+        self.assertEqual(NotificationOutbox.objects.get().next_attempt_at, simulated.now())
+
+    def test_simulation_matches_expected_and_rolls_back(self):
+        """Тест: сутки симуляции — все напоминания в свои минуты, данные откатываются"""
+        start = datetime(2026, 3, 2, tzinfo=dt_timezone.utc)
+
+        report = run_simulation(start, days=1, habits=40, speed=0)
+
+        self.assertTrue(report.expected)
+        self.assertEqual(report.missing, [])
+        self.assertEqual(report.unexpected, [])
+        self.assertEqual(sum(report.reminders.values()), len(report.expected))
+        self.assertFalse(Habit.objects.exists())
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+
+class ReminderDaemonTest(TestCase):
+    """Тесты для демона напоминаний с расписанием в памяти"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = UserProfile.objects.get(user=self.user)
+        self.profile.telegram_chat_id = 123456789
+        self.profile.save()
+        self.habit = Habit.objects.create(
+            user=self.user, place='Дом', time=time(7, 0), action='Пить воду'
+        )
+        Habit.objects.filter(pk=self.habit.pk).update(next_due_at=datetime(2026, 3, 2, 7, 0, tzinfo=dt_timezone.utc))
+        self.sender = MagicMock()
+        self.sender.asend_batch = AsyncMock(side_effect=lambda messages: [MagicMock(ok=True) for _ in messages])
+        self.daemon = ReminderDaemon(sender=self.sender, channel=MagicMock())
+        async_to_sync(self.daemon.reload)()
+
+    def test_timing_wheel_add_move_remove(self):
+        """Тест: привычка переезжает между минутами и удаляется из расписания"""
+        wheel = TimingWheel()
+        wheel.add(1, 415)
+        wheel.add(1, 420)
+        self.assertEqual(wheel.slot(415), set())
+        self.assertEqual(wheel.slot(420), {1})
+        wheel.remove(1)
+        self.assertEqual((wheel.slot(420), len(wheel)), (set(), 0))
+
+    def test_empty_minute_does_not_query_database(self):
+        """Тест: в минуту без напоминаний демон не ходит в БД"""
+        minute = datetime(2026, 3, 2, 6, 54, tzinfo=dt_timezone.utc)
+        with self.assertNumQueries(0):
+            self.assertEqual(async_to_sync(self.daemon.fire)([minute]), 0)
+        self.sender.asend_batch.assert_not_called()
+
+    def test_fire_sends_once_shared_ledger(self):
+        """Тест: демон отправляет напоминание, а задача Celery за ту же минуту уже нет"""
+        minute = datetime(2026, 3, 2, 6, 55, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(async_to_sync(self.daemon.fire)([minute]), 1)
+        message = self.sender.asend_batch.call_args.args[0][0]
+        self.assertIn('Пить воду', message.text)
+
+        self.assertEqual(dispatch_due_reminders(minute), (1, 0))
+        self.assertEqual(NotificationOutbox.objects.get().status, 'sent')
+
+    def test_change_during_startup_load_is_not_lost(self):
+        """Тест: изменение, опубликованное, пока демон читает расписание, применяется после загрузки"""
+
+        channel = LocalChannel()
+        daemon = ReminderDaemon(sender=self.sender, channel=channel)
+
+        def load_while_habit_changes():
+            rows = load_schedule_rows()
+            channel.publish({'habit_id': self.habit.id, 'reminder_minute': 600})
+            return rows
+
+        async def start_and_stop():
+            stop = asyncio.Event()
+            task = asyncio.create_task(daemon.run(stop))
+            for _ in range(200):
+                if daemon.wheel.slot(600):
+                    break
+                await asyncio.sleep(0.01)
+            stop.set()
+            await task
+
+        with patch('telegram_bot.scheduler.load_schedule_rows', side_effect=load_while_habit_changes):
+            async_to_sync(start_and_stop)()
+
+        self.assertEqual(daemon.wheel.slot(600), {self.habit.id})
+        self.assertEqual(daemon.wheel.slot(415), set())
+
+    def test_fire_rolls_back_ledger_when_enqueue_fails(self):
+        """Тест: демон пишет журнал и очередь одной транзакцией"""
+
+        minute = datetime(2026, 3, 2, 6, 55, tzinfo=dt_timezone.utc)
+        with patch('telegram_bot.scheduler.enqueue_messages', side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError):
+                async_to_sync(self.daemon.fire)([minute])
+        self.assertFalse(ReminderDispatch.objects.exists())
+
+    def test_published_changes_update_wheel(self):
+        """Тест: сохранение и удаление привычки публикуются и меняют расписание"""
+        with patch('telegram_bot.signals.publish_schedule_change') as mock_publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.habit.time = time(8, 0)
+                self.habit.save()
+            mock_publish.assert_called_once_with(self.habit.pk, 475)
+
+        self.daemon.apply_change({'habit_id': self.habit.pk, 'reminder_minute': 475})
+        self.assertEqual(self.daemon.wheel.slot(415), set())
+        self.assertEqual(self.daemon.wheel.slot(475), {self.habit.pk})
+
+        self.daemon.apply_change({'habit_id': self.habit.pk, 'reminder_minute': None})
+        self.assertEqual(len(self.daemon.wheel), 0)
+
+
+class SnoozedReminderTest(TestCase):
+    """Тесты для отложенных напоминаний"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        UserProfile.objects.filter(user=self.user).update(telegram_chat_id=123456789)
+        self.habit = Habit.objects.create(user=self.user, place='Дом', time=time(7, 0), action='Пить воду')
+        self.now = datetime(2026, 3, 2, 6, 56, tzinfo=dt_timezone.utc)
+
+    def test_snoozed_reminder_sent_after_delay(self):
+        """Тест: отложенное напоминание уходит в очередь только после срока"""
+        due_at = snooze_reminder(123456789, self.habit.pk, self.now.date(), now=self.now)
+
+        self.assertEqual(due_at, self.now + timedelta(minutes=10))
+        self.assertEqual(next_snooze_due(), due_at)
+        self.assertEqual(drain_snoozed_reminders(self.now + timedelta(minutes=5)), 0)
+
+        self.assertEqual(drain_snoozed_reminders(due_at), 1)
+        message = NotificationOutbox.objects.get()
+        self.assertIn('Пить воду', message.text)
+        self.assertEqual(message.buttons[0][1][1], f'snooze:{self.habit.pk}:20260302')
+        self.assertIsNone(next_snooze_due())
+
+    def test_cannot_snooze_foreign_habit(self):
+        """Тест: чужую привычку отложить нельзя"""
+        self.assertIsNone(snooze_reminder(999, self.habit.pk, self.now.date(), now=self.now))
+        self.assertIsNone(next_snooze_due())
+
+    def test_done_button_marks_completion(self):
+        """Тест: кнопка «Выполнено» отмечает привычку и убирает ее кнопки"""
+
+        update = MagicMock()
+        update.effective_chat.id = 123456789
+        query = update.callback_query
+        query.data = f'done:{self.habit.pk}:20260302'
+        query.answer = AsyncMock()
+        query.edit_message_reply_markup = AsyncMock()
+        query.message.reply_markup = InlineKeyboardMarkup([[
+            InlineKeyboardButton('✅', callback_data=query.data),
+            InlineKeyboardButton('⏰', callback_data=f'snooze:{self.habit.pk}:20260302'),
+        ]])
+
+        get_completion_buffer().take()
+        with self.assertNumQueries(0):
+            async_to_sync(HabitBot(token='test_token').reminder_button)(update, MagicMock())
+        query.answer.assert_awaited_once()
+        query.edit_message_reply_markup.assert_awaited_once_with(None)
+
+        # В базу нажатие попадает при сбросе буфера
+        self.assertFalse(HabitCompletion.objects.exists())
+        self.assertEqual(flush_completions(), 1)
+        completion = HabitCompletion.objects.get(habit=self.habit)
+        self.assertTrue(completion.is_completed)
+        self.assertEqual(str(completion.completion_date), '2026-03-02')
+
+    def test_completion_buffer_flushed_in_bulk(self):
+        """Тест: повторные и чужие нажатия отбрасываются, число запросов сброса не зависит от числа нажатий"""
+        buffer = LocalCompletionBuffer()
+        habits = [self.habit] + [
+            Habit.objects.create(user=self.user, place='Дом', time=time(8, index), action=f'Дело {index}')
+            for index in range(5)
+        ]
+        day = self.now.date()
+
+        async_to_sync(buffer_completion)(123456789, habits[0].pk, day, buffer)
+        with use_clock(SimulatedClock(self.now)), CaptureQueriesContext(connection) as single:
+            flush_completions(buffer)
+
+        for habit in habits[1:]:
+            async_to_sync(buffer_completion)(123456789, habit.pk, day, buffer)
+            async_to_sync(buffer_completion)(123456789, habit.pk, day, buffer)
+        async_to_sync(buffer_completion)(999, habits[0].pk, day, buffer)
+        with use_clock(SimulatedClock(self.now)), self.assertNumQueries(len(single)):
+            self.assertEqual(flush_completions(buffer), 5)
+
+        self.assertEqual(HabitCompletion.objects.filter(is_completed=True, completion_date=day).count(), 6)
+        habits[1].refresh_from_db()
+        self.assertEqual(habits[1].next_due_at.date(), day + timedelta(days=1))
+
+    def test_completion_keeps_earliest_tap(self):
+        """Тест: пачка с более поздним нажатием не перезаписывает время выполнения"""
+        buffer = LocalCompletionBuffer()
+        day = self.now.date()
+        for minutes in (5, 1, 3):
+            with use_clock(SimulatedClock(self.now + timedelta(minutes=minutes))):
+                async_to_sync(buffer_completion)(123456789, self.habit.pk, day, buffer)
+            flush_completions(buffer)
+
+        completion = HabitCompletion.objects.get(habit=self.habit, completion_date=day)
+        self.assertTrue(completion.is_completed)
+        self.assertEqual(completion.completed_at, self.now + timedelta(minutes=1))
+
+
+class DailyDigestTest(TestCase):
+    """Тесты для ежедневной сводки"""
+
+    def setUp(self):
+        # 06:00 UTC = 09:00 MSK
+        self.now = timezone.now().replace(hour=6, minute=0, second=10, microsecond=0)
+
+    def _create_user(self, index):
+        user = User.objects.create_user(username=f'user{index}', password='testpass123')
+        UserProfile.objects.filter(user=user).update(telegram_chat_id=1000 + index)
+        habit = Habit.objects.create(user=user, place='Дом', time=time(15, 0), action=f'Дело {index}')
+        HabitCompletion.objects.create(
+            habit=habit,
+            completion_date=timezone.localtime(self.now).date() - timedelta(days=1),
+            is_completed=True
+        )
+        Habit.objects.filter(pk=habit.pk).update(next_due_at=self.now.replace(hour=15))
+        return user
+
+    def test_digest_content(self):
+        """Тест: в сводке привычки на сегодня и выполнение за вчера"""
+        self._create_user(1)
+
+        found, queued = dispatch_daily_digests(self.now)
+
+        self.assertEqual((found, queued), (1, 1))
+        message = NotificationOutbox.objects.get()
+        self.assertEqual(message.chat_id, 1001)
+        self.assertIn('Дело 1 в 18:00', message.text)
+        self.assertIn('Вчера выполнено:* 1 из 1', message.text)
+
+    def test_digest_queries_do_not_grow_with_users(self):
+        """Тест: число запросов не зависит от числа пользователей"""
+        for index in range(5):
+            self._create_user(index)
+        claim_minutes(self.now - timedelta(minutes=1), name='daily_digest')
+
+        # отметка обработки (4) + профили + привычки + выполнения + вставка в очередь
+        with self.assertNumQueries(8):
+            found, queued = dispatch_daily_digests(self.now)
+
+        self.assertEqual((found, queued), (5, 5))
+        self.assertEqual(dispatch_daily_digests(self.now), (0, 0))
+
+
+class CeleryQueuesTest(TestCase):
+    """Тесты для очередей и пулов Celery"""
+
+    def test_tasks_routed_by_urgency(self):
+        """Тест: напоминания, сводки и аналитика идут в разные очереди"""
+
+        def queue_of(task):
+            return celery_app.amqp.router.route({}, task)['queue'].name
+
+        self.assertEqual(queue_of('telegram_bot.tasks.send_habit_reminders'), 'reminders')
+        self.assertEqual(queue_of('telegram_bot.tasks.drain_notification_outbox'), 'reminders')
+        self.assertEqual(queue_of('telegram_bot.tasks.send_daily_digests'), 'bulk')
+        self.assertEqual(queue_of('telegram_bot.tasks.report_reminder_load'), 'analytics')
+
+    def test_run_celery_starts_worker_per_queue(self):
+        """Тест: на каждую очередь — свой воркер со своим пулом"""
+
+        commands = RunCeleryCommand().worker_commands(['reminders', 'analytics'], solo=False)
+
+        self.assertEqual(len(commands), 2)
+        self.assertIn('--pool=prefork', commands[0])
+        self.assertEqual(commands[0][commands[0].index('-Q') + 1], 'reminders')
+        self.assertIn('--pool=solo', commands[1])
+        self.assertEqual(len(RunCeleryCommand().worker_commands(['reminders', 'bulk'], solo=True)), 1)
+
+    def test_queue_stats_depth_and_age(self):
+        """Тест: глубина очереди и возраст самой старой задачи"""
+
+        client = MagicMock()
+        client.llen.side_effect = lambda name: 3 if name == 'reminders' else 0
+        client.lindex.return_value = json.dumps({'headers': {'published_at': 1000.0}})
+
+        stats = {item['queue']: item for item in queue_stats(client, now=1042.5)}
+
+        self.assertEqual(stats['reminders']['depth'], 3)
+        self.assertEqual(stats['reminders']['oldest_age_seconds'], 42.5)
+        self.assertIsNone(stats['bulk']['oldest_age_seconds'])
@@ -0,0 +1,104 @@
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+
+from django.conf import settings
+from telegram import Update
+from telegram.ext import Application
+
+# Сколько обновлений Application может взять из очереди сверх работающих обработчиков:
+# ждущие своей очереди в чате не занимают воркеров, но и не копятся без предела
+MAX_PENDING_UPDATES = 256
+
+
+def bot_concurrency():
+    """Сколько обновлений бот обрабатывает одновременно; 1 — строго по одному"""
+    return max(1, getattr(settings, 'TELEGRAM_BOT_CONCURRENCY', 1))
+
+
+def update_chat_id(update):
+    """Чат обновления — по нему упорядочиваем обработку; None — обновление без чата"""
+    if isinstance(update, Update) and update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+
+class ChatLocks:
+    """Замки по чатам: обновления одного чата идут по одному, в порядке поступления"""
+
+    def __init__(self):
+        self._locks = {}
+
+    def __len__(self):
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, chat_id, admit=None):
+        """
+        Очередь чата. admit(ahead) решает, пускать ли обновление, еще до ожидания замка:
+        ahead — сколько обновлений чата уже впереди. Внутри блока — True, если пустили.
+        """
+        if chat_id is None:
+            yield admit is None or await admit(0)
+            return
+        entry = self._locks.get(chat_id)
+        if entry is None:
+            entry = self._locks[chat_id] = [asyncio.Lock(), 0]
+        ahead = entry[1]
+        entry[1] += 1
+        try:
+            if admit is not None and not await admit(ahead):
+                yield False
+                return
+            # asyncio.Lock будит ждущих в порядке очереди — порядок обновлений чата сохраняется
+            async with entry[0]:
+                yield True
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                # Замок больше никто не ждет — не держим его для каждого чата, что когда-то писал боту
+                del self._locks[chat_id]
+
+
+class ChatOrderedApplication(Application):
+    """
+    Application с параллельной обработкой обновлений разных чатов. Обновления одного чата
+    обрабатываются строго по очереди — ConversationHandler (/connect) видит их в том же порядке,
+    что и при последовательной обработке. Порядок держится внутри процесса: обновления должен
+    принимать один процесс (polling или вебхук в одном воркере ASGI, см. webhook.TelegramWebhook).
+    Одновременно работает не больше workers обработчиков.
+    Защита от флуда проверяет обновление сразу по приходе, до очереди чата и до воркера.
+    """
+
+    def __init__(self, workers, flood_guard=None, **kwargs):
+        super().__init__(**kwargs)
+        self.workers = workers
+        self.flood_guard = flood_guard
+        self.chat_locks = ChatLocks()
+        self._workers_sem = asyncio.BoundedSemaphore(workers)
+
+    async def process_update(self, update):
+        # admit(ahead) — защита от флуда с числом обновлений чата, которые уже впереди
+        admit = partial(self.flood_guard.admit, update) if self.flood_guard is not None else None
+        # Сначала очередь чата, потом воркер: ждущее обновление не отнимает воркер у других чатов
+        async with self.chat_locks.hold(update_chat_id(update), admit) as admitted:
+            if not admitted:
+                return
+            async with self._workers_sem:
+                await super().process_update(update)
+
+
+def configure_concurrency(builder, workers=None, flood_guard=None):
+    """
+    Включить в ApplicationBuilder параллельную обработку с порядком внутри чата.
+    С защитой от флуда — всегда через очереди чатов, даже при одном воркере:
+    иначе поток одного чата ждал бы своих токенов впереди всех остальных.
+    """
+    workers = workers or bot_concurrency()
+    if workers <= 1 and flood_guard is None:
+        return builder
+    return (
+        builder
+        .application_class(ChatOrderedApplication, kwargs={'workers': workers, 'flood_guard': flood_guard})
+        .concurrent_updates(max(MAX_PENDING_UPDATES, workers))
+    )
@@ -0,0 +1,196 @@
+import asyncio
+import hmac
+import json
+import logging
+import uuid
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = b'x-telegram-bot-api-secret-token'
+DEFAULT_WEBHOOK_PATH = '/telegram/webhook/'
+# Обновления Telegram маленькие — все, что больше, не от него
+MAX_UPDATE_SIZE = 1024 * 1024
+# Вебхук принимает ровно один процесс: порядок обновлений чата держит его очередь (ChatOrderedApplication)
+OWNER_KEY = 'tg:webhook:owner'
+# Сколько секунд право на вебхук держится без продления — после падения процесса его займет новый
+OWNER_LEASE = 30
+
+
+class WebhookBusy(RuntimeError):
+    """Вебхук уже принимает другой процесс"""
+
+
+def webhook_path():
+    """Путь, на который Telegram присылает обновления, — из TELEGRAM_WEBHOOK_URL"""
+    url = getattr(settings, 'TELEGRAM_WEBHOOK_URL', '')
+    return urlparse(url).path or DEFAULT_WEBHOOK_PATH
+
+
+def webhook_enabled():
+    """Вебхук включен, только если задан TELEGRAM_WEBHOOK_URL — иначе бот работает через polling"""
+    return bool(getattr(settings, 'TELEGRAM_WEBHOOK_URL', ''))
+
+
+def webhook_secret():
+    """Секрет вебхука — только явно заданный TELEGRAM_WEBHOOK_SECRET"""
+    return getattr(settings, 'TELEGRAM_WEBHOOK_SECRET', '')
+
+
+class TelegramWebhook:
+    """
+    ASGI-обертка над приложением Django: POST на путь вебхука проверяется по секрету
+    и кладется в очередь обновлений Application, остальные запросы уходят в Django.
+    Обновления одного чата идут по порядку только внутри одного процесса, поэтому бот запускает
+    ровно один процесс (право на вебхук — в общем кеше); второй воркер с вебхуком не стартует.
+    Без TELEGRAM_WEBHOOK_URL путь вебхука не обслуживается и бот в воркерах не запускается.
+    """
+
+    def __init__(self, app, path=None, secret=None, bot_factory=None, enabled=None):
+        self.app = app
+        self.enabled = webhook_enabled() if enabled is None else enabled
+        self.path = path or webhook_path()
+        self.secret = webhook_secret() if secret is None else secret
+        if self.enabled and not self.secret:
+            raise ImproperlyConfigured("Для вебхука Telegram нужен TELEGRAM_WEBHOOK_SECRET")
+        self.bot_factory = bot_factory
+        self.bot = None
+        self.owner_id = uuid.uuid4().hex
+        self._lock = None
+        self._lease = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and self.enabled and scope['path'] == self.path:
+            return await self.handle(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+    def create_bot(self):
+        if self.bot_factory is not None:
+            return self.bot_factory()
+        from .bot import HabitBot
+
+        return HabitBot()
+
+    async def acquire(self):
+        """Занять право на вебхук (или подтвердить, что оно уже наше) и продлевать его, пока процесс жив"""
+        if not await cache.aadd(OWNER_KEY, self.owner_id, OWNER_LEASE):
+            if await cache.aget(OWNER_KEY) != self.owner_id:
+                raise WebhookBusy("Вебхук Telegram уже принимает другой процесс: запускайте ASGI с одним воркером")
+        if self._lease is None or self._lease.done():
+            self._lease = asyncio.ensure_future(self.keep_lease())
+
+    async def keep_lease(self):
+        while True:
+            await asyncio.sleep(OWNER_LEASE / 3)
+            if await cache.aget(OWNER_KEY) not in (None, self.owner_id):
+                logger.error("❌ Право на вебхук Telegram перешло другому процессу")
+                return
+            await cache.aset(OWNER_KEY, self.owner_id, OWNER_LEASE)
+
+    async def release(self):
+        if self._lease is None:
+            return
+        self._lease.cancel()
+        self._lease = None
+        if await cache.aget(OWNER_KEY) == self.owner_id:
+            await cache.adelete(OWNER_KEY)
+
+    async def start(self):
+        """Запустить Application воркера (один раз) — он разбирает очередь обновлений"""
+        if self.bot is not None:
+            return self.bot
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.bot is None:
+                await self.acquire()
+                bot = self.create_bot()
+                await bot.application.initialize()
+                await bot.application.start()
+                self.bot = bot
+                logger.info("🤖 Telegram бот принимает обновления через вебхук")
+        return self.bot
+
+    async def stop(self):
+        if self.bot is not None:
+            bot, self.bot = self.bot, None
+            await bot.application.stop()
+            await bot.application.shutdown()
+        await self.release()
+
+    async def lifespan(self, receive, send):
+        """Протокол lifespan: бот стартует вместе с воркером и останавливается вместе с ним"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    if self.enabled:
+                        await self.start()
+                except WebhookBusy as e:
+                    logger.error(f"❌ {e}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                except Exception as e:
+                    # API работает и без бота; запустить его попробуем на первом обновлении
+                    logger.error(f"❌ Не удалось запустить Telegram бота: {e}")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, scope, receive, send):
+        if scope['method'] != 'POST':
+            return await respond(send, 405)
+
+        token = dict(scope['headers']).get(SECRET_HEADER, b'')
+        if not hmac.compare_digest(token, self.secret.encode()):
+            logger.warning("⚠️ Запрос к вебхуку Telegram с неверным секретом")
+            return await respond(send, 403)
+
+        body = await read_body(receive)
+        if body is None:
+            return await respond(send, 413)
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return await respond(send, 400)
+
+        try:
+            bot = await self.start()
+        except WebhookBusy:
+            return await respond(send, 503)
+        await bot.application.update_queue.put(Update.de_json(data, bot.application.bot))
+        # Отвечаем сразу: обработка идет в Application, Telegram не ждет ее и не повторяет запрос
+        return await respond(send, 200, b'{"ok": true}')
+
+
+async def read_body(receive, limit=MAX_UPDATE_SIZE):
+    """Тело запроса целиком; None — если оно больше limit"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def respond(send, status, body=b''):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
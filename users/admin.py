@@ -4,7 +4,7 @@ from .models import UserProfile
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'telegram_username', 'telegram_chat_id', 'notifications_enabled')
-    list_filter = ('notifications_enabled',)
+    list_display = ('user', 'telegram_username', 'telegram_chat_id', 'notification_channel', 'notifications_enabled')
+    list_filter = ('notifications_enabled', 'notification_channel')
     search_fields = ('user__username', 'user__email', 'telegram_username')
     readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="userprofile",
+            name="daily_notification_time",
+            field=models.TimeField(
+                db_index=True,
+                default="09:00",
+                verbose_name="Время ежедневных уведомлений",
+            ),
+        ),
+    ]
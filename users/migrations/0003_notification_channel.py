@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_daily_notification_time_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="notification_channel",
+            field=models.CharField(
+                choices=[
+                    ("telegram", "Telegram"),
+                    ("email", "Электронная почта"),
+                    ("webhook", "Вебхук"),
+                ],
+                default="telegram",
+                help_text="Куда отправлять напоминания и сводки",
+                max_length=16,
+                verbose_name="Канал уведомлений",
+            ),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="webhook_url",
+            field=models.URLField(
+                blank=True,
+                help_text="Сюда отправляется POST с JSON, если выбран канал «Вебхук»",
+                max_length=500,
+                verbose_name="Адрес вебхука",
+            ),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 6.0.2 on 2026-10-17 06:39
+
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+import users.models
+
+# Копии habits.schedule на момент миграции: дальнейшие изменения кода не должны менять ее результат
+
+
+def utc_offset_minutes():
+    """Текущее смещение пояса проекта от UTC в минутах"""
+    now = timezone.now().astimezone(ZoneInfo(settings.TIME_ZONE))
+    return int(now.utcoffset().total_seconds() // 60)
+
+
+def fill_digest_minute(apps, schema_editor):
+    """Минута сводки в UTC для существующих профилей — все они в поясе проекта"""
+    UserProfile = apps.get_model("users", "UserProfile")
+    offset = utc_offset_minutes()
+
+    profiles = []
+    for profile in UserProfile.objects.only("id", "daily_notification_time").iterator(
+        chunk_size=2000
+    ):
+        local = profile.daily_notification_time
+        profile.utc_offset = offset
+        profile.digest_minute = (local.hour * 60 + local.minute - offset) % (24 * 60)
+        profiles.append(profile)
+
+    UserProfile.objects.bulk_update(
+        profiles, ["utc_offset", "digest_minute"], batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_notification_channel"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="digest_minute",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                null=True,
+                verbose_name="Минута сводки (UTC)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="timezone",
+            field=models.CharField(
+                default="Europe/Moscow",
+                help_text="Время привычек и сводки задается в этом поясе",
+                max_length=64,
+                validators=[users.models.validate_timezone],
+                verbose_name="Часовой пояс",
+            ),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="utc_offset",
+            field=models.SmallIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Смещение от UTC (мин)",
+            ),
+        ),
+        migrations.RunPython(fill_digest_minute, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:24
+
+from django.db import migrations, models
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_profile_timezone"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="userprofile",
+            name="webhook_url",
+            field=models.URLField(
+                blank=True,
+                help_text="Сюда отправляется POST с JSON, если выбран канал «Вебхук»",
+                max_length=500,
+                validators=[users.models.validate_webhook_url],
+                verbose_name="Адрес вебхука",
+            ),
+        ),
+    ]
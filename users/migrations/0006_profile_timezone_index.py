@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-17 07:54
+
+from django.db import migrations, models
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_webhook_url_validator"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="userprofile",
+            name="timezone",
+            field=models.CharField(
+                db_index=True,
+                default="Europe/Moscow",
+                help_text="Время привычек и сводки задается в этом поясе",
+                max_length=64,
+                validators=[users.models.validate_timezone],
+                verbose_name="Часовой пояс",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-17 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_profile_timezone_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="userprofile",
+            name="daily_notification_time",
+            field=models.TimeField(
+                default="09:00", verbose_name="Время ежедневных уведомлений"
+            ),
+        ),
+    ]
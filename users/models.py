@@ -1,14 +1,81 @@
+import ipaddress
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils.dateparse import parse_time
 
 User = get_user_model()
 
 
+def validate_timezone(value):
+    """Имя часового пояса из базы IANA (Europe/Moscow, Asia/Yekaterinburg, ...)"""
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f'Неизвестный часовой пояс: {value}')
+
+
+def webhook_ip_error(host, ip):
+    """Почему на IP нельзя слать вебхук, None — можно: только публичные адреса, не во внутреннюю сеть"""
+    ip = ipaddress.ip_address(ip.split('%')[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    # is_global ложно для loopback, частных, link-local и зарезервированных сетей
+    if not ip.is_global or ip.is_multicast:
+        return f'Вебхук ведет во внутреннюю сеть: {host} ({ip})'
+    return None
+
+
+def webhook_url_error(url):
+    """
+    Почему на адрес нельзя слать вебхук, None — можно. Проверка только по записи адреса, без DNS:
+    https, есть хост, IP в адресе — публичный. Куда на самом деле ведет имя хоста, проверяет
+    канал вебхуков при каждой отправке (telegram_bot.channels).
+    NOTIFICATION_WEBHOOK_ALLOW_LOCAL снимает проверки — для локальной проверки с notification_sinks.
+    """
+    parts = urlsplit(url)
+    if getattr(settings, 'NOTIFICATION_WEBHOOK_ALLOW_LOCAL', False):
+        return None if parts.scheme in ('http', 'https') and parts.hostname else 'Некорректный адрес вебхука'
+    if parts.scheme != 'https':
+        return 'Адрес вебхука должен начинаться с https://'
+    if not parts.hostname:
+        return 'В адресе вебхука нет хоста'
+    if parts.hostname == 'localhost' or parts.hostname.endswith('.localhost'):
+        return f'Вебхук ведет во внутреннюю сеть: {parts.hostname}'
+    try:
+        ipaddress.ip_address(parts.hostname.split('%')[0])
+    except ValueError:
+        return None
+    return webhook_ip_error(parts.hostname, parts.hostname)
+
+
+def validate_webhook_url(value):
+    """Вебхук — только https на публичный адрес"""
+    error = webhook_url_error(value)
+    if error:
+        raise ValidationError(error)
+
+
 class UserProfile(models.Model):
     """Профиль пользователя для хранения Telegram данных"""
 
+    CHANNEL_TELEGRAM = 'telegram'
+    CHANNEL_EMAIL = 'email'
+    CHANNEL_WEBHOOK = 'webhook'
+
+    CHANNEL_CHOICES = [
+        (CHANNEL_TELEGRAM, 'Telegram'),
+        (CHANNEL_EMAIL, 'Электронная почта'),
+        (CHANNEL_WEBHOOK, 'Вебхук'),
+    ]
+
     user = models.OneToOneField(
         User,
         on_delete=models.CASCADE,
@@ -39,11 +106,54 @@ class UserProfile(models.Model):
         help_text='Включены ли уведомления о привычках'
     )
 
+    notification_channel = models.CharField(
+        max_length=16,
+        choices=CHANNEL_CHOICES,
+        default=CHANNEL_TELEGRAM,
+        verbose_name='Канал уведомлений',
+        help_text='Куда отправлять напоминания и сводки'
+    )
+
+    webhook_url = models.URLField(
+        max_length=500,
+        blank=True,
+        validators=[validate_webhook_url],
+        verbose_name='Адрес вебхука',
+        help_text='Сюда отправляется POST с JSON, если выбран канал «Вебхук»'
+    )
+
     # Время для ежедневных уведомлений
-    daily_notification_time = models.TimeField(default='09:00',
+    daily_notification_time = models.TimeField(
+        default='09:00',
         verbose_name='Время ежедневных уведомлений'
     )
 
+    timezone = models.CharField(
+        max_length=64,
+        default=settings.TIME_ZONE,
+        validators=[validate_timezone],
+        db_index=True,
+        verbose_name='Часовой пояс',
+        help_text='Время привычек и сводки задается в этом поясе'
+    )
+
+    # Смещение пояса (минуты), по которому посчитана digest_minute
+    utc_offset = models.SmallIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Смещение от UTC (мин)'
+    )
+
+    # Минута суток (UTC), в которую уходит сводка — считается при сохранении профиля
+    digest_minute = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Минута сводки (UTC)'
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -54,11 +164,56 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"Профиль {self.user.username if self.user.username else self.user.email}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_timezone = instance.__dict__.get('timezone')
+        instance._loaded_chat_id = instance.__dict__.get('telegram_chat_id')
+        return instance
+
     @property
     def has_telegram(self):
         """Есть ли привязанный Telegram аккаунт"""
         return bool(self.telegram_chat_id)
 
+    def apply_utc_offset(self, offset):
+        """Минута сводки в UTC для смещения пояса offset (минуты)"""
+        local = self.daily_notification_time
+        if isinstance(local, str):
+            local = parse_time(local)
+        self.utc_offset = offset
+        self.digest_minute = (local.hour * 60 + local.minute - offset) % (24 * 60)
+
+    def save(self, *args, **kwargs):
+        from habits.schedule import utc_offset_minutes
+
+        self.apply_utc_offset(utc_offset_minutes(self.timezone))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'timezone', 'daily_notification_time'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'utc_offset', 'digest_minute'}
+        super().save(*args, **kwargs)
+
+        # Сменился пояс — UTC-время привычек пересчитываем сразу, а не ждем задания пересчета
+        previous, self._loaded_timezone = getattr(self, '_loaded_timezone', self.timezone), self.timezone
+        if previous != self.timezone:
+            from habits.models import Habit
+
+            for habit in Habit.objects.filter(user_id=self.user_id):
+                habit.save()
+
+
+def reachable_profiles(profile='', user='user__'):
+    """
+    Условие на профиль, которому есть куда доставить уведомление по выбранному каналу.
+    profile и user — префиксы полей профиля и пользователя относительно модели запроса.
+    """
+    return (
+        Q(**{f'{profile}notification_channel': UserProfile.CHANNEL_TELEGRAM,
+             f'{profile}telegram_chat_id__isnull': False})
+        | (Q(**{f'{profile}notification_channel': UserProfile.CHANNEL_EMAIL}) & ~Q(**{f'{user}email': ''}))
+        | (Q(**{f'{profile}notification_channel': UserProfile.CHANNEL_WEBHOOK}) & ~Q(**{f'{profile}webhook_url': ''}))
+    )
+
 
 # Сигналы для автоматического создания профиля при создании пользователя
 @receiver(post_save, sender=User)
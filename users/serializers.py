@@ -49,7 +49,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'telegram_chat_id',
             'telegram_username',
             'notifications_enabled',
+            'notification_channel',
+            'webhook_url',
             'daily_notification_time',
+            'timezone',
             'created_at',
             'updated_at',
         ]
@@ -60,3 +63,13 @@ class UserProfileSerializer(serializers.ModelSerializer):
         if value and value < 0:
             raise serializers.ValidationError('Telegram Chat ID должен быть положительным числом')
         return value
+
+    def validate(self, attrs):
+        """Для выбранного канала должен быть адрес доставки"""
+        channel = attrs.get('notification_channel', getattr(self.instance, 'notification_channel', None))
+        webhook_url = attrs.get('webhook_url', getattr(self.instance, 'webhook_url', ''))
+        if channel == UserProfile.CHANNEL_WEBHOOK and not webhook_url:
+            raise serializers.ValidationError({'webhook_url': 'Укажите адрес вебхука'})
+        if channel == UserProfile.CHANNEL_EMAIL and self.instance and not self.instance.user.email:
+            raise serializers.ValidationError({'notification_channel': 'У пользователя не указан email'})
+        return attrs